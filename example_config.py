@@ -7,6 +7,9 @@
 # set your preferences.
 
 GAME_CHANNEL = '#triviachannel'
+# To run games in several channels from one connection, list them all;
+# private messages go to the first one's game.
+# GAME_CHANNELS = ['#triviachannel', '#moretrivia']
 
 # Nick of person running this bot? (the nick included here will be
 # automatically added to the list of ADMINS)
@@ -19,8 +22,28 @@ ADMINS = ['admin']
 
 Q_DIR = './questions/'
 
+# The questions in Q_DIR are compiled into a single bank file the bot
+# memory maps. It's rebuilt automatically when Q_DIR changes; by default it
+# lives in SAVE_DIR.
+# Q_BANK = './savedata/questions.bank'
+
 SAVE_DIR = './savedata/'
 
+# Scores and teams are saved in the background. Changes made within this
+# many seconds of each other are written out together.
+# SAVE_WINDOW = 5
+
+# How scores and teams are saved. 'snapshot' rewrites scores.json and
+# teams.json each time. 'journal' appends every change to journal.jsonl, so
+# saving stays cheap however many players there are, and writes a snapshot
+# every COMPACT_EVERY changes. Old journals are kept as journal-<n>.jsonl,
+# a record of every point awarded and every admin edit.
+# 'sqlite' keeps every award, team and season in SAVE_DIR/trivia.sqlite
+# and adds the top, rank, seasons and history commands; the first start
+# imports the JSON save files, including the archives left by !reset.
+# SAVE_MODE = 'snapshot'
+# COMPACT_EVERY = 1000
+
 IDENT_STRING = 'password'
 
 # Time (in seconds) between clues, and the wait time between questions.
@@ -28,6 +51,13 @@ IDENT_STRING = 'password'
 WAIT_INTERVAL = 30
 WAIT_QUESTION = 5
 
+# Let the time between clues follow how fast questions are answered, between
+# these bounds: over the last PACE_WINDOW questions, the PACE_PERCENTILE
+# answer time (given up on counts as the longest) is aimed at the last clue.
+# PACE_BOUNDS = (10, 45)
+# PACE_PERCENTILE = 0.9
+# PACE_WINDOW = 20
+
 # Colorize the text so it contrasts with the channel text.
 # This makes it easier to play the game when people are chatting.
 #
@@ -39,6 +69,11 @@ COLOR_CODE = '\00308,01'
 # How fast will the bot output messages to the channel
 LINE_RATE = 0.4
 
+# Game play goes out first, then replies in channels, then private replies.
+# Apart from the game's own messages, at most this many lines wait for any
+# one place; older ones are dropped.
+# OUTBOUND_DEPTH = 30
+
 DEFAULT_NICK = 'triviabot'
 
 SERVER = 'irc.freenode.net'
@@ -47,7 +82,56 @@ TEAM_LIMIT = 5
 
 ROUND_QUESTIONS = 3
 
+# How clues give the answer away: 'letters' one at a time, 'initials' (the
+# first letter of every word first), 'vowels' (every vowel first) or 'length'
+# (only the number of words, then their lengths, then letters).
+# CLUE_STRATEGY = 'letters'
+
+# Questions each game keeps ready ahead, read and with their answers and clues
+# worked out on a thread. 0 prepares each one when it's asked.
+# PREFETCH_DEPTH = 3
+
+# How fast each nick may guess, give commands, and ask for listings (commands
+# that reply with several lines, like !standings), as (per second, most at
+# once). Going over ignores that nick's guesses or commands for FLOOD_PENALTY
+# seconds. Admins aren't limited. Only the FLOOD_TRACKED most recently seen
+# nicks are remembered.
+# FLOOD_LIMITS = {'guess': (1.0, 5), 'command': (0.5, 5), 'listing': (0.1, 2)}
+# FLOOD_PENALTY = 30
+# FLOOD_TRACKED = 10000
+
+# Questions open at once in a rapid-fire round (!rapid), unless the command
+# gives a number, and the most it can ask for.
+# RAPID_QUESTIONS = 5
+# RAPID_MAX = 10
+
 # Some servers support SSL, and some do not. If you have trouble connecting
 # to your IRC network, you may have to disable SSL or change the server port
 SERVER_PORT = 6667
 USE_SSL = "YES"
+
+# To play on several networks, run supervisor.py instead of trivia.py: it
+# starts a bot per network and restarts any that crash. They share one
+# score database, so SAVE_MODE must be 'sqlite'. Anything left out of a
+# network is taken from the settings above.
+# NETWORKS = [{'name': 'freenode', 'server': 'irc.freenode.net',
+#              'port': 6697, 'ssl': 'yes', 'metrics_port': 9101},
+#             {'name': 'oftc', 'server': 'irc.oftc.net', 'port': 6667,
+#              'ssl': 'no', 'nickname': 'quizbot',
+#              'channels': ['#trivia'], 'metrics_port': 9102}]
+
+# Serve metrics for Prometheus at http://METRICS_INTERFACE:METRICS_PORT/metrics.
+# Under the supervisor, give each network a metrics_port instead.
+# METRICS_PORT = 9100
+# METRICS_INTERFACE = '127.0.0.1'
+
+# The log is JSON lines on stdout, or in LOG_FILE (one per network under the
+# supervisor), which is rotated at LOG_MAX_BYTES keeping LOG_BACKUPS old
+# files. 'debug' adds every channel line and dumps of the teams and scores.
+# Of what users can cause at will, like commands, only LOG_CHATTER_RATE
+# records a second are kept.
+# LOG_LEVEL = 'info'
+# LOG_FILE = 'trivia.log'
+# LOG_MAX_BYTES = 10 * 1024 * 1024
+# LOG_BACKUPS = 5
+# LOG_CHATTER_RATE = 10
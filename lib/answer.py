@@ -1,72 +1,118 @@
-from random import randrange
+from random import random
+
+from lib.clues import reveal_limit, strategy_named
+from lib.matching import answer_keys, Matcher
 
 class Answer:
     '''
     This class implements storage for an answer you want to conceal
-    and give clues 1 letter at a time.
+    and give clues for.
+
+    When the answer is set, the clue strategy (see lib.clues) works out
+    what to reveal in what order, and the mask is kept as a list of
+    characters. Letters given one at a time are drawn as the clues are
+    given, a step of a Fisher-Yates shuffle each, so every clue takes the
+    same time however much of the answer is showing.
     '''
 
-    def __init__(self, answer='None'):
+    def __init__(self, answer='None', keys=None, strategy='letters'):
         self._answer = answer
-        # TODO: This is a really inefficient way to go about doing this,
-        # but I can't think of a good way to do this right now.
-        self._masked_answer = str()
+        self.strategy = strategy
+        # Guesses are matched against these; worked out once per answer
+        # rather than once per guess.
+        if keys is None:
+            keys = answer_keys(answer)
+        self._matcher = Matcher(keys)
+        self._mask = ['*' if character.isalnum() else character
+                      for character in answer]
         self._unmasked = 0
-
-        for character in self._answer:
-            if character.isalnum():
-                self._masked_answer += '*'
-            else:
-                self._masked_answer += character
+        self._limit = reveal_limit(answer)
+        self._groups, self._hidden, self._cover = \
+            strategy_named(strategy)(answer)
+        self._group = 0
+        self._masked_answer = self._cover or ''.join(self._mask)
 
     def give_clue(self):
         '''
-        Returns the masked string after revealing a letter and saving the mask.
+        Returns the masked string after revealing the next step and saving
+        the mask.
 
         If an answer has only 1-2 characters in it, no clues are given.
 
-        If an answer has 3-4, 1 clue is given.
+        If an answer has 3-4, 1 letter is given.
 
-        If an answer has 5-6, 2 clues are given.
+        If an answer has 5-6, 2 letters are given.
+
+        If the strategy covers the mask at first, the first clue only
+        uncovers it.
         '''
-        # If all letters are unmasked, just return it.
-        if self._answer == self._masked_answer:
-            return self._masked_answer
-        elif len(self) < 3:
+        if self._cover:
+            self._cover = ''
+            self._masked_answer = ''.join(self._mask)
             return self._masked_answer
-        elif len(self) < 5 and self._unmasked == 1:
+        if self._unmasked >= self._limit:
             return self._masked_answer
-        elif len(self) < 7 and self._unmasked == 2:
+        if self._group < len(self._groups):
+            step = self._groups[self._group][:self._limit - self._unmasked]
+            self._group += 1
+        elif self._hidden:
+            # Take any hidden letter, and put the last in its place.
+            hidden = self._hidden
+            pick = int(random() * len(hidden))
+            step = (hidden[pick],)
+            hidden[pick] = hidden[-1]
+            hidden.pop()
+        else:
             return self._masked_answer
-
-        # Choose the next letter to unmask.
-        # Start with something to get us into the while loop.
-        letter = ' '
-
-        # If it's a symbol, choose a different letter.
-        while not letter.isalnum():
-            # We need an index.
-            index = randrange(0, len(self))
-            # Get the letter at that index from the answer.
-            letter = self._answer[index]
-            # If the character was already unmasked, or is a symbol.
-            if self._masked_answer[index] == letter:
-                letter = ' '
-
-        # Strings are immutable, so need to split and replace.
-        self._masked_answer = self._masked_answer[:index] + letter + self._masked_answer[index + 1:]
-        self._unmasked += 1
-
+        for index in step:
+            self._mask[index] = self._answer[index]
+        self._unmasked += len(step)
+        self._masked_answer = ''.join(self._mask)
         return self._masked_answer
 
+    def set_strategy(self, strategy):
+        '''
+        Gives the rest of this answer's clues, and the next answer's, by
+        strategy. Whatever has been revealed stays revealed, and the mask
+        is only covered if it still is.
+        '''
+        groups, hidden, cover = strategy_named(strategy)(self._answer)
+        self._groups = [group for group in
+                        (tuple(index for index in group
+                               if self._mask[index] == '*')
+                         for group in groups)
+                        if group]
+        self._group = 0
+        self._hidden = [index for index in hidden if self._mask[index] == '*']
+        if self._cover:
+            self._cover = cover
+        self._limit = reveal_limit(self._answer)
+        self.strategy = strategy
+        self._masked_answer = self._cover or ''.join(self._mask)
+
     def current_clue(self):
         return self._masked_answer
 
-    def set_answer(self, new_answer):
+    def set_answer(self, new_answer, keys=None):
         '''
         Sets a new answer string for the next question to use.
+
+        keys are the precomputed answer_keys of the answer, if the caller
+        already has them.
         '''
-        self.__init__(answer=new_answer)
+        self.__init__(answer=new_answer, keys=keys, strategy=self.strategy)
+
+    def matches(self, guess):
+        '''
+        True if guess is close enough to the answer to count.
+        '''
+        return self._matcher.matches(guess)
+
+    def _get_longest_guess(self):
+        return self._matcher.longest_guess
+
+    def _get_keys(self):
+        return self._matcher.keys
 
     def _reveal(self):
         '''
@@ -78,3 +124,7 @@ class Answer:
         return len(self._answer)
 
     answer = property(_reveal)
+    # Anything longer than this can't be the answer.
+    longest_guess = property(_get_longest_guess)
+    # The normalized forms a guess is compared with.
+    keys = property(_get_keys)
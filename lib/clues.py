@@ -0,0 +1,94 @@
+VOWELS = frozenset('aeiouAEIOU')
+
+
+def _words(answer):
+    '''
+    The indices of the letters and digits in each word of answer.
+    '''
+    words = []
+    word = []
+    for index, character in enumerate(answer):
+        if character.isalnum():
+            word.append(index)
+        elif character.isspace() and word:
+            words.append(word)
+            word = []
+    if word:
+        words.append(word)
+    return words
+
+
+def _alnum(answer):
+    return [index for index, character in enumerate(answer)
+            if character.isalnum()]
+
+
+# Each strategy takes an answer and returns how to reveal it: a list of
+# groups of indices, revealed a group per clue, then the indices to reveal
+# one at a time in a random order after them, and what to show in place of
+# the mask until the first clue ('' to show the mask from the start).
+
+def letters(answer):
+    '''
+    One letter at a time, in a random order.
+    '''
+    return [], _alnum(answer), ''
+
+
+def initials(answer):
+    '''
+    The first letter of every word at once, then the rest one at a time.
+    '''
+    words = _words(answer)
+    first = tuple(word[0] for word in words)
+    return [first] if first else [], \
+        [index for word in words for index in word[1:]], ''
+
+
+def vowels(answer):
+    '''
+    Every vowel at once, then the rest one at a time.
+    '''
+    indices = _alnum(answer)
+    found = tuple(index for index in indices if answer[index] in VOWELS)
+    rest = [index for index in indices if answer[index] not in VOWELS]
+    return [found] if found else [], rest, ''
+
+
+def length(answer):
+    '''
+    Only how many words there are at first, then the mask, showing how
+    long each is, then one letter at a time.
+    '''
+    words = len(_words(answer))
+    return [], _alnum(answer), '({} word{})'.format(
+        words, '' if words == 1 else 's')
+
+
+STRATEGIES = {'letters': letters,
+              'initials': initials,
+              'vowels': vowels,
+              'length': length,
+              }
+
+
+def strategy_named(name):
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError("clue strategy must be one of {}, not {!r}"
+                         .format(', '.join(sorted(STRATEGIES)), name))
+
+
+def reveal_limit(answer):
+    '''
+    How many letters of answer the clues may give away in all: none of an
+    answer under 3 characters, 1 under 5 and 2 under 7.
+    '''
+    if len(answer) < 3:
+        return 0
+    elif len(answer) < 5:
+        return 1
+    elif len(answer) < 7:
+        return 2
+    return len(answer)
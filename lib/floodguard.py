@@ -0,0 +1,114 @@
+from lib.metrics import REGISTRY
+
+
+# What users do that's rate limited.
+GUESS = 'guess'
+COMMAND = 'command'
+# Commands that reply with several lines.
+LISTING = 'listing'
+
+# Per second and most at once, for each kind.
+LIMITS = {GUESS: (1.0, 5),
+          COMMAND: (0.5, 5),
+          LISTING: (0.1, 2),
+          }
+
+
+class FloodGuard:
+    '''
+    Rate limits what each nick can make the bot do, with a token bucket
+    per nick and kind of thing: limits maps each kind to (rate, burst),
+    rate tokens a second up to burst, and each event takes one. Kinds not
+    in limits, and nicks in exempt, aren't limited.
+
+    Running out drops the event and ignores that kind from the nick for
+    penalty seconds more, calling penalised(nick, kind) so they can be
+    told.
+
+    Memory doesn't grow with every nick that passes: buckets are kept in
+    two generations of up to size / 2 each. A bucket used from the older
+    one moves to the newer, and when the newer fills, the older is
+    forgotten and the newer takes its place. So nicks seen lately are kept
+    and the rest go, like a least recently used table but with plain dict
+    lookups. A forgotten nick starts again with a full bucket.
+    '''
+
+    def __init__(self, limits=LIMITS, penalty=30, size=10000, exempt=(),
+                 clock=None, penalised=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self._clock = clock
+        self._penalised = penalised
+        # (nick, kind): [tokens, when they were counted, ignored until]
+        self._recent = {}
+        self._older = {}
+        self.dropped = {}
+        self._dropped = {}
+        self.penalties = 0
+        self.forgotten = 0
+        self.configure(limits, penalty, size, exempt)
+
+    def configure(self, limits, penalty, size, exempt):
+        self.limits = dict(limits)
+        self.penalty = penalty
+        self.size = size
+        self.exempt = set(exempt)
+        for kind in self.limits:
+            self.dropped.setdefault(kind, 0)
+            self._dropped[kind] = REGISTRY.counter(
+                'trivia_flood_dropped_total',
+                'Events ignored because a nick was sending too many.',
+                {'kind': kind})
+        if len(self._recent) >= self.size // 2:
+            self._next_generation()
+
+    def allow(self, nick, kind):
+        '''
+        True if nick can do another kind of thing now, and takes a token
+        for it.
+        '''
+        if nick in self.exempt:
+            return True
+        try:
+            rate, burst = self.limits[kind]
+        except KeyError:
+            return True
+        now = self._clock.seconds()
+        key = (nick, kind)
+        bucket = self._recent.get(key)
+        if bucket is None:
+            bucket = self._older.pop(key, None)
+            if bucket is None:
+                bucket = [burst, now, 0]
+            self._recent[key] = bucket
+            if len(self._recent) >= self.size // 2:
+                self._next_generation()
+
+        if now < bucket[2]:
+            self._drop(kind)
+            return False
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            self._drop(kind)
+            if self.penalty:
+                bucket[2] = now + self.penalty
+                self.penalties += 1
+                if self._penalised is not None:
+                    self._penalised(nick, kind)
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _next_generation(self):
+        self.forgotten += len(self._older)
+        self._older = self._recent
+        self._recent = {}
+
+    def _drop(self, kind):
+        self.dropped[kind] += 1
+        self._dropped[kind].inc()
+
+    def __len__(self):
+        return len(self._recent) + len(self._older)
@@ -0,0 +1,385 @@
+from lib.answer import Answer
+from lib.metrics import REGISTRY, now
+from lib.outbound import CRITICAL
+from lib.pacing import Pacer
+from lib.prefetch import Prefetcher
+from lib.rapidfire import RapidFire
+from lib.sampling import CategorySampler, parse_theme
+
+
+# Points for answering after each number of clues.
+POINTS = {0: 5,
+          1: 3,
+          2: 2,
+          3: 1
+          }
+
+QUESTIONS = REGISTRY.counter('trivia_questions_total', 'Questions asked.')
+NEW_QUESTION_SECONDS = REGISTRY.histogram(
+    'trivia_new_question_seconds', 'Time taken to pick and load a question.')
+ASK_SECONDS = REGISTRY.histogram(
+    'trivia_ask_seconds', 'Time from needing a question to its first clue '
+    'being sent.')
+
+
+class TriviaGame:
+    '''
+    The game in one channel: its round, the question being asked, its
+    clues, and the Pacer whose timer asks them.
+
+    The bot owns the connection, the question bank, scores and teams, and
+    any number of these share them. A game talks back to the bot through
+    _cmsg, mode, _award (to score a right answer) and _round_over.
+
+    A round can also be rapid-fire, with several questions open at once
+    (see lib.rapidfire); the game then hands guesses and winners to it.
+    '''
+
+    def __init__(self, bot, channel, questions, cursor, round_questions,
+                 wait_interval, wait_question, clock=None,
+                 clue_strategy='letters', prefetch_depth=3,
+                 defer_to_thread=None, pace_bounds=None, pace_percentile=0.9,
+                 pace_window=20):
+        self.channel = channel
+        self._bot = bot
+        self._questions = questions
+        self._cursor = cursor
+        self._wait_interval = wait_interval
+        self._wait_question = wait_question
+        self._clue_strategy = clue_strategy
+        self._defer_to_thread = defer_to_thread
+        self._prefetch = Prefetcher(self._pick, self._prepare, prefetch_depth,
+                                    defer_to_thread)
+
+        self.answer = Answer(strategy=clue_strategy)
+        self.question = ''
+        self.round_questions = round_questions
+        self.round_question_num = 0
+        self.clue_number = 0
+        self.current_points = POINTS[0]
+        # Whether there's a question out that can still be answered: not
+        # once it's been won or given up on, while the next one waits.
+        self.asking = False
+        # Set for themed rounds, to draw questions from some categories.
+        self.theme = None
+        # The RapidFire while a rapid-fire round is being played.
+        self.rapid = None
+        self.votes = 0
+        self.voters = []
+        # When the question being asked was.
+        self._asked_at = 0
+
+        minimum, maximum = pace_bounds or (None, None)
+        self._pacer = Pacer(self.play, wait_interval, minimum, maximum,
+                            pace_percentile, pace_window, clock=clock)
+        labels = {'channel': channel}
+        REGISTRY.gauge('trivia_questions_per_hour',
+                       'Questions asked per hour of play.',
+                       labels).set_function(
+                           lambda: self._pacer.questions_per_hour)
+        REGISTRY.gauge('trivia_clue_interval_seconds',
+                       'Seconds between clues.',
+                       labels).set_function(lambda: self._pacer.interval)
+        # So the first question is ready when a round starts.
+        self._prefetch.fill()
+
+    def _get_running(self):
+        return self._pacer.running
+
+    running = property(_get_running)
+
+    def _get_longest_guess(self):
+        if self.rapid is not None:
+            return self.rapid.longest_guess
+        return self.answer.longest_guess
+
+    # Anything longer than this can't answer an open question.
+    longest_guess = property(_get_longest_guess)
+
+    def reloaded(self, questions, cursor, wait_interval, wait_question,
+                 clue_strategy='letters', prefetch_depth=3, pace_bounds=None,
+                 pace_percentile=0.9, pace_window=20):
+        '''
+        Called once this game has been switched to a reloaded copy of the
+        class, with the rebuilt question bank, a new cursor if the ids in
+        it moved (or None) and the timings, clue strategy, prefetch depth
+        and pacing from the config. The question being asked and the round
+        carry on; questions prepared ahead are thrown away. Returns a
+        Deferred that fires once nothing is still reading the old
+        questions.
+        '''
+        self._questions = questions
+        if cursor is not None:
+            self._cursor = cursor
+        self._wait_interval = wait_interval
+        self._wait_question = wait_question
+        self._clue_strategy = clue_strategy
+        self.answer.set_strategy(clue_strategy)
+        if self.rapid is not None:
+            self.rapid.set_strategy(clue_strategy)
+        # The pacer and the prefetcher still hold the old class's methods.
+        minimum, maximum = pace_bounds or (None, None)
+        self._pacer.configure(wait_interval, minimum, maximum,
+                              pace_percentile, pace_window)
+        self._pacer.f = self.play
+        old = self._prefetch
+        old.flush()
+        self._prefetch = Prefetcher(self._pick, self._prepare, prefetch_depth,
+                                    self._defer_to_thread)
+        self._prefetch.fill()
+        return old.idle()
+
+    def save_place(self):
+        '''
+        Saves this game's place in the shuffled questions.
+        '''
+        self._cursor.save()
+
+    def say(self, msg):
+        self._bot._cmsg(self.channel, msg, CRITICAL)
+
+    def start(self, args=None, user=None, rapid=0):
+        '''
+        Starts a round, themed if args are given: a comma separated list
+        of categories, each optionally weighted, e.g. "astrology, music=2".
+        With rapid, it's a rapid-fire round with that many questions open
+        at once. Returns whether it started.
+        '''
+        if self.running:
+            return False
+        elif args:
+            try:
+                self.theme = CategorySampler(self._questions,
+                                             parse_theme(' '.join(args)))
+            except KeyError as e:
+                self._bot._cmsg(user, 'No category matches "{}".'
+                                .format(e.args[0]))
+                return False
+            except ValueError as e:
+                self._bot._cmsg(user, "Bad theme: {}".format(e))
+                return False
+            self.say("Starting a new round of {}!"
+                     .format(', '.join(self.theme.names[:10])))
+        else:
+            self.say("Starting a new round!")
+        # Anything prepared came from all the questions.
+        if args:
+            self._prefetch.flush()
+        self._prefetch.fill()
+        if rapid:
+            self.say("{} questions at a time, answer any of them!"
+                     .format(rapid))
+            self._pacer.start()
+            self.rapid = RapidFire(self, rapid, POINTS, self._pacer)
+            self.asking = True
+            self._bot.mode(self.channel, False, 'm')
+            self.rapid.start()
+        else:
+            self._pacer.start()
+            self.play()
+        return True
+
+    def stop(self):
+        '''
+        Stops the game and thanks people for playing.
+        '''
+        if not self.running:
+            return
+        if self.rapid is not None:
+            self.rapid.stop()
+            self.rapid = None
+        self._pacer.stop()
+        self.asking = False
+        self.round_question_num = 0
+        self.clue_number = 0
+        if self.theme is not None:
+            self.theme = None
+            self._prefetch.flush()
+            self._prefetch.fill()
+        self.say('Thanks for playing!')
+        self._bot._round_over(self)
+        # people should be able to talk
+        self._bot.mode(self.channel, False, 'm')
+
+    def play(self):
+        '''
+        Asks a new question, gives the next clue, or gives up on the
+        question, each time the pacer's deadline comes round: a clue
+        interval after asking or the last clue, and wait_question after
+        giving up.
+        '''
+        if self.round_question_num > self.round_questions:
+            self.say("Round complete!")
+            self.stop()
+            return
+
+        if self.clue_number == 0:
+            started = now()
+            self.round_question_num += 1
+            self.votes = 0
+            self.voters = []
+            self.new_question()
+            self.current_points = POINTS[self.clue_number]
+            # Blank line.
+            self.say("")
+            self.say("Next Question [{}/{}]:".format(self.round_question_num,
+                                                     self.round_questions))
+            self.say(self.question)
+            self.say("Clue: {}".format(self.answer.current_clue()))
+            ASK_SECONDS.observe(now() - started)
+            self.clue_number += 1
+            self.asking = True
+            self._asked_at = self._pacer.clock.seconds()
+            self._pacer.asked()
+            # let people speak ; -)
+            self._bot.mode(self.channel, False, 'm')
+            self._pacer.after(self._pacer.interval)
+        # we must be somewhere in between
+        elif self.clue_number < 4:
+            self.current_points = POINTS[self.clue_number]
+            self.say("Question [{}/{}]:".format(self.round_question_num,
+                                                self.round_questions))
+            self.say(self.question)
+            self.say("Clue: {}".format(self.answer.give_clue()))
+            self.clue_number += 1
+            self._pacer.after(self._pacer.interval)
+        # no one must have gotten it.
+        else:
+            self._pacer.observe(self._pacer.clock.seconds() - self._asked_at)
+            self.asking = False
+            self._bot.mode(self.channel, True, 'm')
+            self.say("No one got it. The answer was: {}"
+                     .format(self.answer.answer))
+            self.clue_number = 0
+            if self.round_question_num >= self.round_questions:
+                self.say("Round complete!")
+                self.stop()
+            else:
+                self.say("Next question in {} seconds."
+                         .format(self._wait_question))
+                self._pacer.after(self._wait_question)
+
+    def match(self, guess):
+        '''
+        Which open question guess answers: 0 for the one question of an
+        ordinary round, its number in a rapid-fire round, or None.
+        '''
+        if self.rapid is not None:
+            return self.rapid.match(guess)
+        if self.answer.matches(guess):
+            return 0
+        return None
+
+    def winner(self, user, which=0):
+        '''
+        Congratulates the winner for guessing correctly and has the bot
+        score it, then moves on to the next question. which is the
+        question they answered, as returned by match.
+        '''
+        if self.rapid is not None:
+            self.rapid.winner(user, which)
+            return
+        self._pacer.observe(self._pacer.clock.seconds() - self._asked_at)
+        self.asking = False
+        # mute the channel when announcing score
+        self._bot.mode(self.channel, True, 'm')
+
+        team = self._bot._award(user, self.current_points)
+        if team is not None:
+            self.say("{} ({}) GOT IT!".format(team.upper(), user.upper()))
+        else:
+            self.say("{} GOT IT!".format(user.upper()))
+        self.say("If there was any doubt, the correct answer was: {}"
+                 .format(self.answer.answer))
+        if self.current_points == 1:
+            self.say("{} point has been added to your score!"
+                     .format(self.current_points))
+        else:
+            self.say("{} points have been added to your score!"
+                     .format(self.current_points))
+
+        self.clue_number = 0
+
+        if self.round_question_num >= self.round_questions:
+            self.say("Round complete!")
+            self.stop()
+        else:
+            self.say("Next question in {} seconds."
+                     .format(self._wait_question))
+            self._pacer.restart(self._wait_question)
+
+    def skip(self):
+        '''
+        Gives up on the current question and moves on.
+        '''
+        if not self.running:
+            self.say("We are not playing right now.")
+            return
+        if self.rapid is not None:
+            self.say("Questions can't be skipped in a rapid-fire round.")
+            return
+        self.say("Question has been skipped. The answer was: {}"
+                 .format(self.answer.answer))
+        self.asking = False
+        self.clue_number = 0
+        self._pacer.call_now()
+
+    def vote(self, user):
+        '''
+        Counts a vote to skip the question; three skip it.
+        '''
+        if not self.running:
+            self.say("We aren't playing right now.")
+            return
+        if user in self.voters:
+            self.say("You already voted, {}, give someone else a chance to "
+                     "hate this question".format(user))
+        elif self.votes < 2:
+            self.votes += 1
+            self.voters.append(user)
+            self.say("{}, you have voted. {} more votes needed to "
+                     "skip.".format(user, 3 - self.votes))
+        else:
+            self.votes = 0
+            self.voters = []
+            self.skip()
+
+    def give_clue(self):
+        if not self.running:
+            self.say("we are not playing right now.")
+            return
+        if self.rapid is not None:
+            self.rapid.repeat()
+            return
+        self.say("Question [{}/{}]: ".format(self.round_question_num,
+                                             self.round_questions))
+        self.say(self.question)
+        self.say("Clue: " + self.answer.current_clue())
+
+    def new_question(self):
+        '''
+        Selects a new question from the question bank and sets it.
+
+        Questions come in a shuffled order that survives restarts, so
+        nothing is asked twice until the whole bank has been used. Broken
+        lines are weeded out when the bank is compiled, so this never has
+        to retry. The next few are prepared ahead, off the reactor, so
+        this normally only takes the first of them.
+        '''
+        started = now()
+        self.question, self.answer = self._prefetch.pop()
+        QUESTIONS.inc()
+        NEW_QUESTION_SECONDS.observe(now() - started)
+
+    def _pick(self):
+        if self.theme is not None:
+            return self.theme.sample()
+        return self._cursor.next()
+
+    def _prepare(self, index):
+        '''
+        The question at index and its answer, ready to ask. Runs on a
+        thread.
+        '''
+        question, answer, keys = self._questions[index]
+        return question, Answer(answer, keys, self._clue_strategy)
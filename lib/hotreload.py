@@ -0,0 +1,106 @@
+import sys
+import types
+from collections import deque
+
+
+# The game logic that can be swapped while the bot is running, each after
+# the modules it imports.
+GAME_MODULES = ('lib.matching', 'lib.clues', 'lib.answer', 'lib.sampling',
+                'lib.inbound', 'lib.questionbank', 'lib.shuffle',
+                'lib.prefetch', 'lib.pacing', 'lib.rapidfire',
+                'lib.game')
+
+
+def read_config(filename):
+    '''
+    Reads the config file at filename into a new module, leaving the
+    config in use alone.
+    '''
+    if filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+    config = types.ModuleType('config')
+    config.__file__ = filename
+    with open(filename) as handle:
+        source = handle.read()
+    exec(compile(source, filename, 'exec'), config.__dict__)
+    return config
+
+
+def install(modules):
+    '''
+    Puts a {name: module} dict in sys.modules and on the parent packages.
+    A module of None is removed.
+    '''
+    for name, module in modules.items():
+        parent, _, child = name.rpartition('.')
+        if module is None:
+            sys.modules.pop(name, None)
+            continue
+        sys.modules[name] = module
+        if parent in sys.modules:
+            setattr(sys.modules[parent], child, module)
+
+
+def import_fresh(names):
+    '''
+    Imports new copies of the modules in names, in order, so each sees the
+    new copies before it. The old copies are left as they were for
+    whatever still holds them.
+
+    Returns ({name: old module}, {name: new module}); install() the old
+    ones to go back. If any import fails, the old ones are put back and
+    the error raised.
+    '''
+    previous = dict((name, sys.modules.get(name)) for name in names)
+    for name in names:
+        sys.modules.pop(name, None)
+    fresh = {}
+    try:
+        for name in names:
+            __import__(name)
+            fresh[name] = sys.modules[name]
+    except:
+        install(previous)
+        raise
+    return previous, fresh
+
+
+def rebind(namespace, fresh):
+    '''
+    Points names in namespace (a module's globals) that were imported
+    from the old copies of fresh's modules at the new copies.
+    '''
+    for name, value in list(namespace.items()):
+        module = fresh.get(getattr(value, '__module__', None))
+        if module is not None and hasattr(module, name):
+            namespace[name] = getattr(module, name)
+
+
+def swap_classes(obj, fresh, _seen=None):
+    '''
+    Switches obj, and everything it holds that was built from fresh's
+    modules, to the new copies of their classes, so the state stays and
+    the code changes. Lists, tuples, sets, deques and dict values are
+    looked through, wherever they are; other objects from other modules
+    aren't looked into.
+    '''
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return
+    _seen.add(id(obj))
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in list(obj):
+            swap_classes(item, fresh, _seen)
+        return
+    cls = getattr(obj, '__class__', None)
+    module = fresh.get(getattr(cls, '__module__', None))
+    if module is None or not hasattr(obj, '__dict__'):
+        return
+    new = getattr(module, cls.__name__, None)
+    if new is not None and new is not cls:
+        obj.__class__ = new
+    for value in list(vars(obj).values()):
+        swap_classes(value, fresh, _seen)
@@ -0,0 +1,40 @@
+import string
+
+
+if str is bytes:
+    _UNPRINTABLE = ''.join(chr(i) for i in range(256)
+                           if chr(i) not in string.printable)
+
+    def sanitize(msg):
+        '''
+        Strips everything that isn't printable ASCII out of a message.
+        '''
+        return msg.translate(None, _UNPRINTABLE)
+else:
+    _UNPRINTABLE = dict.fromkeys(i for i in range(128)
+                                 if chr(i) not in string.printable)
+
+    def sanitize(msg):
+        '''
+        Strips everything that isn't printable ASCII out of a message.
+        '''
+        return msg.encode('ascii', 'ignore').decode('ascii').translate(
+            _UNPRINTABLE)
+
+
+def parse_command(msg, nickname):
+    '''
+    Splits a command addressed to the bot, either "!command args..." or
+    "nickname: command args...", into a (command, args) pair.
+
+    Returns None if there's no command in msg.
+    '''
+    if msg.startswith('!'):
+        words = msg.lstrip('!').split()
+    elif msg.startswith(nickname):
+        words = msg.split()[1:]
+    else:
+        return None
+    if not words:
+        return None
+    return words[0], words[1:]
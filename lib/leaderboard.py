@@ -0,0 +1,164 @@
+import random
+
+
+# Enough levels for a few million players before the skip list degrades.
+MAX_LEVEL = 24
+
+
+class _Node:
+
+    def __init__(self, key, height):
+        self.key = key
+        self.next = [None] * height
+        # How many places each link moves forward in the order.
+        self.width = [1] * height
+
+
+class Leaderboard:
+    '''
+    Scores kept in ranked order as they change.
+
+    An indexable skip list ordered by (-points, name): each link records
+    how many players it jumps over, so updating a score, finding a rank
+    and finding the player at a rank all take O(log n), and a page of
+    standings is O(log n + page size), however many players there are.
+    Ties are broken alphabetically so every player has a distinct rank.
+    '''
+
+    def __init__(self, scores=None, seed=None):
+        self._random = random.Random(seed)
+        self._head = _Node(None, MAX_LEVEL)
+        self._points = {}
+        if scores:
+            for name, points in scores.items():
+                self.set(name, points)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, name):
+        return name in self._points
+
+    def points(self, name, default=None):
+        return self._points.get(name, default)
+
+    def _height(self):
+        height = 1
+        while height < MAX_LEVEL and self._random.random() < 0.5:
+            height += 1
+        return height
+
+    def _find(self, key):
+        '''
+        Returns the last node before key on every level, and how far each
+        of them is from the head.
+        '''
+        chain = [None] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node = self._head
+        position = 0
+        for level in range(MAX_LEVEL - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                position += node.width[level]
+                node = following
+                following = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def _insert(self, key):
+        chain, positions = self._find(key)
+        node = _Node(key, self._height())
+        # The new node sits just after chain[0].
+        position = positions[0] + 1
+        for level in range(len(node.next)):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            skipped = position - positions[level]
+            node.width[level] = previous.width[level] - skipped + 1
+            previous.width[level] = skipped
+        for level in range(len(node.next), MAX_LEVEL):
+            chain[level].width[level] += 1
+
+    def _remove(self, key):
+        chain, positions = self._find(key)
+        node = chain[0].next[0]
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVEL):
+            chain[level].width[level] -= 1
+
+    def set(self, name, points):
+        '''
+        Sets name's score, adding them if they're new.
+        '''
+        if name in self._points:
+            if self._points[name] == points:
+                return
+            self._remove((-self._points[name], name))
+        self._points[name] = points
+        self._insert((-points, name))
+
+    def add(self, name, points):
+        '''
+        Adds points to name's score, and returns the new score.
+        '''
+        total = self._points.get(name, 0) + points
+        self.set(name, total)
+        return total
+
+    def discard(self, name):
+        if name in self._points:
+            self._remove((-self._points.pop(name), name))
+
+    def rank(self, name):
+        '''
+        name's place in the standings, from 1, or None if they haven't
+        scored.
+        '''
+        if name not in self._points:
+            return None
+        chain, positions = self._find((-self._points[name], name))
+        return positions[0] + 1
+
+    def page(self, start, count):
+        '''
+        Up to count (rank, name, points) entries, from the start'th place
+        (counting from 0).
+        '''
+        if start < 0 or start >= len(self._points):
+            return []
+        # Walk down to the node just before the start'th, then along.
+        node = self._head
+        remaining = start
+        for level in range(MAX_LEVEL - 1, -1, -1):
+            while node.next[level] is not None and \
+                    node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        entries = []
+        node = node.next[0]
+        rank = start + 1
+        while node is not None and len(entries) < count:
+            entries.append((rank, node.key[1], -node.key[0]))
+            node = node.next[0]
+            rank += 1
+        return entries
+
+    def top(self, count):
+        return self.page(0, count)
+
+    def around(self, name, distance):
+        '''
+        The entries from distance places above name to distance places
+        below, or [] if name hasn't scored.
+        '''
+        rank = self.rank(name)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - distance)
+        return self.page(start, rank - start + distance)
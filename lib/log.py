@@ -0,0 +1,248 @@
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+NAMES = dict((number, name) for name, number in LEVELS.items())
+
+
+def level_named(name):
+    try:
+        return LEVELS[name.lower()]
+    except KeyError:
+        raise ValueError("log level must be one of {}, not {!r}"
+                         .format(', '.join(sorted(LEVELS)), name))
+
+
+def encode(record):
+    '''
+    record as one line of JSON. Anything JSON can't hold is written as its
+    repr(), so a log line is never lost to what's in it.
+    '''
+    try:
+        return json.dumps(record, default=repr) + '\n'
+    except (TypeError, ValueError, UnicodeDecodeError):
+        # Python 2 bytes that aren't UTF-8, like some IRC lines.
+        return json.dumps(collections.OrderedDict(
+            (key, value if isinstance(value, (int, float)) else repr(value))
+            for key, value in record.items())) + '\n'
+
+
+class StreamWriter:
+    '''
+    Writes each line straight to a stream, sys.stdout unless told
+    otherwise. What the log uses until it's given something better, and
+    in tests.
+    '''
+
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    def write(self, line):
+        (self._stream or sys.stdout).write(line)
+
+    def close(self):
+        pass
+
+
+class BufferedWriter:
+    '''
+    Writes lines to filename, or to stream, on a thread of its own, so
+    whoever logs never waits on the disk or a terminal.
+
+    write() only queues the line. If capacity lines are already waiting,
+    the writer has fallen behind and the line is dropped and counted in
+    dropped, rather than holding up the game. Once the file reaches
+    max_bytes it's moved to filename.1, that to filename.2 and so on, up to
+    backups of them, and a new file started; a max_bytes of 0 never
+    rotates.
+    '''
+
+    def __init__(self, filename=None, stream=None, max_bytes=0, backups=5,
+                 capacity=10000):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.capacity = capacity
+        self.dropped = 0
+        self.rotations = 0
+        self._lines = collections.deque()
+        self._ready = threading.Condition()
+        self._closing = False
+        if filename is not None:
+            self._stream = open(filename, 'a')
+            self._size = self._stream.tell()
+        else:
+            self._stream = stream or sys.stdout
+            self._size = 0
+        self._thread = threading.Thread(target=self._run, name='log writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, line):
+        if len(self._lines) >= self.capacity:
+            self.dropped += 1
+            return
+        self._lines.append(line)
+        with self._ready:
+            self._ready.notify()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._lines and not self._closing:
+                    self._ready.wait()
+                if not self._lines and self._closing:
+                    return
+            batch = []
+            while self._lines:
+                batch.append(self._lines.popleft())
+            self._write(''.join(batch))
+
+    def _write(self, text):
+        if (self.filename is not None and self.max_bytes and self._size and
+                self._size + len(text) > self.max_bytes):
+            self._rotate()
+        self._stream.write(text)
+        self._stream.flush()
+        self._size += len(text)
+
+    def _rotate(self):
+        self._stream.close()
+        if self.backups:
+            oldest = '{}.{}'.format(self.filename, self.backups)
+            if os.path.exists(oldest):
+                os.remove(oldest)
+            for number in range(self.backups - 1, 0, -1):
+                older = '{}.{}'.format(self.filename, number)
+                if os.path.exists(older):
+                    os.rename(older, '{}.{}'.format(self.filename,
+                                                    number + 1))
+            os.rename(self.filename, self.filename + '.1')
+        else:
+            os.remove(self.filename)
+        self._stream = open(self.filename, 'a')
+        self._size = 0
+        self.rotations += 1
+
+    def close(self):
+        '''
+        Writes out whatever is waiting and stops the thread.
+        '''
+        with self._ready:
+            self._closing = True
+            self._ready.notify()
+        self._thread.join()
+        if self.filename is not None:
+            self._stream.close()
+
+
+class RateLimit:
+    '''
+    Lets through at most rate things a second. allow() says whether this
+    one goes through, and how many didn't since the last that did.
+    '''
+
+    def __init__(self, rate, clock=time.time):
+        self.rate = rate
+        self._clock = clock
+        self._second = None
+        self._allowed = 0
+        self._suppressed = 0
+
+    def allow(self):
+        second = int(self._clock())
+        if second != self._second:
+            self._second = second
+            self._allowed = 0
+        if self._allowed >= self.rate:
+            self._suppressed += 1
+            return False, 0
+        self._allowed += 1
+        suppressed, self._suppressed = self._suppressed, 0
+        return True, suppressed
+
+
+class Logger:
+    '''
+    Writes records of what happened as JSON lines: the time, the level,
+    a short event name and whatever fields go with it.
+
+    Nothing is formatted for a record below level, so passing a big dict
+    as a field costs nothing unless it's going to be written. chatter()
+    is for things anybody can cause as often as they like; only
+    chatter_rate of those are written a second.
+    '''
+
+    def __init__(self, writer=None, level=INFO, chatter_rate=10,
+                 clock=time.time):
+        self.writer = writer or StreamWriter()
+        self.level = level
+        self._clock = clock
+        self._chatter = RateLimit(chatter_rate, clock)
+
+    def configure(self, writer=None, level=None, chatter_rate=None):
+        '''
+        Changes whatever is given; the old writer is closed.
+        '''
+        if writer is not None:
+            old, self.writer = self.writer, writer
+            old.close()
+        if level is not None:
+            self.level = level
+        if chatter_rate is not None:
+            self._chatter.rate = chatter_rate
+
+    def log(self, level, event, **fields):
+        if level < self.level:
+            return
+        record = collections.OrderedDict()
+        record['time'] = round(self._clock(), 3)
+        record['level'] = NAMES.get(level, level)
+        record['event'] = event
+        for key in sorted(fields):
+            record[key] = fields[key]
+        self.writer.write(encode(record))
+
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+
+    def chatter(self, level, event, **fields):
+        '''
+        Logs like log(), unless chatter_rate records have been through
+        here this second. The next one that is written carries how many
+        were left out, as suppressed.
+        '''
+        if level < self.level:
+            return
+        allowed, suppressed = self._chatter.allow()
+        if not allowed:
+            return
+        if suppressed:
+            fields['suppressed'] = suppressed
+        self.log(level, event, **fields)
+
+    def close(self):
+        self.writer.close()
+
+
+# The bot's log.
+LOG = Logger()
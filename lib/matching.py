@@ -0,0 +1,193 @@
+import re
+
+
+# Alternate answers are separated with this in the question files, e.g.
+# "colour|color".
+ALTERNATE = '|'
+ARTICLES = ('the', 'a', 'an')
+NUMBERS = dict((word, str(value)) for value, word in enumerate(
+    'zero one two three four five six seven eight nine ten eleven twelve '
+    'thirteen fourteen fifteen sixteen seventeen eighteen nineteen '
+    'twenty'.split()))
+
+# Guesses this much longer than the longest key can't possibly match, and
+# are rejected before any work is done on them.
+LENGTH_SLACK = 16
+
+if str is bytes:
+    # Byte strings, so the curly quotes are matched by their UTF-8 encoding.
+    _QUOTES = re.compile('[\'"`]|\xe2\x80[\x98\x99\x9c\x9d]')
+else:
+    _QUOTES = re.compile(u'[\'"`\u2018\u2019\u201c\u201d]')
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3})')
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+_ROMAN = re.compile(r'm{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+
+
+def normalize(text):
+    '''
+    Reduces an answer or a guess to the form they're compared in: lower
+    case, no quotes or punctuation, no leading article, numbers written
+    with digits and without thousands separators.
+
+    '"The Beatles!"' and 'beatles' both become 'beatles', '40,000' and
+    '40000' both become '40000'.
+    '''
+    text = _QUOTES.sub('', text.lower())
+    if ',' in text:
+        text = _THOUSANDS.sub('', text)
+    words = _NON_WORD.sub(' ', text).split()
+    if len(words) > 1 and words[0] in ARTICLES:
+        del words[0]
+    return ' '.join([NUMBERS.get(word, word) for word in words])
+
+
+def answer_keys(answer):
+    '''
+    Returns the normalized forms of an answer and its alternates.
+
+    Alternates that normalize to a single character are dropped, so a stray
+    separator can't make "a" a right answer. Answers that are nothing but
+    punctuation, like "+", are kept as they are.
+    '''
+    keys = []
+    for alternate in answer.split(ALTERNATE):
+        key = normalize(alternate)
+        if len(key) > 1 and key not in keys:
+            keys.append(key)
+    whole = normalize(answer)
+    if whole and whole not in keys:
+        keys.append(whole)
+    if not keys:
+        keys.append(answer.lower().strip())
+    return keys
+
+
+def exact_word(word):
+    '''
+    True for words that must be given exactly: anything with a digit in
+    it, and Roman numerals. "apollo 12" is a different answer from
+    "apollo 11", and "henry vii" from "henry viii", however close.
+    '''
+    return (any(character.isdigit() for character in word) or
+            bool(word) and _ROMAN.match(word) is not None)
+
+
+def split_key(key):
+    '''
+    Splits a normalized key or guess into the tuple of its exact words, in
+    order, and the rest of its words joined, which typos are allowed in.
+    '''
+    exact = []
+    words = []
+    for word in key.split():
+        if exact_word(word):
+            exact.append(word)
+        else:
+            words.append(word)
+    return tuple(exact), ' '.join(words)
+
+
+def tolerance(key):
+    '''
+    How many typos a guess for key may contain, all in its plain words.
+    Short answers, and those that are only numbers, must be exact.
+    '''
+    words = split_key(key)[1]
+    if len(words) < 5:
+        return 0
+    if len(words) < 10:
+        return 1
+    return 2
+
+
+def within_distance(a, b, limit):
+    '''
+    True if the Levenshtein distance between a and b is at most limit.
+
+    The common prefix and suffix are trimmed off first, then only the
+    diagonal band of width 2 * limit + 1 is computed, stopping as soon as a
+    whole row is over the limit, so this is O(len * limit) at worst and
+    usually much less.
+    '''
+    if abs(len(a) - len(b)) > limit:
+        return False
+    shortest = min(len(a), len(b))
+    start = 0
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) <= limit:
+        return True
+
+    over = limit + 1
+    previous = list(range(len(b) + 1))
+    current = [over] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current[low - 1] = i if low == 1 else over
+        best = over
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return False
+        if high < len(b):
+            current[high + 1] = over
+        previous, current = current, previous
+    return previous[len(b)] <= limit
+
+
+class Matcher:
+    '''
+    Decides whether a guess is right for a set of answer keys.
+
+    Everything that depends only on the answer is worked out up front, so
+    checking a guess is a bounded normalization, a hash lookup and, for the
+    near misses, a banded edit distance check against each key. Numbers
+    and numerals in a near miss must still be exactly right; only the
+    other words are checked for typos.
+    '''
+
+    def __init__(self, keys):
+        self._keys = frozenset(keys)
+        self._fuzzy = [split_key(key) + (tolerance(key),) for key in keys
+                       if tolerance(key)]
+        self.longest_guess = max([len(key) for key in keys] or [0]) + \
+            LENGTH_SLACK
+
+    def matches(self, guess):
+        if len(guess) > self.longest_guess:
+            return False
+        normalized = normalize(guess)
+        if normalized in self._keys:
+            return True
+        if not normalized:
+            # Only punctuation, which only a punctuation answer can match.
+            return guess.lower().strip() in self._keys
+        if not self._fuzzy:
+            return False
+        exact, words = split_key(normalized)
+        for key_exact, key_words, limit in self._fuzzy:
+            if exact == key_exact and within_distance(words, key_words,
+                                                      limit):
+                return True
+        return False
+
+    def _get_keys(self):
+        return sorted(self._keys)
+
+    keys = property(_get_keys)
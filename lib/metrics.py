@@ -0,0 +1,186 @@
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+# The best clock for timing short things.
+now = getattr(time, 'perf_counter', time.time)
+
+# From 10us to a second; anything slower than that is trouble anyway.
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs) + '}'
+
+
+class Counter:
+    '''
+    A count that only goes up. inc() is just an addition, so it can sit
+    on any path.
+    '''
+    TYPE = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge:
+    '''
+    A value that goes up and down: set() it, or give it a function to
+    ask when the metrics are read.
+    '''
+    TYPE = 'gauge'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def get(self):
+        if self._function is not None:
+            return self._function()
+        return self.value
+
+    def samples(self):
+        return [(self.name, self.labels, self.get())]
+
+
+class Histogram:
+    '''
+    Counts of observations in fixed buckets, plus their sum. observe() is
+    a binary search over the bucket bounds and three additions.
+    '''
+    TYPE = 'histogram'
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._bounds = sorted(buckets)
+        # One more for everything over the last bound.
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        samples = []
+        total = 0
+        for bound, count in zip(self._bounds + [float('inf')],
+                                self._counts):
+            total += count
+            samples.append((self.name + '_bucket',
+                            self.labels + (('le', _number(bound)),), total))
+        samples.append((self.name + '_sum', self.labels, self.sum))
+        samples.append((self.name + '_count', self.labels, total))
+        return samples
+
+
+class Registry:
+    '''
+    Every metric the bot keeps, by name and labels, to be read in the
+    Prometheus text format.
+
+    Asking for a metric that already exists returns it, so modules can
+    make theirs when they're imported, and again when they're reloaded.
+    '''
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+
+    def _get(self, kind, name, help, labels, *args):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = kind(name, help, key[1], *args)
+        elif metric.TYPE != kind.TYPE:
+            raise ValueError("{} is already a {}".format(name, metric.TYPE))
+        return metric
+
+    def counter(self, name, help, labels=None):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=None):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=None, buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        '''
+        All the metrics in the Prometheus text exposition format.
+        '''
+        families = OrderedDict()
+        for metric in self._metrics.values():
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, metrics in families.items():
+            lines.append('# HELP {} {}'.format(name, metrics[0].help))
+            lines.append('# TYPE {} {}'.format(name, metrics[0].TYPE))
+            for metric in metrics:
+                for sample, labels, value in metric.samples():
+                    lines.append('{}{} {}'.format(sample, _labels(labels),
+                                                  _number(value)))
+        return '\n'.join(lines) + '\n'
+
+
+# The bot's metrics, made by the modules that keep them.
+REGISTRY = Registry()
+
+
+def metrics_site(registry=REGISTRY):
+    '''
+    A twisted.web site serving registry at /metrics.
+    '''
+    from twisted.web import resource, server
+
+    class Metrics(resource.Resource):
+        isLeaf = True
+
+        def render_GET(self, request):
+            request.setHeader(b'content-type', CONTENT_TYPE.encode('ascii'))
+            return registry.render().encode('utf-8')
+
+    root = resource.Resource()
+    root.putChild(b'metrics', Metrics())
+    return server.Site(root)
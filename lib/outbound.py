@@ -0,0 +1,214 @@
+from collections import deque, OrderedDict
+
+
+# Longest line a server will relay, CR LF included.
+MAX_LINE = 512
+# A relayed PRIVMSG starts with the sender's ":nick!user@host ", and the
+# user and host parts can take up to this many bytes on common servers.
+USER_HOST = 10 + 63
+# Put between lines merged into one message.
+SEPARATOR = ' | '
+
+
+def size(text):
+    '''
+    Bytes text takes on the wire.
+    '''
+    if isinstance(text, bytes):
+        return len(text)
+    return len(text.encode('utf-8'))
+
+
+def budget(nickname, destination):
+    '''
+    Bytes left for the text of a PRIVMSG to destination once the server
+    has added its prefix, so nothing is cut off when it's relayed.
+    '''
+    envelope = ':{}!@ PRIVMSG {} :\r\n'.format(nickname, destination)
+    return MAX_LINE - USER_HOST - size(envelope)
+
+
+def split(line, limit):
+    '''
+    Breaks a line longer than limit bytes into pieces that fit, at spaces
+    where possible.
+    '''
+    pieces = []
+    while size(line) > limit:
+        cut = len(line)
+        while cut and size(line[:cut]) > limit:
+            cut = line.rfind(' ', 0, cut)
+            if cut <= 0:
+                # One enormous word; cut it anywhere.
+                cut = limit
+                while size(line[:cut]) > limit:
+                    cut -= 1
+                break
+        pieces.append(line[:cut])
+        line = line[cut:].lstrip(' ')
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+# Priority classes, most urgent first.
+CRITICAL, INFO, PRIVATE = range(3)
+PRIORITIES = ('critical', 'info', 'private')
+
+
+class OutboundScheduler:
+    '''
+    Paces everything the bot says to one line every line_rate seconds,
+    in place of the protocol's single first in, first out queue.
+
+    Lines wait in a queue per priority class (CRITICAL game play, INFO
+    replies in a channel, PRIVATE replies) and destination. Each time a
+    line may be sent, the most urgent class with anything waiting is
+    served, taking its destinations in turn, so a long private reply can't
+    hold up a clue and one user can't hold up another. Lines for the
+    destination being served are packed into one message, as many as fit
+    in limit(destination) bytes. Queues of the lesser classes hold at most
+    depth lines each; when they're full the oldest are dropped.
+
+    Protocol commands that have to stay in order with the messages around
+    them, like mode changes, can be queued with call().
+    '''
+
+    def __init__(self, send, limit, prefix='', line_rate=None, depth=30,
+                 clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self._send = send
+        self._limit = limit
+        self._prefix = prefix
+        self._line_rate = line_rate
+        self._depth = depth
+        self._clock = clock
+        # Per class, an ordered map of destination to its waiting
+        # (queued at, line or function) entries; served from the front.
+        self._queues = [OrderedDict() for _ in PRIORITIES]
+        self._timer = None
+        self._last_sent = None
+
+        self.lines = 0
+        self.messages = 0
+        self.bytes_sent = 0
+        self.prefix_bytes_saved = 0
+        self.dropped = [0] * len(PRIORITIES)
+        self.sent = [0] * len(PRIORITIES)
+        self.total_wait = [0.0] * len(PRIORITIES)
+        self.max_wait = [0.0] * len(PRIORITIES)
+
+    def configure(self, prefix, line_rate, depth):
+        '''
+        Changes the colour prefix, pace and queue depth as the bot runs.
+        Lines already waiting keep their place.
+        '''
+        self._prefix = prefix
+        self._line_rate = line_rate
+        self._depth = depth
+
+    def queue(self, destination, line, priority=PRIVATE):
+        '''
+        Queues line to be sent to destination. Lines too long for one
+        message are split, and blank lines are dropped.
+        '''
+        room = self._limit(destination) - size(self._prefix)
+        for piece in split(line, room):
+            self._add(priority, destination, piece)
+
+    def call(self, function, destination=None, priority=CRITICAL):
+        '''
+        Queues function to be called in turn with the messages to
+        destination, taking up a line of its own.
+        '''
+        self._add(priority, destination, function)
+
+    def _add(self, priority, destination, item):
+        if not self._line_rate:
+            # Nothing is throttled, so there's nothing to win by waiting.
+            self._deliver(priority, destination, [item])
+            return
+        queues = self._queues[priority]
+        waiting = queues.get(destination)
+        if waiting is None:
+            waiting = queues[destination] = deque()
+        waiting.append((self._clock.seconds(), item))
+        if priority != CRITICAL and len(waiting) > self._depth:
+            waiting.popleft()
+            self.dropped[priority] += 1
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is not None:
+            return
+        delay = 0
+        if self._last_sent is not None:
+            delay = max(0, self._last_sent + (self._line_rate or 0) -
+                        self._clock.seconds())
+        # Even with no wait, send on the next turn so everything said in
+        # this one can be packed together.
+        self._timer = self._clock.callLater(delay, self._send_next)
+
+    def _send_next(self):
+        self._timer = None
+        for priority, queues in enumerate(self._queues):
+            if queues:
+                break
+        else:
+            return
+        destination = next(iter(queues))
+        waiting = queues.pop(destination)
+        now = self._clock.seconds()
+
+        queued_at, item = waiting.popleft()
+        items = [item]
+        if not callable(item):
+            room = self._limit(destination) - size(self._prefix)
+            used = size(item)
+            while waiting and not callable(waiting[0][1]) and \
+                    used + size(SEPARATOR) + size(waiting[0][1]) <= room:
+                used += size(SEPARATOR) + size(waiting[0][1])
+                items.append(waiting.popleft()[1])
+        self._waited(priority, now - queued_at)
+        self._deliver(priority, destination, items)
+        self._last_sent = now
+
+        if waiting:
+            # To the back of the line, behind the other destinations.
+            queues[destination] = waiting
+        if any(self._queues):
+            self._schedule()
+
+    def _waited(self, priority, wait):
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+
+    def _deliver(self, priority, destination, items):
+        if callable(items[0]):
+            self.sent[priority] += 1
+            items[0]()
+            return
+        message = self._prefix + SEPARATOR.join(items)
+        self.lines += len(items)
+        self.messages += 1
+        self.sent[priority] += 1
+        self.bytes_sent += size(message)
+        self.prefix_bytes_saved += size(self._prefix) * (len(items) - 1)
+        self._send(destination, message)
+
+    def depth(self, priority):
+        '''
+        How many lines and calls of a class are waiting.
+        '''
+        return sum(len(waiting) for waiting in self._queues[priority].values())
+
+    def mean_wait(self, priority):
+        if not self.sent[priority]:
+            return 0.0
+        return self.total_wait[priority] / self.sent[priority]
+
+    def _get_time_saved(self):
+        return max(0, self.lines - self.messages) * (self._line_rate or 0)
+
+    time_saved = property(_get_time_saved)
@@ -0,0 +1,184 @@
+from collections import deque
+
+
+# Answer times needed before the clue interval moves from where it starts.
+MIN_SAMPLES = 5
+
+
+class Timer:
+    '''
+    Calls f(*args) at deadlines, one pending call at a time. after()
+    counts from the last deadline rather than from when the call actually
+    ran, so a late reactor doesn't make the calls drift; restart() counts
+    from now, for when something like a right answer happens between
+    deadlines, and drops whatever was pending. start() makes now the last
+    deadline.
+    '''
+
+    def __init__(self, clock, f, *args):
+        self._clock = clock
+        self._f = f
+        self._args = args
+        self._call = None
+        self.deadline = None
+
+    def start(self):
+        self.cancel()
+        self.deadline = self._clock.seconds()
+
+    def after(self, delay):
+        '''
+        Calls f delay seconds after the last deadline.
+        '''
+        self._schedule(self.deadline + delay)
+
+    def restart(self, delay):
+        '''
+        Calls f delay seconds from now, instead of whatever was pending.
+        '''
+        self._schedule(self._clock.seconds() + delay)
+
+    def _schedule(self, deadline):
+        self.cancel()
+        self.deadline = deadline
+        self._call = self._clock.callLater(
+            max(0, deadline - self._clock.seconds()), self._fire)
+
+    def _fire(self):
+        self._call = None
+        self._f(*self._args)
+
+    def cancel(self):
+        if self._call is not None:
+            self._call.cancel()
+            self._call = None
+
+
+class Pacer:
+    '''
+    Owns a game's timers. Its own Timer calls f, for the game's question
+    and clues, through start(), after(), restart() and call_now(); timer()
+    makes more, for rapid-fire rounds' questions, and stop() cancels them
+    all.
+
+    It also sets the clue interval. The times questions took to be
+    answered, or given up on, are kept for the last window questions, and
+    the interval is set so that the percentile one of them falls on the
+    last clue, steps intervals after the question was asked, kept between
+    minimum and maximum. When most answers come early it shortens, and
+    when more than the rest are given up on it lengthens, by a third at
+    most each time. With minimum and maximum equal it never moves.
+
+    questions_per_hour is how many questions were asked for each hour the
+    game was being played.
+    '''
+
+    def __init__(self, f, interval, minimum=None, maximum=None,
+                 percentile=0.9, window=20, steps=3, clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.clock = clock
+        self.f = f
+        self._steps = steps
+        self._timer = Timer(clock, self._fire)
+        self._timers = []
+        self._times = deque()
+        self.interval = interval
+        self.configure(interval, minimum, maximum, percentile, window)
+
+        self.running = False
+        self.questions = 0
+        self._played = 0.0
+        self._since = None
+
+    def configure(self, interval, minimum=None, maximum=None,
+                  percentile=0.9, window=20):
+        '''
+        Sets the bounds, which are both interval if not given. The interval
+        reached so far is kept, moved inside them if it has to be.
+        '''
+        self.minimum = interval if minimum is None else minimum
+        self.maximum = interval if maximum is None else maximum
+        self.percentile = percentile
+        self.window = window
+        while len(self._times) > window:
+            self._times.popleft()
+        self.interval = min(max(self.interval, self.minimum), self.maximum)
+
+    def start(self):
+        self.running = True
+        self._since = self.clock.seconds()
+        self._timer.start()
+
+    def stop(self):
+        self.cancel()
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+        if self.running:
+            self._played += self.clock.seconds() - self._since
+        self.running = False
+
+    def timer(self, f, *args):
+        '''
+        A Timer calling f(*args), cancelled when the pacer stops.
+        '''
+        timer = Timer(self.clock, f, *args)
+        self._timers.append(timer)
+        return timer
+
+    def after(self, delay):
+        '''
+        Calls f delay seconds after the last deadline.
+        '''
+        self._timer.after(delay)
+
+    def restart(self, delay):
+        '''
+        Calls f delay seconds from now, instead of whatever was pending.
+        '''
+        self._timer.restart(delay)
+
+    def call_now(self):
+        '''
+        Calls f now, instead of whatever was pending, and counts the next
+        deadline from now.
+        '''
+        self._timer.start()
+        self.f()
+
+    def _fire(self):
+        self.f()
+
+    def cancel(self):
+        self._timer.cancel()
+
+    def asked(self):
+        self.questions += 1
+
+    def observe(self, seconds):
+        '''
+        Notes that a question was answered or given up on seconds after it
+        was asked, and moves the clue interval.
+        '''
+        self._times.append(seconds)
+        if len(self._times) > self.window:
+            self._times.popleft()
+        if len(self._times) < MIN_SAMPLES:
+            return
+        ordered = sorted(self._times)
+        target = ordered[min(len(ordered) - 1,
+                             int(len(ordered) * self.percentile))]
+        interval = min(max(float(target) / self._steps, self.interval * 0.75),
+                       self.interval * 4 / 3.0)
+        self.interval = min(max(interval, self.minimum), self.maximum)
+
+    def _get_questions_per_hour(self):
+        played = self._played
+        if self.running:
+            played += self.clock.seconds() - self._since
+        if not played:
+            return 0.0
+        return self.questions / played * 3600
+
+    questions_per_hour = property(_get_questions_per_hour)
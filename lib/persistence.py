@@ -0,0 +1,428 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from lib.log import LOG
+from lib.metrics import REGISTRY
+
+
+SAVE_SECONDS = REGISTRY.histogram(
+    'trivia_save_seconds', 'Time taken to write out each save.',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+             2.5, 5.0, 10.0))
+SAVE_FAILURES = REGISTRY.counter('trivia_save_failures_total',
+                                 'Saves that failed and will be tried again.')
+
+
+def write_json(filename, obj):
+    '''
+    Atomically replaces filename with obj as JSON.
+
+    The data goes to a temporary file in the same directory, which is
+    synced and then renamed over filename, so a crash leaves either the old
+    or the new file and never a truncated one.
+    '''
+    directory, name = os.path.split(filename)
+    fd, tmp = tempfile.mkstemp(prefix='.' + name, dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'w') as savefile:
+            json.dump(obj, savefile)
+            savefile.flush()
+            os.fsync(savefile.fileno())
+        os.rename(tmp, filename)
+    except:
+        os.unlink(tmp)
+        raise
+
+
+def read_json(filename, default):
+    '''
+    Returns the JSON stored in filename, or default if it can't be read.
+    '''
+    try:
+        with open(filename, 'r') as savefile:
+            return json.load(savefile)
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def fill_in(scores, teams):
+    '''
+    Adds any of the top level keys the game expects that are missing.
+    '''
+    scores.setdefault('user', {})
+    scores.setdefault('team', {})
+    teams.setdefault('users', {})
+    teams.setdefault('teams', {})
+    return scores, teams
+
+
+def apply_event(scores, teams, event):
+    '''
+    Replays one journal event onto scores and teams.
+
+    Team events carry the whole team as it was afterwards (or None once it's
+    gone), so replaying them doesn't depend on the rules for owners and
+    team sizes.
+    '''
+    kind = event['e']
+    if kind == 'award':
+        user, team, points = event['user'], event['team'], event['points']
+        scores['user'][user] = scores['user'].get(user, 0) + points
+        if team is not None:
+            scores['team'][team] = scores['team'].get(team, 0) + points
+    elif kind == 'set':
+        scores['user'][event['user']] = event['points']
+    elif kind == 'join':
+        teams['teams'][event['team']] = event['state']
+        teams['users'][event['user']] = event['team']
+    elif kind == 'leave':
+        if event['state'] is None:
+            teams['teams'].pop(event['team'], None)
+        else:
+            teams['teams'][event['team']] = event['state']
+        if teams['users'].get(event['user']) == event['team']:
+            del teams['users'][event['user']]
+    elif kind == 'reset':
+        scores['user'] = {}
+        scores['team'] = {}
+    else:
+        raise ValueError("unknown journal event {!r}".format(kind))
+
+
+def read_events(filename):
+    '''
+    Yields the events in a journal file. A line that doesn't parse, like
+    one cut short by a crash, is skipped.
+    '''
+    try:
+        handle = open(filename, 'r')
+    except (IOError, OSError):
+        return
+    with handle:
+        for line in handle:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                LOG.warning('journal_line_skipped', filename=filename,
+                            line=line)
+
+
+def copy_scores(scores):
+    return dict((kind, dict(table)) for kind, table in scores.items())
+
+
+def copy_teams(teams):
+    copied = {'users': dict(teams.get('users', {})), 'teams': {}}
+    for name, team in teams.get('teams', {}).items():
+        team = dict(team)
+        team['members'] = list(team['members'])
+        copied['teams'][name] = team
+    return copied
+
+
+class GameStore:
+    '''
+    Write-behind storage for scores.json and teams.json.
+
+    Changes only mark the game dirty. The first change starts a timer of
+    window seconds, any further changes in that window are coalesced into
+    the same save, and when it fires the state is copied and written out on
+    a thread, so the reactor never waits on the disk. flush() writes
+    synchronously, for shutting down.
+    '''
+
+    def __init__(self, save_dir, window, clock=None, defer_to_thread=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        if defer_to_thread is None:
+            from twisted.internet.threads import deferToThread
+            defer_to_thread = deferToThread
+        self._scores_file = os.path.join(save_dir, 'scores.json')
+        self._teams_file = os.path.join(save_dir, 'teams.json')
+        self._window = window
+        self._clock = clock
+        self._defer_to_thread = defer_to_thread
+
+        self._scores = None
+        self._teams = None
+        self._dirty = False
+        self._timer = None
+        self._writing = False
+        # Snapshots are numbered so a slow thread can never overwrite a
+        # newer save with an older one.
+        self._lock = threading.Lock()
+        self._taken = 0
+        self._written = 0
+
+        self.saves = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+
+    def load(self):
+        '''
+        Returns the saved (scores, teams), filling in anything missing.
+        '''
+        return fill_in(read_json(self._scores_file, {}),
+                       read_json(self._teams_file, {}))
+
+    def changed(self, scores, teams):
+        '''
+        Notes that the game changed; it'll be saved within window seconds.
+        '''
+        self._scores = scores
+        self._teams = teams
+        if self._dirty:
+            self.coalesced += 1
+            return
+        self._dirty = True
+        if self._timer is None and not self._writing:
+            self._timer = self._clock.callLater(self._window, self._save)
+
+    def record(self, event, scores, teams):
+        '''
+        Notes a change described by event; only the resulting state is
+        saved here.
+        '''
+        self.changed(scores, teams)
+
+    def _snapshot(self):
+        self._dirty = False
+        self._taken += 1
+        return (self._taken, copy_scores(self._scores),
+                copy_teams(self._teams))
+
+    def _save(self):
+        self._timer = None
+        if not self._dirty:
+            return
+        self._writing = True
+        d = self._defer_to_thread(self._write, self._snapshot())
+        d.addCallbacks(self._saved, self._failed)
+
+    def _write(self, snapshot):
+        '''
+        Serializes and writes a snapshot. Runs on a thread.
+        '''
+        number, scores, teams = snapshot
+        with self._lock:
+            if number < self._written:
+                return None
+            started = time.time()
+            write_json(self._scores_file, scores)
+            write_json(self._teams_file, teams)
+            self._written = number
+            return time.time() - started
+
+    def _record(self, duration):
+        if duration is not None:
+            SAVE_SECONDS.observe(duration)
+            self.saves += 1
+            self.last_duration = duration
+            self.max_duration = max(self.max_duration, duration)
+
+    def _saved(self, duration):
+        self._writing = False
+        self._record(duration)
+        if self._dirty:
+            self._timer = self._clock.callLater(self._window, self._save)
+
+    def _failed(self, failure):
+        self._writing = False
+        self._retry(failure.getErrorMessage())
+
+    def _retry(self, error):
+        self.failures += 1
+        SAVE_FAILURES.inc()
+        LOG.error('save_failed', error=error)
+        # Try again next window rather than losing the changes.
+        self._dirty = True
+        if self._timer is None and not self._writing:
+            self._timer = self._clock.callLater(self._window, self._save)
+
+    def flush(self):
+        '''
+        Writes any unsaved changes now, on this thread. Returns whether
+        they were written; if not, the failure is logged and counted and
+        they're tried again next window, as for a save on a thread.
+        '''
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._dirty:
+            try:
+                self._record(self._write_pending())
+            except Exception as e:
+                self._retry(str(e))
+                return False
+        return True
+
+    def _write_pending(self):
+        return self._write(self._snapshot())
+
+    def _get_pending(self):
+        return self._dirty
+
+    pending = property(_get_pending)
+
+
+class JournalStore(GameStore):
+    '''
+    Write-behind storage that appends each change to journal.jsonl rather
+    than rewriting every score, so a save costs the same however many
+    players there are.
+
+    Every compact_every events the state is written to snapshot.json and
+    the journal up to then is kept as journal-<last event>.jsonl, an audit
+    trail of every award and admin edit. Loading reads the snapshot and
+    replays the events after it.
+    '''
+
+    def __init__(self, save_dir, window, compact_every, clock=None,
+                 defer_to_thread=None):
+        GameStore.__init__(self, save_dir, window, clock, defer_to_thread)
+        self._save_dir = save_dir
+        self._journal_file = os.path.join(save_dir, 'journal.jsonl')
+        self._snapshot_file = os.path.join(save_dir, 'snapshot.json')
+        self._compact_every = compact_every
+        # Journal lines and snapshots waiting to be written, in order. The
+        # reactor adds to it while a thread is writing, so it has its own
+        # lock rather than waiting on the disk.
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._sequence = 0
+        self._since_snapshot = 0
+
+        self.events = 0
+        self.compactions = 0
+
+    def _archives(self, after):
+        '''
+        Archived journals holding events numbered above after, oldest first.
+        '''
+        archives = []
+        for name in os.listdir(self._save_dir):
+            if name.startswith('journal-') and name.endswith('.jsonl'):
+                try:
+                    last = int(name[len('journal-'):-len('.jsonl')])
+                except ValueError:
+                    continue
+                if last > after:
+                    archives.append((last, os.path.join(self._save_dir, name)))
+        return [filename for last, filename in sorted(archives)]
+
+    def load(self):
+        snapshot = read_json(self._snapshot_file, None)
+        if snapshot is None:
+            # Nothing compacted yet; start from the plain save files, if
+            # the game used to run without a journal.
+            scores, teams = GameStore.load(self)
+            sequence = 0
+        else:
+            scores, teams = fill_in(snapshot['scores'], snapshot['teams'])
+            sequence = snapshot['sequence']
+
+        replayed = 0
+        for filename in self._archives(sequence) + [self._journal_file]:
+            for event in read_events(filename):
+                if event['n'] > sequence:
+                    apply_event(scores, teams, event)
+                    sequence = event['n']
+                    replayed += 1
+        self._sequence = sequence
+        self._since_snapshot = replayed
+        return scores, teams
+
+    def record(self, event, scores, teams):
+        '''
+        Queues event for the journal, and a snapshot every compact_every
+        events.
+        '''
+        self._sequence += 1
+        self._since_snapshot += 1
+        self.events += 1
+        event = dict(event, n=self._sequence, t=int(time.time()))
+        items = [json.dumps(event, separators=(',', ':'))]
+        if self._since_snapshot >= self._compact_every:
+            items.append((self._sequence, copy_scores(scores),
+                          copy_teams(teams)))
+            self._since_snapshot = 0
+        with self._queue_lock:
+            self._queue.extend(items)
+        self.changed(scores, teams)
+
+    def _save(self):
+        self._timer = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._writing = True
+        d = self._defer_to_thread(self._write)
+        d.addCallbacks(self._saved, self._failed)
+
+    def _write(self):
+        '''
+        Writes out everything queued so far. Runs on a thread.
+        '''
+        with self._lock:
+            with self._queue_lock:
+                queue, self._queue = self._queue, []
+            if not queue:
+                return None
+            started = time.time()
+            done = 0
+            try:
+                handle = self._open_journal()
+                try:
+                    for item in queue:
+                        if isinstance(item, tuple):
+                            self._sync(handle)
+                            handle.close()
+                            self._compact(*item)
+                            handle = self._open_journal()
+                        else:
+                            handle.write((item + '\n').encode('ascii'))
+                        done += 1
+                    self._sync(handle)
+                finally:
+                    handle.close()
+            except:
+                # Put back what didn't make it, for the next try. Events
+                # written twice are skipped on replay by their number.
+                with self._queue_lock:
+                    self._queue[:0] = queue[done:]
+                raise
+            return time.time() - started
+
+    def _open_journal(self):
+        handle = open(self._journal_file, 'ab+')
+        handle.seek(0, os.SEEK_END)
+        if handle.tell():
+            handle.seek(handle.tell() - 1)
+            if handle.read(1) != b'\n':
+                # Finish off a line cut short by a crash, so the next
+                # event doesn't get glued onto it.
+                handle.write(b'\n')
+        return handle
+
+    def _sync(self, handle):
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def _compact(self, sequence, scores, teams):
+        archive = os.path.join(self._save_dir,
+                               'journal-{}.jsonl'.format(sequence))
+        # If the snapshot failed last time, the journal is already archived.
+        if os.path.exists(self._journal_file):
+            os.rename(self._journal_file, archive)
+        write_json(self._snapshot_file, {'sequence': sequence,
+                                         'scores': scores, 'teams': teams})
+        self.compactions += 1
+
+    def _write_pending(self):
+        self._dirty = False
+        return self._write()
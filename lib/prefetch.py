@@ -0,0 +1,112 @@
+from collections import deque
+
+from lib.log import LOG
+from lib.metrics import REGISTRY
+
+
+MISSES = REGISTRY.counter('trivia_prefetch_misses_total',
+                          'Questions that had to be prepared when they were '
+                          'needed, because none was ready.')
+
+
+class Prefetcher:
+    '''
+    Keeps up to depth questions prepared ahead of the game, so asking the
+    next one is just taking it off the front.
+
+    pick() chooses the next question and runs where the game does, since
+    it moves the game's place in the questions. prepare(index) does the
+    rest, reading the question and building its answer, and runs on a
+    thread through defer_to_thread. If nothing is ready when a question is
+    needed it's prepared there and then, and counted in misses.
+
+    flush() throws away whatever is prepared or on its way, for when the
+    questions to ask change. idle() says when nothing is being prepared
+    any more, for when what they're read from is about to go.
+    '''
+
+    def __init__(self, pick, prepare, depth=3, defer_to_thread=None):
+        if defer_to_thread is None:
+            from twisted.internet.threads import deferToThread
+            defer_to_thread = deferToThread
+        self._pick = pick
+        self._prepare = prepare
+        self._defer_to_thread = defer_to_thread
+        self.depth = depth
+        self._ready = deque()
+        self._pending = 0
+        # Bumped by flush(), so preparations already under way are dropped
+        # when they arrive.
+        self._generation = 0
+        # Preparations still running on a thread, whatever their
+        # generation, and what's waiting for there to be none.
+        self._running = 0
+        self._idle = []
+
+        self.misses = 0
+
+    def fill(self):
+        '''
+        Starts preparing questions until depth are ready or on their way.
+        '''
+        while len(self._ready) + self._pending < self.depth:
+            index = self._pick()
+            self._pending += 1
+            self._running += 1
+            d = self._defer_to_thread(self._prepare, index)
+            d.addBoth(self._finished)
+            d.addCallbacks(self._prepared, self._failed,
+                           callbackArgs=(self._generation,),
+                           errbackArgs=(self._generation,))
+
+    def _finished(self, result):
+        self._running -= 1
+        if not self._running:
+            idle, self._idle = self._idle, []
+            for d in idle:
+                d.callback(None)
+        return result
+
+    def _prepared(self, prepared, generation):
+        if generation == self._generation:
+            self._pending -= 1
+            self._ready.append(prepared)
+
+    def _failed(self, failure, generation):
+        if generation == self._generation:
+            self._pending -= 1
+        LOG.error('prefetch_failed', error=failure.getErrorMessage())
+
+    def pop(self):
+        '''
+        Returns the next prepared question, and starts on another.
+        '''
+        if self._ready:
+            prepared = self._ready.popleft()
+        else:
+            self.misses += 1
+            MISSES.inc()
+            prepared = self._prepare(self._pick())
+        self.fill()
+        return prepared
+
+    def flush(self):
+        self._generation += 1
+        self._ready.clear()
+        self._pending = 0
+
+    def idle(self):
+        '''
+        Returns a Deferred that fires once no preparation is running.
+        '''
+        from twisted.internet import defer
+        if not self._running:
+            return defer.succeed(None)
+        d = defer.Deferred()
+        self._idle.append(d)
+        return d
+
+    def _get_ready(self):
+        return len(self._ready)
+
+    ready = property(_get_ready)
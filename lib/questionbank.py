@@ -0,0 +1,327 @@
+import json
+import mmap
+import os
+import re
+import struct
+from multiprocessing import Pool
+from random import randrange
+
+from lib.matching import ALTERNATE, answer_keys
+
+
+MAGIC = b'TQBK'
+VERSION = 4
+
+# Nothing longer than a raw IRC message is allowed in the bank, since it
+# could never be sent in one piece.
+MAX_LINE = 512
+
+_WHITESPACE = re.compile(br'[\s\x00-\x1f]+')
+_NON_WORD = re.compile(br'[^a-z0-9&]+')
+
+# Longest prefix that still counts as a category, in characters and words.
+CATEGORY_LENGTH = 30
+CATEGORY_WORDS = 4
+# Questions without a category prefix are filed under this name.
+UNCATEGORIZED = ''
+
+# Layout of a bank file:
+#
+#   header
+#   offset table     count + 1 fixed width offsets into the data block
+#   data block       question`answer`keys records, back to back
+#   members          count question ids, grouped by category
+#   directory        JSON [[category, first member, number of members], ...]
+#
+# magic, format version, number of questions, position of the members
+# table, position of the directory
+HEADER = struct.Struct('<4sIIQQ')
+# Each entry in the offset table is the start of a record relative to the
+# start of the data block. There is one extra entry at the end so record i
+# always spans offset[i]:offset[i + 1].
+OFFSET = struct.Struct('<Q')
+MEMBER = struct.Struct('<I')
+
+
+def _native(raw):
+    '''
+    Turns bytes read from the bank into the native str type.
+    '''
+    if str is bytes:
+        return raw
+    return raw.decode('utf-8', 'replace')
+
+
+def normalize(text):
+    '''
+    Collapses runs of whitespace and control characters into single spaces.
+    '''
+    return _WHITESPACE.sub(b' ', text).strip()
+
+
+def packed_keys(answer):
+    '''
+    The answer_keys of an answer, packed for storing in the bank.
+    '''
+    packed = ALTERNATE.join(answer_keys(_native(answer)))
+    if str is bytes:
+        return packed
+    return packed.encode('utf-8')
+
+
+def category(question):
+    '''
+    Works out the category of a question from its prefix, e.g. "Astrology"
+    for "Astrology: If you were born on...". Names are lower cased and
+    their punctuation squashed, so "TV / Movies:" and "tv/movies:" end up
+    as the same "tv movies".
+
+    Returns UNCATEGORIZED if the question has no sensible prefix.
+    '''
+    parts = question.split(b':', 2)
+    if len(parts) < 2:
+        return UNCATEGORIZED
+    name = _NON_WORD.sub(b' ', parts[0].lower()).strip()
+    # "Category: NetHack: ..." is named after the second part.
+    if name == b'category' and len(parts) == 3:
+        name = _NON_WORD.sub(b' ', parts[1].lower()).strip()
+    if (not name or len(name) > CATEGORY_LENGTH or
+            len(name.split()) > CATEGORY_WORDS):
+        return UNCATEGORIZED
+    return name.decode('utf-8', 'replace')
+
+
+def parse_line(line):
+    '''
+    Splits a raw question line into a normalized (question, answer) pair.
+
+    Raises ValueError, with the reason as its message, if the line can't be
+    used as a question.
+    '''
+    if len(line) > MAX_LINE:
+        raise ValueError("longer than {} bytes".format(MAX_LINE))
+    fields = line.split(b'`')
+    if len(fields) != 2:
+        raise ValueError("not <question>`<answer> formatted")
+    question, answer = normalize(fields[0]), normalize(fields[1])
+    if not question:
+        raise ValueError("empty question")
+    if not answer:
+        raise ValueError("empty answer")
+    return question, answer
+
+
+def iter_question_files(source_dir):
+    '''
+    Yields the path of every question file in source_dir, sorted.
+    '''
+    for name in sorted(os.listdir(source_dir)):
+        filename = os.path.join(source_dir, name)
+        if os.path.isfile(filename):
+            yield filename
+
+
+def scan_file(filename):
+    '''
+    Checks every line of a question file.
+
+    Returns a (filename, records, categories, rejects) tuple, where records
+    are packed bank records, categories are the category of each record and
+    rejects are (line number, reason, line) tuples.
+    '''
+    records = []
+    categories = []
+    rejects = []
+    with open(filename, 'rb') as handle:
+        lines = handle.read().splitlines()
+    for number, line in enumerate(lines, start=1):
+        try:
+            question, answer = parse_line(line)
+        except ValueError as e:
+            rejects.append((number, str(e), line))
+            continue
+        records.append(b'`'.join((question, answer, packed_keys(answer))))
+        categories.append(category(question))
+    return filename, records, categories, rejects
+
+
+def scan(source_dir, processes=1):
+    '''
+    Runs scan_file over every question file, using a pool of processes
+    when asked for more than one.
+
+    Yields the scan_file results in file order.
+    '''
+    filenames = list(iter_question_files(source_dir))
+    if processes == 1:
+        for filename in filenames:
+            yield scan_file(filename)
+        return
+
+    pool = Pool(processes)
+    try:
+        for result in pool.imap(scan_file, filenames):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def compile_bank(source_dir, dest, processes=1):
+    '''
+    Packs every valid question in source_dir into a single bank file.
+
+    Returns the number of questions packed and a list of rejected lines as
+    (filename, line number, reason, line) tuples. The bank is written to a
+    temporary file first and renamed into place, so a running bot never
+    sees a half written bank.
+    '''
+    offsets = [0]
+    records = []
+    members = {}
+    rejects = []
+    for filename, packed, categories, rejected in scan(source_dir,
+                                                       processes):
+        for record, name in zip(packed, categories):
+            members.setdefault(name, []).append(len(records))
+            records.append(record)
+            offsets.append(offsets[-1] + len(record))
+        rejects.extend((filename,) + reject for reject in rejected)
+
+    count = len(records)
+    grouped = []
+    directory = []
+    for name in sorted(members):
+        directory.append([name, len(grouped), len(members[name])])
+        grouped.extend(members[name])
+
+    members_pos = (HEADER.size + OFFSET.size * (count + 1) + offsets[-1])
+    directory_pos = members_pos + MEMBER.size * count
+    tmp = dest + '.tmp'
+    with open(tmp, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, count, members_pos,
+                                 directory_pos))
+        handle.write(struct.pack('<{}Q'.format(count + 1), *offsets))
+        handle.write(b''.join(records))
+        handle.write(struct.pack('<{}I'.format(count), *grouped))
+        handle.write(json.dumps(directory).encode('utf-8'))
+    os.rename(tmp, dest)
+    return count, rejects
+
+
+def is_stale(bank, source_dir):
+    '''
+    True if the bank is missing or older than anything in source_dir.
+    '''
+    try:
+        built = os.path.getmtime(bank)
+    except OSError:
+        return True
+    if os.path.getmtime(source_dir) > built:
+        return True
+    for filename in iter_question_files(source_dir):
+        if os.path.getmtime(filename) > built:
+            return True
+    return False
+
+
+class QuestionBank:
+    '''
+    Read only view of a compiled question bank.
+
+    The file is memory mapped, so looking up a question is two offset reads
+    and a single slice, no matter how big the bank is.
+    '''
+
+    def __init__(self, filename):
+        self._filename = filename
+        with open(filename, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, count, members, directory = \
+                HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError("{} is not a version {} question bank."
+                             .format(filename, VERSION))
+        self._count = count
+        self._offsets = HEADER.size
+        self._data = self._offsets + OFFSET.size * (count + 1)
+        self._members = members
+
+        # The directory is tiny next to the questions, so it's read once.
+        self._categories = {}
+        for name, first, size in json.loads(
+                self._map[directory:].decode('utf-8')):
+            if str is bytes:
+                name = name.encode('utf-8')
+            self._categories[name] = (first, size)
+
+    def _record(self, index):
+        position = self._offsets + OFFSET.size * index
+        start, end = struct.unpack_from('<QQ', self._map, position)
+        return self._map[self._data + start:self._data + end]
+
+    def __getitem__(self, index):
+        '''
+        Returns the (question, answer, keys) tuple stored at index, where
+        keys are the precomputed answer_keys of the answer.
+        '''
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("question index out of range")
+        question, answer, keys = self._record(index).split(b'`')
+        return (_native(question), _native(answer),
+                _native(keys).split(ALTERNATE))
+
+    def __len__(self):
+        return self._count
+
+    def random(self):
+        '''
+        Returns a random (question, answer, keys) tuple.
+        '''
+        return self[randrange(self._count)]
+
+    def categories(self):
+        '''
+        Returns a {category: number of questions} dict.
+        '''
+        return dict((name, size)
+                    for name, (first, size) in self._categories.items())
+
+    def category_span(self, name):
+        '''
+        Returns the (first, size) span of the members table holding the
+        question ids of a category. Raises KeyError for unknown categories.
+        '''
+        return self._categories[name]
+
+    def member(self, position):
+        '''
+        Returns the question id at position in the members table.
+        '''
+        return MEMBER.unpack_from(self._map,
+                                  self._members + MEMBER.size * position)[0]
+
+    def close(self):
+        self._map.close()
+
+
+def load_bank(filename, source_dir):
+    '''
+    Opens the bank at filename, compiling it from source_dir first if it's
+    missing or out of date.
+    '''
+    if not is_stale(filename, source_dir):
+        try:
+            return QuestionBank(filename)
+        except ValueError:
+            # Left over from an older version of the bot.
+            pass
+    compile_bank(source_dir, filename)
+    return QuestionBank(filename)
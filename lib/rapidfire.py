@@ -0,0 +1,191 @@
+from lib.matching import LENGTH_SLACK, normalize
+
+
+class AnswerIndex:
+    '''
+    The answer keys of every open question in one dict, so a guess is
+    checked against all of them with one normalization and one lookup,
+    however many are open.
+
+    Unlike a single question's Matcher there's no allowance for typos:
+    that would mean an edit distance check against every open answer.
+    '''
+
+    def __init__(self):
+        # key: numbers of the open questions it answers
+        self._numbers = {}
+        self._keys = {}
+        self.longest_guess = 0
+
+    def add(self, number, keys):
+        self._keys[number] = keys
+        for key in keys:
+            self._numbers.setdefault(key, []).append(number)
+        self._measure()
+
+    def remove(self, number):
+        for key in self._keys.pop(number, ()):
+            numbers = self._numbers[key]
+            numbers.remove(number)
+            if not numbers:
+                del self._numbers[key]
+        self._measure()
+
+    def _measure(self):
+        self.longest_guess = max([len(key) for key in self._numbers] or
+                                 [-LENGTH_SLACK]) + LENGTH_SLACK
+
+    def match(self, guess):
+        '''
+        The number of an open question guess answers, or None.
+        '''
+        if len(guess) > self.longest_guess:
+            return None
+        # Only punctuation, which only a punctuation answer can match.
+        numbers = self._numbers.get(normalize(guess) or
+                                    guess.lower().strip())
+        if numbers:
+            return numbers[0]
+        return None
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class OpenQuestion:
+
+    def __init__(self, number, question, answer):
+        self.number = number
+        self.question = question
+        self.answer = answer
+        self.clue_number = 0
+        self.asked_at = 0
+
+
+class RapidFire:
+    '''
+    A round with count questions open at once in a game's channel, for
+    big events. Each question is numbered, gives its own clues on its
+    number's timer from the game's pacer, a clue every interval of the
+    pacer's, and when it's answered or given up on the next takes its
+    number after wait_question seconds. Every number asks the game's
+    round_questions questions. How long they take goes to the pacer too.
+
+    Guesses are matched against all the open answers through an
+    AnswerIndex, and a right one is scored like any other, through the
+    bot's _award. points maps the clues given so far to what a right
+    answer is worth.
+    '''
+
+    def __init__(self, game, count, points, pacer):
+        self._game = game
+        self._points = points
+        self._pacer = pacer
+        self._clock = pacer.clock
+        self.count = count
+        self.open = {}
+        self._index = AnswerIndex()
+        # Questions still to ask for each number.
+        self._left = dict((number, game.round_questions)
+                          for number in range(1, count + 1))
+        # Each number's timer, which asks its questions and gives their
+        # clues.
+        self._timers = dict((number, pacer.timer(self._due, number))
+                            for number in self._left)
+
+    def _get_longest_guess(self):
+        return self._index.longest_guess
+
+    longest_guess = property(_get_longest_guess)
+
+    def start(self):
+        for number in sorted(self._left):
+            self._timers[number].start()
+            self._ask(number)
+
+    def _due(self, number):
+        if number in self.open:
+            self._clue(number)
+        else:
+            self._ask(number)
+
+    def _ask(self, number):
+        self._left[number] -= 1
+        question, answer = self._game._prefetch.pop()
+        asked = self.open[number] = OpenQuestion(number, question, answer)
+        self._index.add(number, answer.keys)
+        self._show(asked, answer.current_clue())
+        asked.clue_number = 1
+        asked.asked_at = self._clock.seconds()
+        self._pacer.asked()
+        self._timers[number].after(self._pacer.interval)
+
+    def _clue(self, number):
+        asked = self.open[number]
+        if asked.clue_number < 4:
+            self._show(asked, asked.answer.give_clue())
+            asked.clue_number += 1
+            self._timers[number].after(self._pacer.interval)
+        else:
+            self._close(number)
+            self._pacer.observe(self._clock.seconds() - asked.asked_at)
+            self._game.say("No one got #{}. The answer was: {}"
+                           .format(number, asked.answer.answer))
+            if self._left[number]:
+                self._timers[number].after(self._game._wait_question)
+            else:
+                self._finish()
+
+    def _show(self, asked, clue):
+        self._game.say("#{}: {} Clue: {}".format(asked.number, asked.question,
+                                                 clue))
+
+    def repeat(self):
+        '''
+        Says every open question again, with its clue so far.
+        '''
+        for number in sorted(self.open):
+            asked = self.open[number]
+            self._show(asked, asked.answer.current_clue())
+
+    def set_strategy(self, strategy):
+        for asked in self.open.values():
+            asked.answer.set_strategy(strategy)
+
+    def _close(self, number):
+        asked = self.open.pop(number)
+        self._index.remove(number)
+        self._timers[number].cancel()
+        return asked
+
+    def _finish(self):
+        if not self.open and not any(self._left.values()):
+            self._game.say("Round complete!")
+            self._game.stop()
+
+    def match(self, guess):
+        return self._index.match(guess)
+
+    def winner(self, user, number):
+        '''
+        Scores a right answer to question number for user.
+        '''
+        if number not in self.open:
+            return
+        asked = self._close(number)
+        self._pacer.observe(self._clock.seconds() - asked.asked_at)
+        points = self._points[asked.clue_number - 1]
+        team = self._game._bot._award(user, points)
+        self._game.say("{}{} GOT #{}: {} ({} point{})".format(
+            user.upper(), " ({})".format(team.upper()) if team else "",
+            number, asked.answer.answer, points, "" if points == 1 else "s"))
+        if self._left[number]:
+            self._timers[number].restart(self._game._wait_question)
+        else:
+            self._finish()
+
+    def stop(self):
+        for number in list(self.open):
+            self._close(number)
+        for timer in self._timers.values():
+            timer.cancel()
@@ -0,0 +1,112 @@
+from random import random, randrange
+
+
+class AliasTable:
+    '''
+    Walker's alias method: draws index i with probability proportional to
+    weights[i] in constant time, after linear time setup.
+    '''
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        if not count or total <= 0:
+            raise ValueError("need at least one positive weight")
+
+        self._probability = [0.0] * count
+        self._alias = [0] * count
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, weight in enumerate(scaled) if weight < 1.0]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._probability[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left is 1.0 give or take rounding error.
+        for i in small + large:
+            self._probability[i] = 1.0
+
+    def sample(self):
+        column = randrange(len(self._probability))
+        if random() < self._probability[column]:
+            return column
+        return self._alias[column]
+
+    def __len__(self):
+        return len(self._probability)
+
+
+def parse_theme(text):
+    '''
+    Parses a theme like "astrology, music=2" into [(name, weight), ...].
+
+    Entries without an explicit weight get None. Raises ValueError for bad
+    weights.
+    '''
+    theme = []
+    for entry in text.split(','):
+        name, sep, weight = entry.partition('=')
+        name = ' '.join(name.lower().split())
+        if not name:
+            continue
+        if sep:
+            weight = float(weight)
+            if weight <= 0:
+                raise ValueError("weights must be positive")
+        else:
+            weight = None
+        theme.append((name, weight))
+    return theme
+
+
+class CategorySampler:
+    '''
+    Draws question ids from a mix of categories of a question bank.
+
+    theme is a list of (name, weight) pairs. A name matches the category of
+    that name, or failing that every category starting with it. Without
+    weights every question in the matched categories is equally likely;
+    with weights each entry gets that share of the draws, spread evenly
+    over its questions.
+    '''
+
+    def __init__(self, bank, theme):
+        self._bank = bank
+        self.theme = theme
+        categories = bank.categories()
+        weighted = any(weight is not None for name, weight in theme)
+
+        self._spans = []
+        weights = []
+        self.names = []
+        for name, weight in theme:
+            if name in categories:
+                matched = [name]
+            else:
+                matched = sorted(category for category in categories
+                                 if category and category.startswith(name))
+            if not matched:
+                raise KeyError(name)
+            self.names.extend(matched)
+            total = float(sum(categories[category] for category in matched))
+            for category in matched:
+                size = categories[category]
+                self._spans.append(bank.category_span(category))
+                if weighted:
+                    share = 1.0 if weight is None else weight
+                    weights.append(share * size / total)
+                else:
+                    weights.append(size)
+        self._table = AliasTable(weights)
+
+    def sample(self):
+        '''
+        Returns a random question id from the theme.
+        '''
+        first, size = self._spans[self._table.sample()]
+        return self._bank.member(first + randrange(size))
@@ -0,0 +1,133 @@
+import json
+import os
+from random import getrandbits
+
+
+_MASK64 = (1 << 64) - 1
+ROUNDS = 4
+# Steps a QuestionCursor takes between saves.
+SAVE_EVERY = 10
+
+
+def _mix(x):
+    '''
+    splitmix64 finalizer; scrambles a 64 bit integer.
+    '''
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & _MASK64
+    return x ^ (x >> 31)
+
+
+class FeistelPermutation:
+    '''
+    A keyed pseudo-random permutation of range(size).
+
+    A balanced Feistel network over the smallest even number of bits that
+    covers size is a bijection on that power of two; values that land
+    outside range(size) are fed through again ("cycle walking") until they
+    land inside it. That gives a shuffled order of size items without ever
+    storing it.
+    '''
+
+    def __init__(self, size, key):
+        self._size = size
+        half = 1
+        while 1 << (2 * half) < size:
+            half += 1
+        self._half = half
+        self._mask = (1 << half) - 1
+        self._keys = [_mix(key + round) for round in range(ROUNDS)]
+
+    def _encrypt(self, value):
+        left, right = value >> self._half, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right ^ key) & self._mask)
+        return (left << self._half) | right
+
+    def __getitem__(self, index):
+        '''
+        Returns the item at position index of the shuffled order.
+        '''
+        if not 0 <= index < self._size:
+            raise IndexError("permutation index out of range")
+        value = self._encrypt(index)
+        while value >= self._size:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self):
+        return self._size
+
+
+class QuestionCursor:
+    '''
+    Walks a shuffled order of question ids so nothing repeats until every
+    question has been asked, then reshuffles.
+
+    Only the permutation key and the position in it are kept, and they're
+    written to filename every save_every steps, and by save(), so a
+    restart picks up where it left off. After a crash the last few
+    questions may come round again.
+    '''
+
+    def __init__(self, filename, size, save_every=SAVE_EVERY):
+        self._filename = filename
+        self._size = size
+        self._save_every = save_every
+        self._unsaved = 0
+        self._epoch = 0
+        self._position = 0
+        self._key = None
+
+        try:
+            with open(filename, 'r') as savefile:
+                state = json.load(savefile)
+        except (IOError, OSError, ValueError):
+            state = {}
+        # A different size means the bank was rebuilt and the ids moved.
+        if state.get('size') == size:
+            self._epoch = state['epoch']
+            self._position = state['position']
+            self._key = state['key']
+
+        if self._key is None or self._position >= size:
+            self._reshuffle()
+        else:
+            self._permutation = FeistelPermutation(size, self._key)
+
+    def _reshuffle(self):
+        self._key = getrandbits(63)
+        self._position = 0
+        self._epoch += 1
+        self._permutation = FeistelPermutation(self._size, self._key)
+
+    def next(self):
+        '''
+        Returns the next question id, saving the new position every
+        save_every steps.
+        '''
+        if self._position >= self._size:
+            self._reshuffle()
+        index = self._permutation[self._position]
+        self._position += 1
+        self._unsaved += 1
+        if self._unsaved >= self._save_every:
+            self.save()
+        return index
+
+    __next__ = next
+
+    def save(self):
+        tmp = self._filename + '.tmp'
+        with open(tmp, 'w') as savefile:
+            json.dump({'size': self._size,
+                       'key': self._key,
+                       'epoch': self._epoch,
+                       'position': self._position}, savefile)
+        os.rename(tmp, self._filename)
+        self._unsaved = 0
+
+    def _get_remaining(self):
+        return self._size - self._position
+
+    remaining = property(_get_remaining)
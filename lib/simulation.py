@@ -0,0 +1,219 @@
+import gc
+import random
+import time
+
+from twisted.internet import defer, task
+
+from lib.game import ASK_SECONDS
+from lib.outbound import CRITICAL
+
+try:
+    from twisted.internet.testing import StringTransport
+except ImportError:
+    from twisted.test.proto_helpers import StringTransport
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def synchronous(function, *args):
+    '''
+    Stands in for deferToThread, so saves happen as the clock reaches
+    them instead of on a thread.
+    '''
+    return defer.maybeDeferred(function, *args)
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Simulation:
+    '''
+    Plays rounds of trivia against a real triviabot at simulated speed.
+
+    The bot is built by factory on a task.Clock and writes to a string
+    transport, so nothing waits on real time or a network. In every
+    channel, guesses guesses arrive per clue interval, each from a random
+    player and right with probability accuracy; they go through the
+    bot's IRC line handling like the real thing. An admin starts a new
+    round whenever a channel's game ends, until rounds have been played.
+
+    Everything but the wall clock timings comes out the same for the
+    same seed.
+    '''
+
+    def __init__(self, factory, players=1000, guesses=20, accuracy=0.05,
+                 seed=0):
+        # The game shuffles, picks questions and gives clues with the
+        # random module.
+        random.seed(seed)
+        self.clock = task.Clock()
+        factory.clock = self.clock
+        factory.defer_to_thread = synchronous
+        # Nothing is throttled by the server, but the bot still paces
+        # itself on the simulated clock.
+        self.bot = factory.buildProtocol(None)
+        self.bot.makeConnection(StringTransport())
+        self.bot.transport.clear()
+        self._admin = sorted(self.bot._admins)[0]
+        self._players = ['player{}'.format(n) for n in range(players)]
+        # Time between guesses in each channel.
+        self._gap = float(self.bot._games[self.bot._game_channel]
+                          ._wait_interval) / guesses
+        self._accuracy = accuracy
+        self._random = random.Random(seed)
+
+        self.rounds = 0
+        self.guesses = 0
+        self.wins = 0
+        self.lines_out = 0
+        self.bytes_out = 0
+        # Wall clock seconds the bot took over each guess.
+        self.latencies = []
+
+    def _say(self, user, channel, text):
+        line = ':{0}!{0}@simulation PRIVMSG {1} :{2}\r\n'.format(
+            user, channel, text).encode('utf-8')
+        started = time.time()
+        self.bot.dataReceived(line)
+        return time.time() - started
+
+    def _drain(self):
+        out = self.bot.transport.value()
+        self.bot.transport.clear()
+        self.lines_out += out.count(b'\r\n')
+        self.bytes_out += len(out)
+        self.wins += out.count(b' GOT IT!')
+
+    def _guess(self, game):
+        answer = game.answer.answer
+        if self._random.random() < self._accuracy:
+            guess = answer
+        else:
+            # Mostly the right letters in the wrong order, which is the
+            # most work for the matcher.
+            guess = ''.join(self._random.sample(answer, len(answer)))
+        self.latencies.append(
+            self._say(self._random.choice(self._players), game.channel,
+                      guess))
+        self.guesses += 1
+
+    def _tick(self, rounds):
+        for channel, game in self.bot._games.items():
+            if game.running:
+                self._guess(game)
+            elif self.rounds < rounds:
+                self._say(self._admin, channel, '!start')
+                self.rounds += 1
+
+    def _advance(self, until=None):
+        '''
+        Moves the clock on to until, or until nothing is left to call,
+        stopping at every call on the way so each happens when it's due
+        rather than at the next guess.
+        '''
+        while True:
+            due = [call.getTime() for call in self.clock.getDelayedCalls()]
+            if until is not None:
+                due = [when for when in due if when <= until]
+            if not due:
+                break
+            self.clock.advance(max(0, min(due) - self.clock.seconds()))
+        if until is not None:
+            self.clock.advance(max(0, until - self.clock.seconds()))
+
+    def _running(self):
+        return any(game.running for game in self.bot._games.values())
+
+    def run(self, rounds, trace_memory=False):
+        '''
+        Plays rounds rounds over all the channels, and returns the report.
+        trace_memory adds the peak memory allocated, where Python can
+        trace it (3.4+), at the cost of a much slower run.
+        '''
+        trace_memory = trace_memory and tracemalloc is not None
+        gc.collect()
+        objects = len(gc.get_objects())
+        collections = self._collections()
+        asked, ask_seconds = ASK_SECONDS.count, ASK_SECONDS.sum
+        if trace_memory:
+            tracemalloc.start()
+        started = time.time()
+
+        while self.rounds < rounds or self._running():
+            self._tick(rounds)
+            self._advance(self.clock.seconds() + self._gap)
+            self._drain()
+        # Let the last messages and saves go out.
+        self._advance()
+        self._drain()
+
+        wall = time.time() - started
+        report = {'rounds': self.rounds,
+                  'guesses': self.guesses,
+                  'wins': self.wins,
+                  'simulated_seconds': self.clock.seconds(),
+                  'wall_seconds': wall,
+                  'guesses_per_second': self.guesses / wall if wall else 0.0,
+                  'lines_out': self.lines_out,
+                  'bytes_out': self.bytes_out,
+                  'saves': self.bot._store.saves,
+                  }
+        ordered = sorted(self.latencies)
+        report.update(
+            latency_mean_us=sum(ordered) / len(ordered) * 1e6
+            if ordered else 0.0,
+            latency_p50_us=percentile(ordered, 0.5) * 1e6,
+            latency_p99_us=percentile(ordered, 0.99) * 1e6,
+            latency_max_us=(ordered[-1] if ordered else 0.0) * 1e6)
+        # How long game play waited for its turn to be sent, in simulated
+        # seconds.
+        outbound = self.bot._outbound
+        report.update(game_wait_mean=outbound.mean_wait(CRITICAL),
+                      game_wait_max=outbound.max_wait[CRITICAL])
+        # Wall clock time from needing a question to its first clue.
+        asked = ASK_SECONDS.count - asked
+        report.update(
+            ask_mean_us=(ASK_SECONDS.sum - ask_seconds) / asked * 1e6
+            if asked else 0.0,
+            prefetch_misses=sum(game._prefetch.misses
+                                for game in self.bot._games.values()))
+        # Simulated questions per hour of play, and where the clue interval
+        # ended up, for each game on average.
+        pacers = [game._pacer for game in self.bot._games.values()]
+        report.update(
+            questions_per_hour=sum(pacer.questions_per_hour
+                                   for pacer in pacers) / len(pacers),
+            clue_interval=sum(pacer.interval for pacer in pacers)
+            / len(pacers))
+
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report['peak_traced_kib'] = peak / 1024.0
+        report['gc_collections'] = self._collections() - collections
+        gc.collect()
+        report['objects_retained'] = len(gc.get_objects()) - objects
+        return report
+
+    def _collections(self):
+        '''
+        Garbage collections so far, where Python counts them (3.4+).
+        '''
+        try:
+            return sum(generation['collections']
+                       for generation in gc.get_stats())
+        except AttributeError:
+            return 0
+
+    def close(self):
+        for game in self.bot._games.values():
+            if game.running:
+                game.stop()
+        self.bot._store.flush()
+        self.bot._questions.close()
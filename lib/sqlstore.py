@@ -0,0 +1,349 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from lib.persistence import GameStore, fill_in, read_json
+
+
+# Totals for season ALL_TIME are kept over every season.
+ALL_TIME = 0
+# Seconds to wait for another process to finish writing.
+BUSY_TIMEOUT = 30
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS seasons (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE TABLE IF NOT EXISTS awards (
+    id INTEGER PRIMARY KEY,
+    season INTEGER NOT NULL,
+    at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    user TEXT NOT NULL,
+    team TEXT,
+    points INTEGER NOT NULL,
+    by TEXT
+);
+CREATE INDEX IF NOT EXISTS awards_user ON awards (user, season);
+CREATE TABLE IF NOT EXISTS totals (
+    season INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    points INTEGER NOT NULL,
+    PRIMARY KEY (season, kind, name)
+);
+CREATE INDEX IF NOT EXISTS totals_rank ON totals (season, kind, points);
+CREATE TABLE IF NOT EXISTS teams (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    user TEXT PRIMARY KEY,
+    team TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_team ON members (team, position);
+'''
+
+_ARCHIVE = re.compile(r'^scores-(\d{4}-\d\d-\d\d-\d\d:\d\d:\d\d)\.json$')
+
+
+class SqlStore(GameStore):
+    '''
+    Keeps scores, teams and seasons in an SQLite database.
+
+    Every award is a row, and running totals per season (plus ALL_TIME)
+    sit under an index on points, so top lists and ranks are index scans
+    instead of sorting every player. Changes are queued and written in
+    one transaction per SAVE_WINDOW on a thread, like the other stores;
+    queries run on the same thread after whatever is queued, and return
+    Deferreds.
+    '''
+
+    def __init__(self, save_dir, window, filename=None, clock=None,
+                 defer_to_thread=None):
+        GameStore.__init__(self, save_dir, window, clock, defer_to_thread)
+        self._save_dir = save_dir
+        if filename is None:
+            filename = os.path.join(save_dir, 'trivia.sqlite')
+        # Only ever used with self._lock held, from whichever thread. Other
+        # processes may share the file (see supervisor.py): with WAL they
+        # can read while one writes, and writers wait their turn.
+        self._db = sqlite3.connect(filename, timeout=BUSY_TIMEOUT,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self.season = None
+        self.events = 0
+
+    def load(self):
+        with self._lock:
+            if self._current_season() is None:
+                self._migrate()
+            self.season = self._current_season()
+            scores = {'user': self._totals(self.season, 'user'),
+                      'team': self._totals(self.season, 'team')}
+            teams = {'users': {}, 'teams': {}}
+            for name, owner in self._db.execute(
+                    'SELECT name, owner FROM teams'):
+                teams['teams'][name] = {'name': name, 'owner': owner,
+                                        'members': []}
+            for user, team in self._db.execute(
+                    'SELECT user, team FROM members ORDER BY team, position'):
+                teams['users'][user] = team
+                if team in teams['teams']:
+                    teams['teams'][team]['members'].append(user)
+        return fill_in(scores, teams)
+
+    def _current_season(self):
+        row = self._db.execute('SELECT MAX(id) FROM seasons').fetchone()
+        return row[0]
+
+    def _totals(self, season, kind):
+        return dict(self._db.execute(
+            'SELECT name, points FROM totals WHERE season = ? AND kind = ?',
+            (season, kind)))
+
+    def _migrate(self):
+        '''
+        Imports an empty database from the JSON save files: every
+        scores-<time>.json archive left by !reset becomes a finished season,
+        and scores.json and teams.json the current one.
+        '''
+        archives = []
+        for name in os.listdir(self._save_dir):
+            match = _ARCHIVE.match(name)
+            if match:
+                archives.append((match.group(1), name))
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            if self._current_season() is not None:
+                # Another process sharing the file got there first.
+                return
+            for stamp, name in sorted(archives):
+                ended = time.mktime(datetime.datetime.strptime(
+                    stamp, '%Y-%m-%d-%H:%M:%S').timetuple())
+                scores = read_json(os.path.join(self._save_dir, name), {})
+                self._import_season(scores, ended, ended)
+
+            scores, teams = GameStore.load(self)
+            self._import_season(scores, time.time(), None)
+            for name, team in teams['teams'].items():
+                self._set_team(name, team)
+
+    def _import_season(self, scores, at, ended):
+        cursor = self._db.execute(
+            'INSERT INTO seasons (started, ended) VALUES (?, ?)', (at, ended))
+        season = cursor.lastrowid
+        for user, points in scores.get('user', {}).items():
+            self._db.execute(
+                'INSERT INTO awards (season, at, kind, user, points) '
+                "VALUES (?, ?, 'import', ?, ?)", (season, at, user, points))
+            self._add(season, 'user', user, points)
+        # Team points can't be split back into awards; just the totals.
+        for team, points in scores.get('team', {}).items():
+            self._add(season, 'team', team, points)
+
+    def _add(self, season, kind, name, points):
+        for bucket in (season, ALL_TIME):
+            self._db.execute(
+                'INSERT OR IGNORE INTO totals (season, kind, name, points) '
+                'VALUES (?, ?, ?, 0)', (bucket, kind, name))
+            self._db.execute(
+                'UPDATE totals SET points = points + ? '
+                'WHERE season = ? AND kind = ? AND name = ?',
+                (points, bucket, kind, name))
+
+    def _set_team(self, name, team):
+        self._db.execute('DELETE FROM members WHERE team = ?', (name,))
+        if team is None:
+            self._db.execute('DELETE FROM teams WHERE name = ?', (name,))
+            return
+        self._db.execute('INSERT OR REPLACE INTO teams (name, owner) '
+                         'VALUES (?, ?)', (name, team['owner']))
+        for position, user in enumerate(team['members']):
+            self._db.execute('INSERT OR REPLACE INTO members '
+                             '(user, team, position) VALUES (?, ?, ?)',
+                             (user, name, position))
+
+    def record(self, event, scores, teams):
+        '''
+        Queues event to be written with the next save.
+        '''
+        self.events += 1
+        event = dict(event, t=time.time())
+        if event['e'] in ('join', 'leave') and event['state'] is not None:
+            event['state'] = {'owner': event['state']['owner'],
+                              'members': list(event['state']['members'])}
+        with self._queue_lock:
+            self._queue.append(event)
+        self.changed(scores, teams)
+
+    def _apply(self, event):
+        kind, at = event['e'], event['t']
+        if kind == 'award':
+            self._db.execute(
+                'INSERT INTO awards (season, at, kind, user, team, points) '
+                "VALUES (?, ?, 'award', ?, ?, ?)",
+                (self.season, at, event['user'], event['team'],
+                 event['points']))
+            self._add(self.season, 'user', event['user'], event['points'])
+            if event['team'] is not None:
+                self._add(self.season, 'team', event['team'], event['points'])
+        elif kind == 'set':
+            # Stored as the difference, so the awards still add up.
+            row = self._db.execute(
+                'SELECT points FROM totals WHERE season = ? AND kind = ? '
+                'AND name = ?', (self.season, 'user', event['user'])).fetchone()
+            change = event['points'] - (row[0] if row else 0)
+            self._db.execute(
+                'INSERT INTO awards (season, at, kind, user, points, by) '
+                "VALUES (?, ?, 'set', ?, ?, ?)",
+                (self.season, at, event['user'], change, event['by']))
+            self._add(self.season, 'user', event['user'], change)
+        elif kind in ('join', 'leave'):
+            self._set_team(event['team'], event['state'])
+        elif kind == 'reset':
+            self._db.execute('UPDATE seasons SET ended = ? WHERE id = ?',
+                             (at, self.season))
+            self.season = self._db.execute(
+                'INSERT INTO seasons (started) VALUES (?)', (at,)).lastrowid
+        else:
+            raise ValueError("unknown event {!r}".format(kind))
+
+    def _save(self):
+        self._timer = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._writing = True
+        d = self._defer_to_thread(self._write)
+        d.addCallbacks(self._saved, self._failed)
+
+    def _write(self):
+        '''
+        Writes everything queued in one transaction. Runs on a thread.
+        '''
+        with self._lock:
+            return self._drain()
+
+    def _drain(self):
+        with self._queue_lock:
+            queue, self._queue = self._queue, []
+        if not queue:
+            return None
+        started = time.time()
+        season = self.season
+        try:
+            with self._db:
+                # Take the write lock first, and follow a !reset made by
+                # another process sharing the file.
+                self._db.execute('BEGIN IMMEDIATE')
+                self.season = self._current_season()
+                for event in queue:
+                    self._apply(event)
+        except:
+            # The transaction was rolled back; try all of it again later.
+            self.season = season
+            with self._queue_lock:
+                self._queue[:0] = queue
+            raise
+        return time.time() - started
+
+    def _write_pending(self):
+        self._dirty = False
+        return self._write()
+
+    def _get_pending(self):
+        # Queries write out the queue too, without waiting for the timer.
+        return bool(self._queue)
+
+    pending = property(_get_pending)
+
+    def _query(self, function, *args):
+        '''
+        Runs function on a thread once everything queued is written, and
+        returns a Deferred firing with its result.
+        '''
+        def run():
+            with self._lock:
+                self._record(self._drain())
+                return function(*args)
+        return self._defer_to_thread(run)
+
+    def top(self, kind='user', count=10, season=None):
+        '''
+        Deferred list of (name, points), highest first, for season (the
+        current one by default, or ALL_TIME).
+        '''
+        return self._query(self._top, kind, count, season)
+
+    def _top(self, kind, count, season):
+        if season is None:
+            season = self.season
+        return self._db.execute(
+            'SELECT name, points FROM totals WHERE season = ? AND kind = ? '
+            'ORDER BY points DESC, name LIMIT ?',
+            (season, kind, count)).fetchall()
+
+    def rank(self, name, kind='user', season=None):
+        '''
+        Deferred (rank, points, players) for name, or None if it hasn't
+        scored.
+        '''
+        return self._query(self._rank, name, kind, season)
+
+    def _rank(self, name, kind, season):
+        if season is None:
+            season = self.season
+        row = self._db.execute(
+            'SELECT points FROM totals WHERE season = ? AND kind = ? '
+            'AND name = ?', (season, kind, name)).fetchone()
+        if row is None:
+            return None
+        above, players = self._db.execute(
+            'SELECT (SELECT COUNT(*) FROM totals WHERE season = ? AND '
+            'kind = ? AND points > ?), (SELECT COUNT(*) FROM totals WHERE '
+            'season = ? AND kind = ?)',
+            (season, kind, row[0], season, kind)).fetchone()
+        return above + 1, row[0], players
+
+    def seasons(self):
+        '''
+        Deferred list of (season, started, ended, winner, points), newest
+        first. ended is None for the current season.
+        '''
+        return self._query(self._seasons)
+
+    def _seasons(self):
+        result = []
+        for season, started, ended in self._db.execute(
+                'SELECT id, started, ended FROM seasons ORDER BY id DESC'
+                ).fetchall():
+            best = self._top('user', 1, season)
+            winner, points = best[0] if best else (None, 0)
+            result.append((season, started, ended, winner, points))
+        return result
+
+    def history(self, user, count=10):
+        '''
+        Deferred list of user's latest (at, kind, points, by) awards.
+        '''
+        return self._query(self._history, user, count)
+
+    def _history(self, user, count):
+        return self._db.execute(
+            'SELECT at, kind, points, by FROM awards WHERE user = ? '
+            'ORDER BY id DESC LIMIT ?', (user, count)).fetchall()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import select
+import socket
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+
+TRIVIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                      'trivia.py')
+# Longest wait before starting a worker that keeps crashing again.
+MAX_BACKOFF = 60
+# Seconds a worker has to stay up for its next crash to be restarted
+# straight away.
+STABLE = 60
+# Reports this many intervals old mean the worker is stuck.
+STALE_INTERVALS = 3
+
+
+def networks(config):
+    '''
+    The networks to play on, as dicts of name, server, port, ssl, nickname,
+    channels and metrics_port: config.NETWORKS with anything left out taken from the
+    rest of the config, or just SERVER if there's no NETWORKS.
+    '''
+    try:
+        listed = config.NETWORKS
+    except AttributeError:
+        listed = [{'name': 'default',
+                   'metrics_port': getattr(config, 'METRICS_PORT', None)}]
+    result = []
+    for network in listed:
+        network = dict(network)
+        if not network.get('name'):
+            raise ValueError("every network needs a name")
+        if network['name'] in [other['name'] for other in result]:
+            raise ValueError("network {} is listed twice"
+                             .format(network['name']))
+        network.setdefault('server', config.SERVER)
+        network.setdefault('port', config.SERVER_PORT)
+        network.setdefault('ssl', config.USE_SSL)
+        network.setdefault('nickname', config.DEFAULT_NICK)
+        network.setdefault('channels', list(getattr(
+            config, 'GAME_CHANNELS', [config.GAME_CHANNEL])))
+        # Each bot needs a port of its own, so METRICS_PORT is only used
+        # when there's one.
+        network.setdefault('metrics_port', None)
+        result.append(network)
+    return result
+
+
+def find_network(config, name):
+    for network in networks(config):
+        if network['name'] == name:
+            return network
+    raise KeyError(name)
+
+
+class HealthReporter:
+    '''
+    Sends a worker's health, as returned by the health function, to the
+    supervisor as a JSON datagram on the Unix socket at path. Sending
+    never blocks; if nobody is listening the report is dropped.
+    '''
+
+    def __init__(self, path, network, health):
+        self._path = path
+        self._network = network
+        self._health = health
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self.sent = 0
+
+    def send(self):
+        report = dict(self._health())
+        report.update(network=self._network, pid=os.getpid(), at=time.time())
+        try:
+            self._socket.sendto(json.dumps(report).encode('utf-8'),
+                                self._path)
+        except socket.error:
+            return
+        self.sent += 1
+
+
+class Worker:
+
+    def __init__(self, network):
+        self.network = network
+        self.name = network['name']
+        self.process = None
+        self.started = None
+        # When to start it again after it exited, or None.
+        self.restart_at = None
+        self.restarts = 0
+        # Crashes in a row without staying up for STABLE seconds.
+        self.failures = 0
+        self.health = None
+        # Set once it has exited cleanly, which it's left to do.
+        self.stopped = False
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+class Supervisor:
+    '''
+    Runs one bot process per network and keeps them running.
+
+    Each worker is trivia.py for one network, so networks are spread over
+    the cores and one network's trouble can't hold up the others; they
+    share the SQLite store in SAVE_DIR. A worker that exits with an error
+    is started again, straight away if it had been up a while and
+    otherwise after a wait that doubles with each crash in a row. One that
+    exits cleanly, as it does when an admin tells it to !die, is left
+    stopped, and once they all are the supervisor stops too. Workers send their health
+    every interval seconds to a Unix datagram socket at health_path, and
+    summary() adds it up.
+    '''
+
+    def __init__(self, networks, health_path, interval=5, command=None,
+                 logger=None):
+        self.workers = OrderedDict((network['name'], Worker(network))
+                                   for network in networks)
+        self._health_path = health_path
+        self._interval = interval
+        if command is not None:
+            self._command = command
+        self._logger = logger or logging.getLogger('supervisor')
+        self._socket = None
+        self._stopping = False
+
+    def _command(self, network):
+        return [sys.executable, TRIVIA, '--network', network['name'],
+                '--health', self._health_path,
+                '--health-interval', str(self._interval)]
+
+    def start(self):
+        if os.path.exists(self._health_path):
+            os.remove(self._health_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self._health_path)
+        for worker in self.workers.values():
+            self._spawn(worker)
+
+    def _spawn(self, worker):
+        worker.process = subprocess.Popen(self._command(worker.network))
+        worker.started = time.time()
+        worker.restart_at = None
+        worker.health = None
+        self._logger.info("Started %s (pid %d)", worker.name,
+                          worker.process.pid)
+
+    def poll(self, timeout=1.0):
+        '''
+        Takes health reports for up to timeout seconds, then restarts
+        any worker that has exited and waited long enough.
+        '''
+        self._receive(timeout)
+        now = time.time()
+        for worker in self.workers.values():
+            if worker.stopped:
+                continue
+            if worker.restart_at is None:
+                code = worker.process.poll()
+                if code is None:
+                    continue
+                if code == 0:
+                    worker.stopped = True
+                    self._logger.warning("%s stopped, not restarting it",
+                                         worker.name)
+                    continue
+                if now - worker.started < STABLE:
+                    worker.failures += 1
+                    delay = min(MAX_BACKOFF, 2 ** (worker.failures - 1))
+                else:
+                    worker.failures = 0
+                    delay = 0
+                self._logger.warning("%s exited with %d, restarting in %ds",
+                                     worker.name, code, delay)
+                worker.restart_at = now + delay
+            if now >= worker.restart_at:
+                worker.restarts += 1
+                self._spawn(worker)
+
+    def _receive(self, timeout):
+        deadline = time.time() + timeout
+        while True:
+            remaining = max(0, deadline - time.time())
+            if not select.select([self._socket], [], [], remaining)[0]:
+                return
+            data = self._socket.recv(65536)
+            try:
+                report = json.loads(data.decode('utf-8'))
+                worker = self.workers[report['network']]
+            except (ValueError, KeyError, TypeError):
+                self._logger.warning("Bad health report %r", data[:100])
+                continue
+            # Late reports from a worker that has since been replaced
+            # don't count.
+            if worker.process is not None and \
+                    report.get('pid') == worker.process.pid:
+                worker.health = report
+
+    def summary(self):
+        '''
+        Health over every network: how many workers are running, signed
+        on and playing games, lines sent and restarts, and which networks
+        have stopped reporting.
+        '''
+        now = time.time()
+        total = {'networks': len(self.workers), 'running': 0,
+                 'signed_on': 0, 'games': 0, 'lines': 0, 'restarts': 0,
+                 'stale': []}
+        for worker in self.workers.values():
+            total['restarts'] += worker.restarts
+            if not worker.alive():
+                continue
+            total['running'] += 1
+            health = worker.health
+            if health is None or \
+                    now - health['at'] > STALE_INTERVALS * self._interval:
+                if now - worker.started > STALE_INTERVALS * self._interval:
+                    total['stale'].append(worker.name)
+                continue
+            total['signed_on'] += bool(health.get('signed_on'))
+            total['games'] += health.get('games', 0)
+            total['lines'] += health.get('lines', 0)
+        return total
+
+    def run(self):
+        '''
+        Supervises until stop_soon() is called, logging the summary every
+        interval.
+        '''
+        report_at = time.time() + self._interval
+        while not self._stopping:
+            self.poll(min(1.0, self._interval))
+            if all(worker.stopped for worker in self.workers.values()):
+                self._logger.warning("Every network has stopped")
+                break
+            if time.time() >= report_at:
+                report_at += self._interval
+                total = self.summary()
+                self._logger.info(
+                    "%(running)d/%(networks)d running, %(signed_on)d signed "
+                    "on, %(games)d games, %(lines)d lines sent, "
+                    "%(restarts)d restarts", total)
+                if total['stale']:
+                    self._logger.warning("No health from %s",
+                                         ', '.join(total['stale']))
+        self.stop()
+
+    def stop_soon(self, *args):
+        self._stopping = True
+
+    def stop(self, grace=10):
+        '''
+        Stops every worker, killing any still running after grace seconds.
+        '''
+        running = [worker.process for worker in self.workers.values()
+                   if worker.alive()]
+        for process in running:
+            process.terminate()
+        deadline = time.time() + grace
+        while time.time() < deadline and \
+                any(process.poll() is None for process in running):
+            time.sleep(0.1)
+        for process in running:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            os.remove(self._health_path)
@@ -0,0 +1,87 @@
+'''
+A stand-in IRC server, just enough for bots to sign on, join channels and
+talk: run it with "python -m lib.tests.fakeircd" and it prints the port
+it's listening on.
+'''
+
+import sys
+
+from twisted.internet import protocol, reactor
+from twisted.protocols.basic import LineReceiver
+
+
+class FakeClient(LineReceiver):
+
+    nickname = None
+    registered = False
+
+    def connectionLost(self, reason):
+        for members in self.factory.channels.values():
+            members.discard(self)
+        self.factory.clients.discard(self)
+
+    def send(self, line):
+        self.sendLine(line.encode('utf-8'))
+
+    def relay(self, command, target, text=None):
+        '''
+        Sends this client's command on to target, a channel or nick.
+        '''
+        line = ':{0}!{0}@localhost {1} {2}'.format(self.nickname, command,
+                                                   target)
+        if text is not None:
+            line += ' :' + text
+        if target.startswith('#'):
+            members = self.factory.channels.get(target, set())
+            others = [member for member in members if member is not self]
+            if command != 'PRIVMSG':
+                others.append(self)
+            for member in others:
+                member.send(line)
+        else:
+            for client in self.factory.clients:
+                if client.nickname == target:
+                    client.send(line)
+
+    def lineReceived(self, line):
+        line = line.decode('utf-8', 'replace')
+        text = None
+        if ' :' in line:
+            line, text = line.split(' :', 1)
+        words = line.split()
+        if not words:
+            return
+        command, args = words[0].upper(), words[1:]
+        if command == 'NICK':
+            self.nickname = args[0]
+        elif command == 'USER' and not self.registered:
+            self.registered = True
+            self.factory.clients.add(self)
+            self.send(':fakeircd 001 {} :Welcome'.format(self.nickname))
+        elif command == 'PING':
+            self.send(':fakeircd PONG fakeircd :{}'.format(text or args[0]))
+        elif command == 'JOIN':
+            for channel in args[0].split(','):
+                self.factory.channels.setdefault(channel, set()).add(self)
+                self.relay('JOIN', channel)
+        elif command == 'PRIVMSG':
+            self.relay('PRIVMSG', args[0], text)
+        elif command == 'MODE' and args:
+            self.relay('MODE', args[0], ' '.join(args[1:]) or None)
+        elif command == 'QUIT':
+            self.transport.loseConnection()
+
+
+class FakeIRCd(protocol.Factory):
+    protocol = FakeClient
+
+    def __init__(self):
+        self.clients = set()
+        self.channels = {}
+
+
+if __name__ == '__main__':
+    port = reactor.listenTCP(0, FakeIRCd(), interface='127.0.0.1')
+    sys.stdout.write('{}\n'.format(port.getHost().port))
+    sys.stdout.flush()
+    reactor.run()
@@ -0,0 +1,65 @@
+import os
+import sys
+import types
+from unittest import SkipTest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    os.pardir, os.pardir)
+
+
+def load_util(name):
+    '''
+    Imports one of the scripts in utils, which aren't a package.
+    '''
+    utils = os.path.join(ROOT, 'utils')
+    if utils not in sys.path:
+        sys.path.insert(0, utils)
+    return __import__(name)
+
+
+def load_config(save_dir):
+    '''
+    Installs a config module built from example_config.py, pointed at
+    save_dir, so trivia can be imported without a real config.py.
+    '''
+    config = sys.modules.get('config')
+    if config is None:
+        config = types.ModuleType('config')
+        with open(os.path.join(ROOT, 'example_config.py')) as handle:
+            exec(handle.read(), config.__dict__)
+        sys.modules['config'] = config
+    config.USE_SSL = 'no'
+    config.SAVE_DIR = save_dir
+    config.Q_DIR = os.path.join(save_dir, 'questions')
+    config.Q_BANK = os.path.join(save_dir, 'questions.bank')
+    return config
+
+
+def make_bot(save_dir, questions=(b"Astrology: sign of 07 June`Gemini",
+                                  b"Music: The fab four`The Beatles")):
+    '''
+    Builds a triviabot writing to a string transport, with the given
+    question lines and everything saved under save_dir.
+
+    Raises SkipTest if twisted isn't installed.
+    '''
+    try:
+        from twisted.test import proto_helpers
+    except ImportError:
+        raise SkipTest("twisted is not installed")
+
+    config = load_config(save_dir)
+    if not os.path.exists(config.Q_DIR):
+        os.makedirs(config.Q_DIR)
+    with open(os.path.join(config.Q_DIR, 'questions_00'), 'wb') as handle:
+        handle.write(b'\n'.join(questions) + b'\n')
+
+    import trivia
+    factory = trivia.ircbotFactory()
+    # Write straight to the transport instead of queueing on the reactor.
+    factory.lineRate = None
+    bot = factory.buildProtocol(None)
+    bot.makeConnection(proto_helpers.StringTransport())
+    bot.transport.clear()
+    return bot
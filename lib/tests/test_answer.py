@@ -1,6 +1,9 @@
+import random
+import string
 from unittest import TestCase
 
 from lib.answer import Answer
+from lib.clues import STRATEGIES
 
 
 class TestAnswer(TestCase):
@@ -12,3 +15,104 @@ class TestAnswer(TestCase):
     def test_masking_spaces(self):
         answer = Answer("test spaces")
         self.assertEqual(answer.current_clue(), "**** ******")
+
+    def test_matches(self):
+        answer = Answer("The Test Key")
+        self.assertTrue(answer.matches("test key"))
+        self.assertFalse(answer.matches("other"))
+        answer.set_answer("Other", ["precomputed"])
+        self.assertTrue(answer.matches("Precomputed"))
+        self.assertFalse(answer.matches("other"))
+
+
+def random_answer():
+    words = [''.join(random.choice(string.ascii_letters + string.digits +
+                                   "'-.&")
+                     for _ in range(random.randint(1, 9)))
+             for _ in range(random.randint(1, 4))]
+    return random.choice([' ', '  ', ', ']).join(words)
+
+
+class TestClues(TestCase):
+
+    def setUp(self):
+        random.seed(1)
+
+    def clues(self, answer, strategy, count=12):
+        answer = Answer(answer, strategy=strategy)
+        return [answer.current_clue()] + [answer.give_clue()
+                                          for _ in range(count)]
+
+    def test_properties(self):
+        for _ in range(500):
+            text = random_answer()
+            alnum = sum(1 for character in text if character.isalnum())
+            limit = (0 if len(text) < 3 else 1 if len(text) < 5 else
+                     2 if len(text) < 7 else alnum)
+            for strategy in sorted(STRATEGIES):
+                clues = self.clues(text, strategy, alnum + 2)
+                cover = STRATEGIES[strategy](text)[2]
+                if cover:
+                    # Only the first is covered, and the mask is next.
+                    self.assertEqual(clues[0], cover)
+                    clues = clues[1:]
+                for clue in clues:
+                    self.assertEqual(len(clue), len(text))
+                    for character, shown in zip(text, clue):
+                        # Symbols and spaces always show; letters show
+                        # masked or as themselves.
+                        if character.isalnum():
+                            self.assertTrue(shown in ('*', character))
+                        else:
+                            self.assertEqual(shown, character)
+                revealed = [sum(1 for character in clue if character != '*')
+                            - (len(text) - alnum) for clue in clues]
+                # Nothing is ever masked again, and every clue reveals
+                # something until the limit or the whole answer.
+                self.assertEqual(revealed, sorted(revealed))
+                self.assertEqual(revealed[-1], min(limit, alnum))
+                for before, after in zip(revealed, revealed[1:]):
+                    if before < min(limit, alnum):
+                        self.assertTrue(after > before)
+
+    def test_limits(self):
+        self.assertEqual(self.clues("ab", 'letters', 3), ["**"] * 4)
+        self.assertEqual(len(set(self.clues("abcd", 'letters', 3)[1:])), 1)
+        self.assertEqual(
+            sum(1 for c in self.clues("abcdef", 'initials')[-1] if c != '*'),
+            2)
+
+    def test_initials(self):
+        clues = self.clues("The Fab Four", 'initials', 1)
+        self.assertEqual(clues, ["*** *** ****", "T** F** F***"])
+
+    def test_vowels(self):
+        clues = self.clues("The Fab Four", 'vowels', 1)
+        self.assertEqual(clues, ["*** *** ****", "**e *a* *ou*"])
+
+    def test_length(self):
+        clues = self.clues("The Fab Four", 'length', 2)
+        self.assertEqual(clues[:2], ["(3 words)", "*** *** ****"])
+        self.assertEqual(sum(1 for c in clues[2] if c != '*'), 3)
+        self.assertEqual(self.clues("Jean-Luc", 'length', 1),
+                         ["(1 word)", "****-***"])
+        # Even when no letters may be given.
+        self.assertEqual(self.clues("ab", 'length', 2),
+                         ["(1 word)", "**", "**"])
+
+    def test_cover_only_while_covered(self):
+        answer = Answer("The Fab Four", strategy='length')
+        answer.set_strategy('letters')
+        self.assertEqual(answer.current_clue(), "*** *** ****")
+        answer.set_strategy('length')
+        self.assertEqual(answer.current_clue(), "*** *** ****")
+        answer.set_answer("Abbey Road")
+        self.assertEqual(answer.current_clue(), "(2 words)")
+
+    def test_strategy_kept_and_changed(self):
+        answer = Answer("The Fab Four", strategy='initials')
+        answer.set_answer("Abbey Road")
+        self.assertEqual(answer.give_clue(), "A**** R***")
+        answer.set_strategy('vowels')
+        self.assertEqual(answer.give_clue(), "A**e* Roa*")
+        self.assertRaises(ValueError, answer.set_strategy, 'anagram')
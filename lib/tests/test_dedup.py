@@ -0,0 +1,97 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from lib.tests.helpers import load_util
+
+
+class TestDedup(TestCase):
+
+    def setUp(self):
+        self.dedup = load_util('dedup')
+        self.dir = tempfile.mkdtemp()
+        self.write('questions_00', b"Music: The fab four`The Beatles\n"
+                                   b"Science: H2O`Water\n"
+                                   b"\n"
+                                   b"Music: The fab four`The Beatles\n")
+        self.write('questions_01', b"Science: H2O`Water\r\n"
+                                   b"Geography: Capital of France`Paris\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data):
+        with open(os.path.join(self.dir, name), 'wb') as handle:
+            handle.write(data)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name), 'rb') as handle:
+            return handle.read()
+
+    def test_find_keeps_first(self):
+        duplicates, stats = self.dedup.find_duplicates(self.dir)
+        first = os.path.join(self.dir, 'questions_00')
+        second = os.path.join(self.dir, 'questions_01')
+        self.assertEqual(sorted(duplicates), [first, second])
+        self.assertEqual(list(duplicates[first]), [3])
+        self.assertEqual(list(duplicates[second]), [0])
+        # Only hashes are kept; the text is read back for the report.
+        self.assertEqual(duplicates[first][3],
+                         self.dedup.line_hash(b"Music: The fab four`The "
+                                              b"Beatles"))
+        self.assertEqual(list(self.dedup.read_lines(second,
+                                                    duplicates[second])),
+                         [(0, b"Science: H2O`Water")])
+        self.assertEqual(stats, {'files': 2, 'lines': 5, 'duplicates': 2,
+                                 'bytes': 51})
+
+    def test_rewrite(self):
+        mode = 0o640
+        os.chmod(os.path.join(self.dir, 'questions_00'), mode)
+        duplicates, stats = self.dedup.find_duplicates(self.dir)
+        for path, drop in duplicates.items():
+            self.dedup.rewrite(path, drop)
+        self.assertEqual(self.read('questions_00'),
+                         b"Music: The fab four`The Beatles\n"
+                         b"Science: H2O`Water\n"
+                         b"\n")
+        self.assertEqual(self.read('questions_01'),
+                         b"Geography: Capital of France`Paris\n")
+        self.assertEqual(os.stat(os.path.join(self.dir, 'questions_00'))
+                         .st_mode & 0o777, mode)
+        # Replaced by renaming, with nothing left behind.
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['questions_00', 'questions_01'])
+        self.assertEqual(self.dedup.find_duplicates(self.dir)[0], {})
+
+    def test_failed_rewrite_leaves_file(self):
+        path = os.path.join(self.dir, 'questions_00')
+        before = self.read('questions_00')
+        rename = os.rename
+
+        def broken(source, destination):
+            raise OSError("disk full")
+
+        os.rename = broken
+        try:
+            self.assertRaises(OSError, self.dedup.rewrite, path, set([3]))
+        finally:
+            os.rename = rename
+        self.assertEqual(self.read('questions_00'), before)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['questions_00', 'questions_01'])
+
+    def test_dry_run_changes_nothing(self):
+        before = [self.read(name) for name in ('questions_00', 'questions_01')]
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            argv, sys.argv = sys.argv, ['dedup.py', '-p', self.dir]
+            try:
+                self.dedup.main()
+            finally:
+                sys.stdout, sys.argv = stdout, argv
+        self.assertEqual([self.read(name)
+                          for name in ('questions_00', 'questions_01')],
+                         before)
@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from lib.floodguard import COMMAND, GUESS, FloodGuard
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def seconds(self):
+        return self.now
+
+
+class TestFloodGuard(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.penalised = []
+        self.guard = FloodGuard({GUESS: (1.0, 3), COMMAND: (0.5, 2)},
+                                penalty=10, size=100, exempt=['admin'],
+                                clock=self.clock,
+                                penalised=lambda nick, kind:
+                                self.penalised.append((nick, kind)))
+
+    def test_burst_then_rate(self):
+        self.guard.penalty = 0
+        self.assertEqual([self.guard.allow('bob', GUESS) for _ in range(4)],
+                         [True, True, True, False])
+        # Kinds and nicks have buckets of their own.
+        self.assertTrue(self.guard.allow('bob', COMMAND))
+        self.assertTrue(self.guard.allow('alice', GUESS))
+        self.clock.now += 1
+        self.assertEqual([self.guard.allow('bob', GUESS) for _ in range(2)],
+                         [True, False])
+        self.assertEqual(self.guard.dropped, {GUESS: 2, COMMAND: 0})
+
+    def test_penalty(self):
+        for _ in range(4):
+            self.guard.allow('bob', GUESS)
+        self.assertEqual(self.penalised, [('bob', GUESS)])
+        self.clock.now += 5
+        self.assertFalse(self.guard.allow('bob', GUESS))
+        # Told once, not for every line while ignored.
+        self.assertEqual(self.guard.penalties, 1)
+        self.assertEqual(len(self.penalised), 1)
+        self.clock.now += 6
+        self.assertTrue(self.guard.allow('bob', GUESS))
+
+    def test_exempt_and_unlimited(self):
+        for _ in range(100):
+            self.assertTrue(self.guard.allow('admin', GUESS))
+            self.assertTrue(self.guard.allow('bob', 'listing'))
+        self.assertEqual(len(self.guard), 0)
+
+    def test_memory_bounded(self):
+        self.guard.penalty = 0
+        for _ in range(3):
+            self.guard.allow('regular', GUESS)
+        for n in range(1000):
+            self.guard.allow('passing{}'.format(n), GUESS)
+            # Someone who keeps talking is kept.
+            if n % 20 == 0:
+                self.guard.allow('regular', COMMAND)
+                self.assertFalse(self.guard.allow('regular', GUESS))
+            self.assertTrue(len(self.guard) <= 100)
+        self.assertTrue(self.guard.forgotten >= 900)
+
+    def test_configure(self):
+        self.guard.configure({GUESS: (1.0, 1)}, 0, 100, ['bob'])
+        self.assertTrue(self.guard.allow('bob', GUESS))
+        self.assertTrue(self.guard.allow('bob', GUESS))
+        self.assertTrue(self.guard.allow('admin', GUESS))
+        self.assertFalse(self.guard.allow('admin', GUESS))
+        self.assertTrue(self.guard.allow('admin', COMMAND))
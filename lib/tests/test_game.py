@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+from unittest import SkipTest, TestCase
+
+from lib.questionbank import compile_bank, QuestionBank
+
+
+class FakeBot:
+    '''
+    Records what a game says and does instead of talking to a server.
+    '''
+
+    def __init__(self):
+        self.said = []
+        self.modes = []
+        self.awards = []
+        self.rounds_over = 0
+
+    def _cmsg(self, dest, msg, priority=None):
+        self.said.append((dest, msg))
+
+    def mode(self, channel, on, modes):
+        self.modes.append((channel, on))
+
+    def _award(self, user, points):
+        self.awards.append((user, points))
+        return None
+
+    def _round_over(self, game):
+        self.rounds_over += 1
+
+
+class TestTriviaGame(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+            from lib.game import TriviaGame
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        source = os.path.join(self.tmp, 'questions')
+        os.makedirs(source)
+        with open(os.path.join(source, 'questions_00'), 'wb') as f:
+            f.write(b"Music: The fab four`The Beatles\n")
+        compile_bank(source, os.path.join(self.tmp, 'questions.bank'))
+        self.bank = QuestionBank(os.path.join(self.tmp, 'questions.bank'))
+        self.clock = task.Clock()
+        self.bot = FakeBot()
+        self.game = TriviaGame(self.bot, '#a', self.bank, iter([0] * 10), 2,
+                               30, 5, self.clock)
+
+    def tearDown(self):
+        self.bank.close()
+        shutil.rmtree(self.tmp)
+
+    def said(self):
+        return [msg for dest, msg in self.bot.said]
+
+    def test_clues_then_give_up(self):
+        self.assertTrue(self.game.start())
+        self.assertFalse(self.game.start())
+        self.assertEqual(self.game.question, "Music: The fab four")
+        self.assertEqual(self.game.current_points, 5)
+        for _ in range(3):
+            self.clock.advance(30)
+        self.assertEqual(self.game.current_points, 1)
+        self.clock.advance(30)
+        self.assertTrue("No one got it. The answer was: The Beatles"
+                        in self.said())
+        self.assertEqual(set(dest for dest, msg in self.bot.said), set(['#a']))
+
+    def test_winner_and_round_over(self):
+        self.game.start()
+        self.assertTrue(self.game.asking)
+        self.game.winner('bob')
+        self.assertEqual(self.bot.awards, [('bob', 5)])
+        self.assertTrue("BOB GOT IT!" in self.said())
+        # Saying the answer again while the next question waits doesn't
+        # count.
+        self.assertFalse(self.game.asking)
+        self.clock.advance(30)
+        self.clock.advance(30)
+        self.game.winner('alice')
+        self.assertEqual(self.bot.awards, [('bob', 5), ('alice', 3)])
+        self.assertTrue("Round complete!" in self.said())
+        self.assertFalse(self.game.running)
+        self.assertEqual(self.bot.rounds_over, 1)
+        self.assertEqual(self.bot.modes[-1], ('#a', False))
+
+    def test_timers_keep_to_deadlines(self):
+        self.game.start()
+        # A stalled reactor catches up on every clue that was due.
+        self.clock.advance(95)
+        self.assertEqual(self.game.clue_number, 4)
+        self.game.winner('bob')
+        self.clock.advance(4)
+        self.assertEqual(self.game.round_question_num, 1)
+        self.clock.advance(1)
+        self.assertEqual(self.game.round_question_num, 2)
+        self.assertEqual(self.game._pacer.questions, 2)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+    def test_votes_skip(self):
+        self.game.start()
+        for user in ('bob', 'bob', 'alice', 'carol'):
+            self.game.vote(user)
+        self.assertTrue("You already voted, bob, give someone else a chance "
+                        "to hate this question" in self.said())
+        self.assertTrue("Question has been skipped. The answer was: "
+                        "The Beatles" in self.said())
+        self.assertEqual(self.game.clue_number, 1)
+
+
+class TestPrefetching(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import defer, task
+            from lib.game import TriviaGame
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        source = os.path.join(self.tmp, 'questions')
+        os.makedirs(source)
+        with open(os.path.join(source, 'questions_00'), 'wb') as f:
+            f.write(b''.join(b"Numbers: " + str(n).encode('ascii') +
+                             b"`" + str(n).encode('ascii') + b"\n"
+                             for n in range(10)))
+        compile_bank(source, os.path.join(self.tmp, 'questions.bank'))
+        self.bank = QuestionBank(os.path.join(self.tmp, 'questions.bank'))
+        self.clock = task.Clock()
+        self.game = TriviaGame(FakeBot(), '#a', self.bank, iter(range(10)),
+                               5, 30, 5, self.clock, prefetch_depth=2,
+                               defer_to_thread=defer.maybeDeferred)
+
+    def tearDown(self):
+        self.bank.close()
+        shutil.rmtree(self.tmp)
+
+    def test_questions_in_order_and_ready(self):
+        self.game.start()
+        asked = [self.game.question]
+        for _ in range(4):
+            self.assertEqual(self.game._prefetch.ready, 2)
+            self.game.winner('bob')
+            self.clock.advance(30)
+            asked.append(self.game.question)
+        self.assertEqual(asked, ["Numbers: {}".format(n) for n in range(5)])
+        self.assertEqual(self.game.answer.answer, "4")
+        # Even the first question of the round was ready.
+        self.assertEqual(self.game._prefetch.misses, 0)
+
+    def test_filled_before_start(self):
+        self.assertEqual(self.game._prefetch.ready, 2)
+        self.game.start()
+        self.assertEqual(self.game.question, "Numbers: 0")
+        self.assertEqual(self.game._prefetch.misses, 0)
+
+    def test_give_up_wastes_nothing(self):
+        self.game.start()
+        for _ in range(4):
+            self.clock.advance(30)
+        self.assertEqual(self.game.question, "Numbers: 0")
+        self.clock.advance(5)
+        self.assertEqual(self.game.question, "Numbers: 1")
+        # The one being asked and two ready: nothing thrown away.
+        self.assertEqual(self.game._prefetch.ready, 2)
+        self.assertEqual(next(self.game._cursor), 4)
+
+    def test_reload_waits_for_preparations(self):
+        from twisted.internet import defer
+        held = []
+
+        def thread(function, *args):
+            d = defer.Deferred()
+            held.append((d, function, args))
+            return d
+
+        self.game._prefetch._defer_to_thread = thread
+        self.game._prefetch.flush()
+        self.game.start()
+        self.assertEqual(len(held), 2)
+        done = []
+        self.game.reloaded(self.bank, None, 30, 5).addCallback(done.append)
+        # Still reading the old questions.
+        self.assertEqual(done, [])
+        for d, function, args in held:
+            d.callback(function(*args))
+        self.assertEqual(done, [None])
+        self.game.stop()
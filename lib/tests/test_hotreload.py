@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from lib.hotreload import import_fresh, read_config, rebind, swap_classes
+
+
+class TestHotReload(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.package = os.path.join(self.tmp, 'reloadable')
+        os.mkdir(self.package)
+        self.write('__init__.py', '')
+        self.write('counter.py', 'class Counter:\n'
+                   '    def __init__(self):\n'
+                   '        self.count = 0\n'
+                   '    def step(self):\n'
+                   '        self.count += 1\n')
+        self.write('holder.py', 'from reloadable.counter import Counter\n'
+                   'class Holder:\n'
+                   '    def __init__(self):\n'
+                   '        self.counters = [Counter()]\n'
+                   "        self.named = {'a': (Counter(),)}\n")
+        self.names = ('reloadable.counter', 'reloadable.holder')
+        sys.path.insert(0, self.tmp)
+        self.bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = True
+
+    def tearDown(self):
+        sys.dont_write_bytecode = self.bytecode
+        sys.path.remove(self.tmp)
+        for name in self.names + ('reloadable',):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, source):
+        with open(os.path.join(self.package, name), 'w') as handle:
+            handle.write(source)
+
+    def test_swap_keeps_state(self):
+        from reloadable.holder import Holder
+        holder = Holder()
+        holder.counters[0].step()
+        self.write('counter.py', 'class Counter:\n'
+                   '    def step(self):\n'
+                   '        self.count += 10\n')
+        previous, fresh = import_fresh(self.names)
+        self.assertTrue(previous['reloadable.holder'].Holder is Holder)
+
+        namespace = {'Holder': Holder, 'other': len}
+        rebind(namespace, fresh)
+        self.assertTrue(namespace['Holder'] is
+                        fresh['reloadable.holder'].Holder)
+        self.assertTrue(namespace['other'] is len)
+
+        swap_classes(holder, fresh)
+        holder.counters[0].step()
+        self.assertEqual(holder.counters[0].count, 11)
+        # Inside a dict too.
+        holder.named['a'][0].step()
+        self.assertEqual(holder.named['a'][0].count, 10)
+
+    def test_failed_import_puts_back_old_modules(self):
+        import reloadable.holder
+        old = sys.modules['reloadable.counter']
+        self.write('holder.py', 'def broken(:\n')
+        self.assertRaises(SyntaxError, import_fresh, self.names)
+        self.assertTrue(sys.modules['reloadable.counter'] is old)
+        self.assertTrue(sys.modules['reloadable.holder'] is reloadable.holder)
+        self.assertTrue(sys.modules['reloadable'].counter is old)
+
+    def test_read_config(self):
+        filename = os.path.join(self.tmp, 'config.py')
+        with open(filename, 'w') as handle:
+            handle.write("ADMINS = ['admin']\n")
+        config = read_config(filename + 'c')
+        self.assertEqual((config.ADMINS, config.__file__),
+                         (['admin'], filename))
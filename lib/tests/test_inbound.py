@@ -0,0 +1,21 @@
+from unittest import TestCase
+
+from lib.inbound import parse_command, sanitize
+
+
+class TestInbound(TestCase):
+
+    def test_sanitize(self):
+        self.assertEqual(sanitize("\x02bold\x02 \x0304colour\x03"),
+                         "bold 04colour")
+        self.assertEqual(sanitize("tab\tok"), "tab\tok")
+
+    def test_parse_command(self):
+        self.assertEqual(parse_command("!join my team", "bot"),
+                         ("join", ["my", "team"]))
+        self.assertEqual(parse_command("!! start", "bot"), ("start", []))
+        self.assertEqual(parse_command("bot: help me", "bot"),
+                         ("help", ["me"]))
+        self.assertEqual(parse_command("bot", "bot"), None)
+        self.assertEqual(parse_command("!", "bot"), None)
+        self.assertEqual(parse_command("hello", "bot"), None)
@@ -0,0 +1,59 @@
+import random
+from unittest import TestCase
+
+from lib.leaderboard import Leaderboard
+
+
+def ranked(scores):
+    order = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(rank, name, points)
+            for rank, (name, points) in enumerate(order, start=1)]
+
+
+class TestLeaderboard(TestCase):
+
+    def test_matches_sorting(self):
+        rng = random.Random(7)
+        board = Leaderboard(seed=1)
+        scores = {}
+        for _ in range(3000):
+            name = 'player{}'.format(rng.randrange(300))
+            action = rng.random()
+            if action < 0.1:
+                board.discard(name)
+                scores.pop(name, None)
+            elif action < 0.3:
+                points = rng.randrange(50)
+                board.set(name, points)
+                scores[name] = points
+            else:
+                scores[name] = board.add(name, rng.randrange(1, 6))
+        expected = ranked(scores)
+        self.assertEqual(len(board), len(scores))
+        self.assertEqual(board.page(0, len(scores) + 5), expected)
+        for rank, name, points in expected:
+            self.assertEqual(board.rank(name), rank)
+            self.assertEqual(board.points(name), points)
+        for start in (0, 1, 17, len(expected) - 3):
+            self.assertEqual(board.page(start, 10), expected[start:start + 10])
+
+    def test_ties_alphabetical(self):
+        board = Leaderboard({'carol': 5, 'alice': 5, 'bob': 9})
+        self.assertEqual(board.top(10), [(1, 'bob', 9), (2, 'alice', 5),
+                                         (3, 'carol', 5)])
+
+    def test_around(self):
+        board = Leaderboard(dict(('p{}'.format(i), i) for i in range(10)))
+        self.assertEqual([name for rank, name, points in
+                          board.around('p5', 2)],
+                         ['p7', 'p6', 'p5', 'p4', 'p3'])
+        self.assertEqual([name for rank, name, points in
+                          board.around('p9', 2)], ['p9', 'p8', 'p7'])
+        self.assertEqual(board.around('nobody', 2), [])
+
+    def test_missing(self):
+        board = Leaderboard()
+        self.assertEqual(board.rank('bob'), None)
+        self.assertEqual(board.page(0, 10), [])
+        board.discard('bob')
+        self.assertEqual(len(board), 0)
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from lib.log import (DEBUG, INFO, BufferedWriter, Logger, RateLimit,
+                     level_named)
+
+
+class Lines:
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(json.loads(line))
+
+    def close(self):
+        pass
+
+
+class Unprintable:
+
+    def __repr__(self):
+        raise AssertionError("formatted a record nobody wanted")
+
+
+class TestLogger(TestCase):
+
+    def setUp(self):
+        self.now = [1000.0]
+        self.out = Lines()
+        self.log = Logger(self.out, INFO, chatter_rate=2,
+                          clock=lambda: self.now[0])
+
+    def test_record(self):
+        self.log.info('joined', channel='#trivia', thing=object())
+        record = self.out.lines[0]
+        self.assertEqual((record['time'], record['level'], record['event'],
+                          record['channel']),
+                         (1000.0, 'info', 'joined', '#trivia'))
+        self.assertTrue(record['thing'].startswith('<object'))
+
+    def test_below_level_costs_nothing(self):
+        self.log.debug('teams', teams=Unprintable())
+        self.log.chatter(DEBUG, 'message', text=Unprintable())
+        self.assertEqual(self.out.lines, [])
+        self.log.configure(level=DEBUG)
+        self.log.debug('teams', teams={'users': {}})
+        self.assertEqual(self.out.lines[0]['teams'], {'users': {}})
+
+    def test_chatter_sampled(self):
+        for n in range(5):
+            self.log.chatter(INFO, 'command', n=n)
+        self.now[0] += 1
+        self.log.chatter(INFO, 'command', n=5)
+        self.assertEqual([(line['n'], line.get('suppressed'))
+                          for line in self.out.lines],
+                         [(0, None), (1, None), (5, 3)])
+
+    def test_level_named(self):
+        self.assertEqual(level_named('DEBUG'), DEBUG)
+        self.assertRaises(ValueError, level_named, 'loud')
+
+
+class TestRateLimit(TestCase):
+
+    def test_per_second(self):
+        now = [5.5]
+        limit = RateLimit(1, clock=lambda: now[0])
+        self.assertEqual([limit.allow() for _ in range(3)],
+                         [(True, 0), (False, 0), (False, 0)])
+        now[0] = 6.0
+        self.assertEqual(limit.allow(), (True, 2))
+
+
+class TestBufferedWriter(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'trivia.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read(self, filename):
+        with open(filename) as handle:
+            return handle.read()
+
+    def test_close_writes_everything(self):
+        writer = BufferedWriter(self.filename)
+        for n in range(1000):
+            writer.write('{}\n'.format(n))
+        writer.close()
+        self.assertEqual(self.read(self.filename).split(),
+                         [str(n) for n in range(1000)])
+        self.assertEqual(writer.dropped, 0)
+
+    def test_rotation(self):
+        writer = BufferedWriter(self.filename, max_bytes=10, backups=2)
+        for line in ('aaaa\n', 'bbbb\n', 'cccc\n', 'dddd\n', 'eeee\n',
+                     'ffff\n', 'gggg\n'):
+            writer.write(line)
+            # One line at a time, so every write is a batch of its own.
+            while writer._lines:
+                pass
+        writer.close()
+        self.assertEqual(self.read(self.filename), 'gggg\n')
+        self.assertEqual(self.read(self.filename + '.1'), 'eeee\nffff\n')
+        self.assertEqual(self.read(self.filename + '.2'), 'cccc\ndddd\n')
+        self.assertFalse(os.path.exists(self.filename + '.3'))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from lib.matching import (answer_keys, exact_word, Matcher, normalize,
+                          within_distance)
+
+
+class TestNormalize(TestCase):
+
+    def test_articles_and_punctuation(self):
+        self.assertEqual(normalize("The Beatles!"), "beatles")
+        self.assertEqual(normalize('"My name is Bond, James Bond."'),
+                         "my name is bond james bond")
+        self.assertEqual(normalize("O'Neill"), "oneill")
+        # A lone article is the whole answer, not an article.
+        self.assertEqual(normalize("A"), "a")
+
+    def test_numbers(self):
+        self.assertEqual(normalize("40,000"), "40000")
+        self.assertEqual(normalize("Fifteen"), "15")
+        self.assertEqual(normalize("1,2,3"), "1 2 3")
+
+
+class TestAnswerKeys(TestCase):
+
+    def test_alternates(self):
+        self.assertEqual(answer_keys("colour|color"),
+                         ["colour", "color", "colour color"])
+        self.assertEqual(answer_keys("M|A|R|R|S"), ["m a r r s"])
+
+    def test_punctuation_answer(self):
+        self.assertEqual(answer_keys("+"), ["+"])
+        self.assertTrue(Matcher(answer_keys("+")).matches(" + "))
+
+
+class TestWithinDistance(TestCase):
+
+    def test_distances(self):
+        self.assertTrue(within_distance("stirred", "stirred", 0))
+        self.assertTrue(within_distance("stirred", "stired", 1))
+        self.assertTrue(within_distance("gemini", "gemeni", 1))
+        self.assertFalse(within_distance("gemini", "gmeeni", 1))
+        self.assertTrue(within_distance("kitten", "sitting", 3))
+        self.assertFalse(within_distance("kitten", "sitting", 2))
+        self.assertFalse(within_distance("a", "abcd", 2))
+        self.assertTrue(within_distance("", "ab", 2))
+
+
+class TestMatcher(TestCase):
+
+    def test_near_misses(self):
+        matcher = Matcher(answer_keys("The Beatles"))
+        for guess in ("the beatles", "beatles", "BEATLES!", "the beetles"):
+            self.assertTrue(matcher.matches(guess), guess)
+        self.assertFalse(matcher.matches("stones"))
+
+    def test_numbers_are_exact(self):
+        matcher = Matcher(answer_keys("40,000"))
+        self.assertTrue(matcher.matches("40000"))
+        self.assertTrue(matcher.matches("40,000"))
+        self.assertFalse(matcher.matches("40001"))
+
+    def test_numbers_in_words_are_exact(self):
+        for answer, wrong, right in (
+                ("Apollo 11", "Apollo 12", "apolo 11"),
+                ("Henry VIII", "Henry VII", "henri viii"),
+                ("Louis XIV", "Louis XV", "luis xiv"),
+                ("1966 World Cup", "1967 World Cup", "1966 wold cup"),
+                ("Boeing 747", "Boeing 737", "boing 747"),
+                ("World War 2", "World War 1", "world war two"),
+                ("Pope John Paul II", "pope john paul i", "pope jon paul ii")):
+            matcher = Matcher(answer_keys(answer))
+            self.assertFalse(matcher.matches(wrong), wrong)
+            self.assertTrue(matcher.matches(right), right)
+        # The numeral can't be left out either.
+        self.assertFalse(Matcher(answer_keys("Henry VIII"))
+                         .matches("henry"))
+
+    def test_exact_words(self):
+        for word in ("11", "2nd", "viii", "xiv", "i", "mcmlxvi"):
+            self.assertTrue(exact_word(word), word)
+        for word in ("henry", "cup", "vivid", "civil", ""):
+            self.assertFalse(exact_word(word), word)
+
+    def test_short_answers_are_exact(self):
+        matcher = Matcher(answer_keys("rock"))
+        self.assertFalse(matcher.matches("rick"))
+
+    def test_long_guess_rejected(self):
+        matcher = Matcher(answer_keys("beatles"))
+        self.assertFalse(matcher.matches("beatles " + "x" * 100))
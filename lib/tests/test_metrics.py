@@ -0,0 +1,70 @@
+import unittest
+from unittest import TestCase
+
+from lib.metrics import Registry, metrics_site
+
+try:
+    from twisted.web.test.requesthelper import DummyRequest
+except ImportError:
+    DummyRequest = None
+
+
+class TestRegistry(TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge(self):
+        hits = self.registry.counter('guesses_total', 'Guesses.',
+                                     {'result': 'hit'})
+        misses = self.registry.counter('guesses_total', 'Guesses.',
+                                       {'result': 'miss'})
+        hits.inc()
+        misses.inc(3)
+        depth = [4]
+        self.registry.gauge('waiting', 'Waiting.').set_function(
+            lambda: depth[0])
+        depth[0] = 2
+        self.assertEqual(self.registry.render(),
+                         '# HELP guesses_total Guesses.\n'
+                         '# TYPE guesses_total counter\n'
+                         'guesses_total{result="hit"} 1\n'
+                         'guesses_total{result="miss"} 3\n'
+                         '# HELP waiting Waiting.\n'
+                         '# TYPE waiting gauge\n'
+                         'waiting 2\n')
+
+    def test_same_metric_again(self):
+        counter = self.registry.counter('saves_total', 'Saves.')
+        self.assertTrue(self.registry.counter('saves_total', 'Saves.')
+                        is counter)
+        self.assertRaises(ValueError, self.registry.gauge, 'saves_total',
+                          'Saves.')
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('took_seconds', 'Took.',
+                                            buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(self.registry.render().splitlines()[2:],
+                         ['took_seconds_bucket{le="0.1"} 2',
+                          'took_seconds_bucket{le="1.0"} 3',
+                          'took_seconds_bucket{le="+Inf"} 4',
+                          'took_seconds_sum 2.65',
+                          'took_seconds_count 4'])
+
+    def test_label_escaping(self):
+        self.registry.counter('said_total', 'Said.', {'text': 'a "b"\\'})
+        self.assertEqual(self.registry.render().splitlines()[2],
+                         'said_total{text="a \\"b\\"\\\\"} 0')
+
+    @unittest.skipIf(DummyRequest is None, "needs twisted.web")
+    def test_site(self):
+        self.registry.counter('saves_total', 'Saves.').inc()
+        site = metrics_site(self.registry)
+        request = DummyRequest([b'metrics'])
+        resource = site.getResourceFor(request)
+        body = resource.render(request)
+        self.assertTrue(b'saves_total 1\n' in body)
+        self.assertEqual(request.responseHeaders.getRawHeaders(
+            b'content-type'), [b'text/plain; version=0.0.4; charset=utf-8'])
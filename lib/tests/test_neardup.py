@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from lib.tests.helpers import load_util
+
+
+class TestNearDup(TestCase):
+
+    def setUp(self):
+        self.neardup = load_util('neardup')
+
+    def test_shingles(self):
+        shingles = self.neardup.shingles
+        self.assertEqual(len(shingles(b"If you were born on 07 June", 2)), 6)
+        # Case and punctuation don't matter.
+        self.assertEqual(shingles(b"Born on 07 June!", 2),
+                         shingles(b"born, ON 07 june", 2))
+        self.assertNotEqual(shingles(b"born on 07 june", 2),
+                            shingles(b"born on 08 june", 2))
+        # Too short for a whole shingle is one shingle of everything.
+        self.assertEqual(len(shingles(b"Gemini", 3)), 1)
+
+    def test_signature(self):
+        perms = self.neardup.permutations(64, 1)
+        self.assertEqual(perms, self.neardup.permutations(64, 1))
+        sign = self.neardup.signature
+        shingles = self.neardup.shingles
+        first = sign(shingles(b"If you were born on 07 June what star "
+                              b"sign would you be", 2), perms)
+        second = sign(shingles(b"If you were born on 07 June what star "
+                               b"sign (zodiac) would you be", 2), perms)
+        other = sign(shingles(b"Which planet is closest to the sun", 2),
+                     perms)
+        self.assertEqual(len(first), 64)
+        self.assertEqual(first, sign(shingles(b"if you were born on 07 "
+                                              b"june what star sign would "
+                                              b"you be", 2), perms))
+
+        def same(a, b):
+            return sum(1 for x, y in zip(a, b) if x == y) / 64.0
+
+        self.assertTrue(same(first, second) > 0.5)
+        self.assertTrue(same(first, other) < 0.2)
+
+    def test_cluster(self):
+        edges = {0: {1: 0.9, 2: 0.7},
+                 1: {0: 0.9, 3: 0.8},
+                 2: {0: 0.7},
+                 3: {1: 0.8, 4: 0.8},
+                 4: {3: 0.8}}
+        # 1 is claimed by 0, so 3 leads its own cluster rather than
+        # chaining everything into one.
+        self.assertEqual(self.neardup.cluster(edges),
+                         [[(0, 1.0), (1, 0.9), (2, 0.7)],
+                          [(3, 1.0), (4, 0.8)]])
+
+    def test_bucket_pairs(self):
+        bucket_pairs = self.neardup.bucket_pairs
+        self.assertEqual(bucket_pairs([1, 2, 3], [], 3),
+                         [(1, 2), (1, 3), (2, 3)])
+        # Too big: split on the next band, where 1 and 3 still agree.
+        pairs = bucket_pairs([1, 2, 3, 4], [lambda item: item % 2], 3)
+        self.assertEqual(sorted(pairs), [(1, 3), (2, 4)])
+        # Nothing left to split on: each only with the first.
+        self.assertEqual(bucket_pairs([1, 2, 3, 4], [lambda item: 0], 3),
+                         [(1, 2), (1, 3), (1, 4)])
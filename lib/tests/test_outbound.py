@@ -0,0 +1,101 @@
+from unittest import SkipTest, TestCase
+
+from lib.outbound import (CRITICAL, INFO, MAX_LINE, PRIVATE,
+                          OutboundScheduler, budget, size, split)
+
+
+class TestPack(TestCase):
+
+    def test_budget(self):
+        # What's left fits the longest relayed line.
+        room = budget('triviabot', '#triviachannel')
+        relayed = ':triviabot!{}@{} PRIVMSG #triviachannel :{}\r\n'.format(
+            'u' * 10, 'h' * 63, 'x' * room)
+        self.assertEqual(len(relayed), MAX_LINE)
+
+    def test_split(self):
+        self.assertEqual(split('one two three', 7), ['one two', 'three'])
+        self.assertEqual(split('abcdefghij', 4), ['abcd', 'efgh', 'ij'])
+        self.assertEqual(split('', 4), [])
+        for piece in split(u'\xe9t\xe9 ' * 30, 20):
+            self.assertTrue(size(piece) <= 20)
+
+
+class TestOutboundScheduler(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.clock = task.Clock()
+        self.sent = []
+        self.scheduler = self.make(0.4)
+
+    def make(self, line_rate, depth=30):
+        return OutboundScheduler(
+            lambda destination, message:
+                self.sent.append((destination, message)),
+            lambda destination: 60, '*', line_rate, depth, self.clock)
+
+    def drain(self):
+        for _ in range(100):
+            self.clock.advance(0.4)
+
+    def test_packs_per_destination(self):
+        for destination, line in (('#game', 'a'), ('#game', ''),
+                                  ('#game', 'b'), ('#game', 'c' * 55)):
+            self.scheduler.queue(destination, line, CRITICAL)
+        self.assertEqual(self.sent, [])
+        self.clock.advance(0)
+        self.assertEqual(self.sent, [('#game', '*a | b')])
+        self.clock.advance(0.4)
+        self.assertEqual(self.sent[1], ('#game', '*' + 'c' * 55))
+        self.assertEqual((self.scheduler.lines, self.scheduler.messages),
+                         (3, 2))
+        self.assertAlmostEqual(self.scheduler.time_saved, 0.4)
+        self.assertEqual(self.scheduler.prefix_bytes_saved, 1)
+
+    def test_priority_and_paces(self):
+        for number in range(20):
+            self.scheduler.queue('bob', 'x' * 50 + str(number), PRIVATE)
+        self.clock.advance(0)
+        self.clock.advance(0.2)
+        self.scheduler.queue('#game', 'Clue: ***', CRITICAL)
+        self.clock.advance(0.1)
+        self.assertEqual(len(self.sent), 1)
+        self.clock.advance(0.1)
+        self.assertEqual(self.sent[-1], ('#game', '*Clue: ***'))
+        self.assertAlmostEqual(self.scheduler.max_wait[CRITICAL], 0.2)
+        self.assertEqual(self.scheduler.depth(PRIVATE), 19)
+
+    def test_round_robin(self):
+        for line in 'abc':
+            self.scheduler.queue('alice', line * 40, PRIVATE)
+        self.scheduler.queue('bob', 'z' * 40, PRIVATE)
+        self.drain()
+        self.assertEqual([destination for destination, message in self.sent],
+                         ['alice', 'bob', 'alice', 'alice'])
+
+    def test_depth(self):
+        scheduler = self.make(0.4, depth=3)
+        for number in range(10):
+            scheduler.queue('bob', 'x' * 50 + str(number), INFO)
+        self.drain()
+        self.assertEqual([message[-1] for destination, message in self.sent],
+                         ['7', '8', '9'])
+        self.assertEqual(scheduler.dropped[INFO], 7)
+
+    def test_calls_stay_in_order(self):
+        calls = []
+        self.scheduler.queue('#game', 'a', CRITICAL)
+        self.scheduler.call(lambda: calls.append(len(self.sent)), '#game')
+        self.scheduler.queue('#game', 'b', CRITICAL)
+        self.drain()
+        self.assertEqual(calls, [1])
+        self.assertEqual(self.sent, [('#game', '*a'), ('#game', '*b')])
+
+    def test_unthrottled_sends_at_once(self):
+        scheduler = self.make(None)
+        scheduler.queue('#game', 'a')
+        self.assertEqual(self.sent, [('#game', '*a')])
@@ -0,0 +1,95 @@
+from unittest import SkipTest, TestCase
+
+from lib.pacing import Pacer
+
+
+class TestPacer(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.clock = task.Clock()
+        self.calls = []
+        self.pacer = Pacer(self.call, 30, 10, 60, 0.9, 10, clock=self.clock)
+
+    def call(self):
+        self.calls.append(self.clock.seconds())
+        self.pacer.after(30)
+
+    def test_deadlines_dont_drift(self):
+        self.pacer.start()
+        self.pacer.after(30)
+        # The clock jumps past several deadlines at once, as a stalled
+        # reactor would: every one still happens, and they stay on time.
+        self.clock.advance(95)
+        self.clock.advance(30)
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(self.pacer._timer.deadline, 150)
+
+    def test_restart_drops_pending(self):
+        self.pacer.start()
+        self.pacer.after(30)
+        self.clock.advance(20)
+        self.pacer.restart(5)
+        self.clock.advance(10)
+        self.assertEqual(len(self.calls), 1)
+        # Counting on from the new deadline, not the old one.
+        self.assertEqual(self.pacer._timer.deadline, 55)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.pacer.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertFalse(self.pacer.running)
+
+    def test_timers_owned(self):
+        calls = []
+        self.pacer.start()
+        timers = [self.pacer.timer(calls.append, n) for n in range(3)]
+        for timer in timers:
+            timer.start()
+            timer.after(10)
+        timers[1].restart(5)
+        self.clock.advance(7)
+        self.assertEqual(calls, [1])
+        self.pacer.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_interval_follows_answers(self):
+        for _ in range(4):
+            self.pacer.observe(6)
+        # Not enough to go on yet.
+        self.assertEqual(self.pacer.interval, 30)
+        intervals = []
+        for _ in range(10):
+            self.pacer.observe(6)
+            intervals.append(self.pacer.interval)
+        # Shortened a quarter at a time, down to the bound.
+        self.assertEqual(intervals[:3], [22.5, 16.875, 12.65625])
+        self.assertEqual(intervals[-1], 10)
+        # Given up on, at four intervals: it lengthens again.
+        for _ in range(5):
+            self.pacer.observe(40)
+        self.assertTrue(self.pacer.interval > 13)
+        for _ in range(20):
+            self.pacer.observe(self.pacer.interval * 4)
+        self.assertEqual(self.pacer.interval, 60)
+
+    def test_fixed_without_bounds(self):
+        pacer = Pacer(self.call, 30, clock=self.clock)
+        for _ in range(20):
+            pacer.observe(3)
+        self.assertEqual(pacer.interval, 30)
+        pacer.configure(20)
+        self.assertEqual(pacer.interval, 20)
+
+    def test_questions_per_hour(self):
+        self.assertEqual(self.pacer.questions_per_hour, 0.0)
+        self.pacer.start()
+        for _ in range(3):
+            self.pacer.asked()
+        self.clock.advance(60)
+        self.pacer.stop()
+        # Time between rounds doesn't count.
+        self.clock.advance(600)
+        self.assertEqual(self.pacer.questions_per_hour, 180)
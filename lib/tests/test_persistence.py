@@ -0,0 +1,243 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import SkipTest, TestCase
+
+from lib.persistence import (GameStore, JournalStore, apply_event,
+                             read_json, write_json)
+
+
+def synchronous(function, *args):
+    '''
+    Stands in for deferToThread, running function straight away.
+    '''
+    from twisted.internet import defer
+    return defer.maybeDeferred(function, *args)
+
+
+class TestWriteJson(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'scores.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        write_json(self.filename, {'user': {'bob': 3}})
+        self.assertEqual(read_json(self.filename, None), {'user': {'bob': 3}})
+        self.assertEqual(os.listdir(self.tmp), ['scores.json'])
+
+    def test_failed_write_keeps_old_file(self):
+        write_json(self.filename, {'user': {}})
+        self.assertRaises(TypeError, write_json, self.filename, {'x': object()})
+        self.assertEqual(read_json(self.filename, None), {'user': {}})
+        self.assertEqual(os.listdir(self.tmp), ['scores.json'])
+
+    def test_read_missing_or_broken(self):
+        self.assertEqual(read_json(self.filename, 'default'), 'default')
+        with open(self.filename, 'w') as handle:
+            handle.write('{"user": ')
+        self.assertEqual(read_json(self.filename, 'default'), 'default')
+
+
+class TestGameStore(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        self.clock = task.Clock()
+        self.store = GameStore(self.tmp, 5, self.clock, synchronous)
+        self.scores, self.teams = self.store.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def saved(self):
+        with open(os.path.join(self.tmp, 'scores.json')) as handle:
+            return json.load(handle)
+
+    def test_load_fills_in_missing(self):
+        self.assertEqual(self.scores, {'user': {}, 'team': {}})
+        self.assertEqual(self.teams, {'users': {}, 'teams': {}})
+
+    def test_changes_are_coalesced(self):
+        for points in range(1, 11):
+            self.scores['user']['bob'] = points
+            self.store.changed(self.scores, self.teams)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'scores.json')))
+        self.assertTrue(self.store.pending)
+
+        self.clock.advance(5)
+        self.assertEqual(self.saved()['user'], {'bob': 10})
+        self.assertEqual(self.store.saves, 1)
+        self.assertEqual(self.store.coalesced, 9)
+        self.assertFalse(self.store.pending)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_snapshot_is_a_copy(self):
+        self.teams['teams']['red'] = {'members': ['bob'], 'captain': 'bob'}
+        self.store.changed(self.scores, self.teams)
+        self.clock.advance(5)
+        self.teams['teams']['red']['members'].append('alice')
+        self.store.flush()
+        with open(os.path.join(self.tmp, 'teams.json')) as handle:
+            self.assertEqual(json.load(handle)['teams']['red']['members'],
+                             ['bob'])
+
+    def test_flush(self):
+        self.scores['user']['bob'] = 1
+        self.store.changed(self.scores, self.teams)
+        self.store.flush()
+        self.assertEqual(self.saved()['user'], {'bob': 1})
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_failure_retries(self):
+        os.chmod(self.tmp, 0o500)
+        if os.access(self.tmp, os.W_OK):
+            os.chmod(self.tmp, 0o700)
+            raise SkipTest("running as a user that can write anywhere")
+        self.store.changed(self.scores, self.teams)
+        self.clock.advance(5)
+        self.assertEqual(self.store.failures, 1)
+        self.assertTrue(self.store.pending)
+
+        os.chmod(self.tmp, 0o700)
+        self.clock.advance(5)
+        self.assertEqual(self.store.saves, 1)
+        self.assertFalse(self.store.pending)
+
+    def test_failed_flush_keeps_changes(self):
+        import lib.persistence
+
+        def broken(filename, obj):
+            raise IOError("disk full")
+
+        self.scores['user']['bob'] = 1
+        self.store.changed(self.scores, self.teams)
+        lib.persistence.write_json = broken
+        try:
+            self.assertFalse(self.store.flush())
+        finally:
+            lib.persistence.write_json = write_json
+        self.assertEqual(self.store.failures, 1)
+        self.assertTrue(self.store.pending)
+        self.clock.advance(5)
+        self.assertEqual(self.saved()['user'], {'bob': 1})
+        self.assertTrue(self.store.flush())
+
+
+class TestApplyEvent(TestCase):
+
+    def test_events(self):
+        scores = {'user': {}, 'team': {}}
+        teams = {'users': {}, 'teams': {}}
+        red = {'owner': 'bob', 'name': 'red', 'members': ['bob']}
+        for event in ({'e': 'join', 'user': 'bob', 'team': 'red',
+                       'state': red},
+                      {'e': 'award', 'user': 'bob', 'team': 'red',
+                       'points': 5},
+                      {'e': 'award', 'user': 'bob', 'team': None,
+                       'points': 2},
+                      {'e': 'set', 'user': 'alice', 'points': 9}):
+            apply_event(scores, teams, event)
+        self.assertEqual(scores, {'user': {'bob': 7, 'alice': 9},
+                                  'team': {'red': 5}})
+        self.assertEqual(teams, {'users': {'bob': 'red'},
+                                 'teams': {'red': red}})
+
+        apply_event(scores, teams, {'e': 'leave', 'user': 'bob',
+                                    'team': 'red', 'state': None})
+        apply_event(scores, teams, {'e': 'reset'})
+        self.assertEqual(scores, {'user': {}, 'team': {}})
+        self.assertEqual(teams, {'users': {}, 'teams': {}})
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, apply_event, {}, {}, {'e': 'nope'})
+
+
+class TestJournalStore(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        self.clock = task.Clock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def store(self, compact_every=1000):
+        store = JournalStore(self.tmp, 5, compact_every, self.clock,
+                             synchronous)
+        scores, teams = store.load()
+        return store, scores, teams
+
+    def award(self, store, scores, teams, user, points=1):
+        scores['user'][user] = scores['user'].get(user, 0) + points
+        store.record({'e': 'award', 'user': user, 'team': None,
+                      'points': points}, scores, teams)
+
+    def test_replay(self):
+        store, scores, teams = self.store()
+        for _ in range(3):
+            self.award(store, scores, teams, 'bob')
+        self.clock.advance(5)
+        self.award(store, scores, teams, 'alice', 4)
+        store.flush()
+        self.assertEqual(store.saves, 2)
+
+        store, scores, teams = self.store()
+        self.assertEqual(scores['user'], {'bob': 3, 'alice': 4})
+        self.award(store, scores, teams, 'bob')
+        store.flush()
+        self.assertEqual(self.store()[1]['user'], {'bob': 4, 'alice': 4})
+
+    def test_compaction_keeps_archive(self):
+        store, scores, teams = self.store(compact_every=4)
+        for _ in range(10):
+            self.award(store, scores, teams, 'bob')
+        store.flush()
+        self.assertEqual(store.compactions, 2)
+        self.assertEqual(sorted(os.listdir(self.tmp)),
+                         ['journal-4.jsonl', 'journal-8.jsonl',
+                          'journal.jsonl', 'snapshot.json'])
+        self.assertEqual(read_json(os.path.join(self.tmp, 'snapshot.json'),
+                                   None)['sequence'], 8)
+        self.assertEqual(self.store()[1]['user'], {'bob': 10})
+
+    def test_crash_before_snapshot(self):
+        store, scores, teams = self.store(compact_every=4)
+        for _ in range(6):
+            self.award(store, scores, teams, 'bob')
+        store.flush()
+        # The journal was archived but the snapshot never got written.
+        os.unlink(os.path.join(self.tmp, 'snapshot.json'))
+        self.assertEqual(self.store()[1]['user'], {'bob': 6})
+
+    def test_torn_line(self):
+        store, scores, teams = self.store()
+        self.award(store, scores, teams, 'bob')
+        store.flush()
+        with open(os.path.join(self.tmp, 'journal.jsonl'), 'a') as handle:
+            handle.write('{"e":"aw')
+
+        store, scores, teams = self.store()
+        self.award(store, scores, teams, 'bob')
+        store.flush()
+        self.assertEqual(self.store()[1]['user'], {'bob': 2})
+
+    def test_starts_from_plain_saves(self):
+        write_json(os.path.join(self.tmp, 'scores.json'),
+                   {'user': {'bob': 5}, 'team': {}})
+        store, scores, teams = self.store()
+        self.award(store, scores, teams, 'bob')
+        store.flush()
+        self.assertEqual(self.store()[1]['user'], {'bob': 6})
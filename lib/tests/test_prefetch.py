@@ -0,0 +1,85 @@
+from unittest import SkipTest, TestCase
+
+
+class TestPrefetcher(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import defer
+            from lib.prefetch import Prefetcher
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.defer = defer
+        self.picked = []
+        self.prepared = []
+        # Preparations wait here until the test finishes them.
+        self.running = []
+        self.prefetch = Prefetcher(self.pick, self.prepare, 2, self.thread)
+
+    def pick(self):
+        self.picked.append(len(self.picked))
+        return self.picked[-1]
+
+    def prepare(self, index):
+        self.prepared.append(index)
+        if index == 'broken':
+            raise ValueError(index)
+        return 'question {}'.format(index)
+
+    def thread(self, function, *args):
+        d = self.defer.Deferred()
+        self.running.append((d, function, args))
+        return d
+
+    def finish(self):
+        running, self.running = self.running, []
+        for d, function, args in running:
+            try:
+                d.callback(function(*args))
+            except Exception as e:
+                d.errback(e)
+
+    def test_miss_then_ready(self):
+        self.assertEqual(self.prefetch.pop(), 'question 0')
+        self.assertEqual(self.prefetch.misses, 1)
+        # Two more on their way, and nothing else picked while they are.
+        self.assertEqual(len(self.running), 2)
+        self.prefetch.fill()
+        self.assertEqual(self.picked, [0, 1, 2])
+        self.finish()
+        self.assertEqual(self.prefetch.ready, 2)
+
+        prepared = len(self.prepared)
+        self.assertEqual(self.prefetch.pop(), 'question 1')
+        self.assertEqual(self.prefetch.pop(), 'question 2')
+        # Nothing was prepared while popping.
+        self.assertEqual(len(self.prepared), prepared)
+        self.assertEqual(self.prefetch.misses, 1)
+
+    def test_flush_drops_late_arrivals(self):
+        self.prefetch.fill()
+        self.prefetch.flush()
+        self.prefetch.fill()
+        self.finish()
+        self.assertEqual(self.prefetch.ready, 2)
+        self.assertEqual(self.prefetch.pop(), 'question 2')
+
+    def test_idle_after_flushed_arrive(self):
+        idle = []
+        self.prefetch.idle().addCallback(idle.append)
+        self.assertEqual(idle, [None])
+        self.prefetch.fill()
+        self.prefetch.flush()
+        self.prefetch.idle().addCallback(idle.append)
+        self.assertEqual(idle, [None])
+        self.finish()
+        self.assertEqual(idle, [None, None])
+
+    def test_failure_is_tried_again(self):
+        self.prefetch._pick = lambda: 'broken'
+        self.prefetch.fill()
+        self.finish()
+        self.assertEqual(self.prefetch.ready, 0)
+        self.prefetch._pick = self.pick
+        self.prefetch.fill()
+        self.assertEqual(len(self.running), 2)
@@ -0,0 +1,92 @@
+# Throughput of the inbound pipeline, using pytest-benchmark:
+#
+#   python -m pytest lib/tests/test_privmsg_benchmark.py
+#
+# Each benchmark pushes a batch of channel lines through triviabot.privmsg
+# and reports lines per second in the extra info column.
+
+import random
+import shutil
+import tempfile
+
+import pytest
+
+from lib.tests.helpers import make_bot
+
+pytest.importorskip('pytest_benchmark')
+
+BATCH = 1000
+
+
+@pytest.fixture
+def bot():
+    tmp = tempfile.mkdtemp()
+    bot = make_bot(tmp)
+    game = bot._games['#triviachannel']
+    game.asking = True
+    game.answer.set_answer("The Beatles")
+    # Only the pipeline is measured, not winning or command handling.
+    bot._winner = lambda user, channel, which=0: None
+    bot._save_game = lambda *args: None
+    bot.select_command = lambda command, args, user, channel: None
+    # One nick sends everything; the flood guard still checks each line.
+    bot._flood.configure(dict((kind, (1e9, 1e9)) for kind in bot._flood.limits),
+                         0, 10000, ())
+    yield bot
+    bot._questions.close()
+    shutil.rmtree(tmp)
+
+
+def chatter():
+    words = ['lol', 'anyone', 'know', 'this', 'one', 'no', 'idea', 'hmm',
+             'what', 'was', 'the', 'last', 'answer', 'again', 'brb']
+    random.seed(1)
+    return [' '.join(random.choice(words)
+                     for _ in range(random.randint(1, 12)))
+            for _ in range(BATCH)]
+
+
+def run(benchmark, bot, lines):
+    def batch():
+        for line in lines:
+            bot.privmsg('someone!user@host', '#triviachannel', line)
+    benchmark(batch)
+    # No stats when run with --benchmark-disable.
+    if benchmark.stats:
+        benchmark.extra_info['lines_per_second'] = \
+            int(len(lines) / benchmark.stats.stats.mean)
+
+
+def test_chatter(benchmark, bot):
+    run(benchmark, bot, chatter())
+
+
+def test_long_chatter(benchmark, bot):
+    run(benchmark, bot, [line * 8 for line in chatter()])
+
+
+def test_guesses(benchmark, bot):
+    guesses = ['beatles', 'the beetles', 'stones', 'the who', 'BEATLES!']
+    run(benchmark, bot, [guesses[i % len(guesses)] for i in range(BATCH)])
+
+
+def test_commands(benchmark, bot):
+    run(benchmark, bot, ['!score', '!standings', 'triviabot: help',
+                         '!teams'] * (BATCH // 4))
+
+
+def test_recording(benchmark):
+    # What the metrics add to each message: a count, and now and then a
+    # timing.
+    from lib.metrics import Registry, now
+    registry = Registry()
+    counter = registry.counter('messages_total', 'Messages.')
+    histogram = registry.histogram('seconds', 'Seconds.')
+
+    def batch():
+        for _ in range(BATCH):
+            counter.inc()
+            if not counter.value % 16:
+                started = now()
+                histogram.observe(now() - started)
+    benchmark(batch)
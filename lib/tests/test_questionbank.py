@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from lib.questionbank import (category, compile_bank, is_stale, load_bank,
+                               parse_line, QuestionBank, MAX_LINE)
+
+
+class TestQuestionBank(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'questions')
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, 'questions_00'), 'wb') as f:
+            f.write(b"first  question`First Answer \n"
+                    b"broken line with no answer\n"
+                    b"two`ticks`here\n")
+        with open(os.path.join(self.source, 'questions_01'), 'wb') as f:
+            f.write(b"second question`second\n")
+        self.bank = os.path.join(self.tmp, 'questions.bank')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_parse_line(self):
+        self.assertEqual(parse_line(b" a\tquestion `\x01answer\r"),
+                         (b"a question", b"answer"))
+        for line in (b"no answer", b"two`ticks`here", b"question` ",
+                     b"`answer", b"q`" + b"a" * MAX_LINE):
+            self.assertRaises(ValueError, parse_line, line)
+
+    def test_category(self):
+        self.assertEqual(category(b"Astrology : born on 07 June?"),
+                         "astrology")
+        self.assertEqual(category(b"TV / Movies: What..."), "tv movies")
+        self.assertEqual(category(b"Category: NetHack: You can..."),
+                         "nethack")
+        self.assertEqual(category(b"No prefix here"), "")
+        self.assertEqual(category(b"This is a long sentence that happens to "
+                                  b"have a colon: in it"), "")
+
+    def test_categories(self):
+        compile_bank(self.source, self.bank)
+        bank = QuestionBank(self.bank)
+        self.assertEqual(bank.categories(), {"": 2})
+        first, size = bank.category_span("")
+        self.assertEqual(sorted(bank.member(first + i) for i in range(size)),
+                         [0, 1])
+        bank.close()
+
+    def test_compile_rejects_broken_lines(self):
+        count, rejects = compile_bank(self.source, self.bank)
+        self.assertEqual(count, 2)
+        self.assertEqual([(os.path.basename(r[0]), r[1]) for r in rejects],
+                         [('questions_00', 2), ('questions_00', 3)])
+
+    def test_parallel_compile_matches_serial(self):
+        serial = compile_bank(self.source, self.bank)
+        with open(self.bank, 'rb') as f:
+            expected = f.read()
+        self.assertEqual(compile_bank(self.source, self.bank, 2), serial)
+        with open(self.bank, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_lookup(self):
+        compile_bank(self.source, self.bank)
+        bank = QuestionBank(self.bank)
+        self.assertEqual(len(bank), 2)
+        self.assertEqual(bank[0],
+                         ("first question", "First Answer", ["first answer"]))
+        self.assertEqual(bank[-1], ("second question", "second", ["second"]))
+        self.assertRaises(IndexError, bank.__getitem__, 2)
+        self.assertTrue(bank.random() in (bank[0], bank[1]))
+        bank.close()
+
+    def test_rejects_other_files(self):
+        with open(self.bank, 'wb') as f:
+            f.write(b"not a question bank at all")
+        self.assertRaises(ValueError, QuestionBank, self.bank)
+
+    def test_stale(self):
+        self.assertTrue(is_stale(self.bank, self.source))
+        load_bank(self.bank, self.source).close()
+        self.assertFalse(is_stale(self.bank, self.source))
+        later = time.time() + 10
+        os.utime(os.path.join(self.source, 'questions_01'), (later, later))
+        self.assertTrue(is_stale(self.bank, self.source))
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from unittest import SkipTest, TestCase
+
+from lib.matching import answer_keys
+from lib.questionbank import compile_bank, QuestionBank
+from lib.rapidfire import AnswerIndex
+from lib.tests.test_game import FakeBot
+
+
+class TestAnswerIndex(TestCase):
+
+    def setUp(self):
+        self.index = AnswerIndex()
+        self.index.add(1, answer_keys("The Beatles"))
+        self.index.add(2, answer_keys("colour|color"))
+        self.index.add(3, answer_keys("+"))
+
+    def test_match(self):
+        self.assertEqual(self.index.match("beatles!"), 1)
+        self.assertEqual(self.index.match("The Color"), 2)
+        self.assertEqual(self.index.match(" + "), 3)
+        self.assertEqual(self.index.match("beetles"), None)
+        self.assertEqual(self.index.match("x" * 100), None)
+
+    def test_remove(self):
+        self.index.add(4, answer_keys("beatles"))
+        self.index.remove(1)
+        self.assertEqual(self.index.match("beatles"), 4)
+        self.index.remove(4)
+        self.index.remove(2)
+        self.assertEqual(self.index.match("beatles"), None)
+        self.assertEqual(len(self.index), 1)
+        self.index.remove(3)
+        self.assertEqual(self.index.longest_guess, 0)
+
+
+class TestRapidFire(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import defer, task
+            from lib.game import TriviaGame
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        source = os.path.join(self.tmp, 'questions')
+        os.makedirs(source)
+        with open(os.path.join(source, 'questions_00'), 'wb') as f:
+            f.write(b''.join(b"Numbers: " + str(n).encode('ascii') +
+                             b"`answer " + str(n).encode('ascii') + b"\n"
+                             for n in range(10)))
+        compile_bank(source, os.path.join(self.tmp, 'questions.bank'))
+        self.bank = QuestionBank(os.path.join(self.tmp, 'questions.bank'))
+        self.clock = task.Clock()
+        self.bot = FakeBot()
+        self.game = TriviaGame(self.bot, '#a', self.bank, iter(range(10)),
+                               2, 30, 5, self.clock, prefetch_depth=2,
+                               defer_to_thread=defer.maybeDeferred)
+
+    def tearDown(self):
+        self.bank.close()
+        shutil.rmtree(self.tmp)
+
+    def said(self):
+        return [msg for dest, msg in self.bot.said]
+
+    def test_several_open(self):
+        self.assertTrue(self.game.start(rapid=3))
+        self.assertTrue(self.game.running)
+        self.assertFalse(self.game.start())
+        self.assertEqual(sorted(self.game.rapid.open), [1, 2, 3])
+        self.assertTrue("#2: Numbers: 1 Clue: ****** *" in self.said())
+        self.assertEqual(self.game.match("answer 2"), 3)
+        self.assertEqual(self.game.match("answer 5"), None)
+
+        self.clock.advance(30)
+        self.game.winner('bob', self.game.match("answer 0"))
+        self.assertEqual(self.bot.awards, [('bob', 3)])
+        self.assertTrue("BOB GOT #1: answer 0 (3 points)" in self.said())
+        # Answered, and not open again until the next one is asked.
+        self.assertEqual(self.game.match("answer 0"), None)
+        self.clock.advance(5)
+        self.assertEqual(self.game.match("answer 3"), 1)
+
+    def test_give_up_and_round_over(self):
+        self.game.start(rapid=2)
+        # Each number asks two questions, given up on after four clues.
+        for _ in range(4):
+            self.clock.advance(30)
+        self.assertTrue("No one got #1. The answer was: answer 0"
+                        in self.said())
+        self.clock.advance(5)
+        self.assertEqual(sorted(self.game.rapid.open), [1, 2])
+        for _ in range(4):
+            self.clock.advance(30)
+        self.assertTrue("Round complete!" in self.said())
+        self.assertFalse(self.game.running)
+        self.assertFalse(self.game.asking)
+        self.assertEqual(self.bot.rounds_over, 1)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_clues_keep_to_deadlines(self):
+        self.game.start(rapid=2)
+        # A stalled reactor catches up on every clue that was due, and
+        # the next questions come on time after the give up at 120.
+        self.clock.advance(124)
+        self.assertEqual(self.game.rapid.open, {})
+        self.clock.advance(1)
+        self.assertEqual(sorted(self.game.rapid.open), [1, 2])
+
+    def test_stop_cancels_timers(self):
+        self.game.start(rapid=4)
+        self.game.winner('bob', 2)
+        self.game.stop()
+        self.assertEqual(self.bot.rounds_over, 1)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        # An ordinary round can follow.
+        self.assertTrue(self.game.start())
+        self.assertEqual(self.game.match(self.game.answer.answer), 0)
@@ -0,0 +1,76 @@
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+from unittest import TestCase
+
+from lib.questionbank import compile_bank, QuestionBank
+from lib.sampling import AliasTable, CategorySampler, parse_theme
+
+
+class TestAliasTable(TestCase):
+
+    def test_distribution(self):
+        random.seed(1)
+        table = AliasTable([1, 0, 3, 6])
+        counts = Counter(table.sample() for _ in range(20000))
+        self.assertEqual(counts[1], 0)
+        for index, share in ((0, 0.1), (2, 0.3), (3, 0.6)):
+            self.assertAlmostEqual(counts[index] / 20000.0, share, delta=0.02)
+
+    def test_needs_weight(self):
+        self.assertRaises(ValueError, AliasTable, [])
+        self.assertRaises(ValueError, AliasTable, [0, 0])
+
+
+class TestParseTheme(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_theme("Astrology,  useless  trivia=2,"),
+                         [("astrology", None), ("useless trivia", 2.0)])
+        self.assertRaises(ValueError, parse_theme, "music=lots")
+        self.assertRaises(ValueError, parse_theme, "music=0")
+
+
+class TestCategorySampler(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        source = os.path.join(self.tmp, 'questions')
+        os.makedirs(source)
+        with open(os.path.join(source, 'questions_00'), 'wb') as f:
+            f.write(b"Astrology: one`a\n"
+                    b"Music: two`b\n"
+                    b"Music: Songs: three`c\n"
+                    b"Musicals: four`d\n"
+                    b"no category`e\n")
+        bank = os.path.join(self.tmp, 'questions.bank')
+        compile_bank(source, bank)
+        self.bank = QuestionBank(bank)
+
+    def tearDown(self):
+        self.bank.close()
+        shutil.rmtree(self.tmp)
+
+    def test_exact_name(self):
+        sampler = CategorySampler(self.bank, parse_theme("music"))
+        self.assertEqual(sampler.names, ["music"])
+        self.assertEqual(set(sampler.sample() for _ in range(100)),
+                         set([1, 2]))
+
+    def test_prefix(self):
+        sampler = CategorySampler(self.bank, parse_theme("astro"))
+        self.assertEqual(set(sampler.sample() for _ in range(20)), set([0]))
+
+    def test_weights(self):
+        random.seed(2)
+        sampler = CategorySampler(self.bank,
+                                  parse_theme("astrology=3, musicals"))
+        counts = Counter(sampler.sample() for _ in range(8000))
+        self.assertAlmostEqual(counts[0] / 8000.0, 0.75, delta=0.03)
+        self.assertEqual(set(counts), set([0, 3]))
+
+    def test_unknown(self):
+        self.assertRaises(KeyError, CategorySampler, self.bank,
+                          parse_theme("cooking"))
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from lib.shuffle import FeistelPermutation, QuestionCursor
+
+
+class TestFeistelPermutation(TestCase):
+
+    def test_is_permutation(self):
+        for size in (1, 2, 3, 7, 64, 100, 1000, 4097):
+            permutation = FeistelPermutation(size, 12345)
+            self.assertEqual(sorted(permutation[i] for i in range(size)),
+                             list(range(size)))
+
+    def test_key_changes_order(self):
+        first = [FeistelPermutation(1000, 1)[i] for i in range(1000)]
+        second = [FeistelPermutation(1000, 2)[i] for i in range(1000)]
+        self.assertNotEqual(first, second)
+        self.assertNotEqual(first, list(range(1000)))
+
+    def test_out_of_range(self):
+        self.assertRaises(IndexError, FeistelPermutation(10, 1).__getitem__,
+                          10)
+
+
+class TestQuestionCursor(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'cursor.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_no_repeats_until_exhausted(self):
+        cursor = QuestionCursor(self.filename, 50)
+        seen = [cursor.next() for _ in range(50)]
+        self.assertEqual(sorted(seen), list(range(50)))
+        self.assertEqual(cursor.remaining, 0)
+        again = [cursor.next() for _ in range(50)]
+        self.assertEqual(sorted(again), list(range(50)))
+
+    def test_resumes_after_restart(self):
+        cursor = QuestionCursor(self.filename, 50)
+        seen = [cursor.next() for _ in range(20)]
+        cursor = QuestionCursor(self.filename, 50)
+        seen += [cursor.next() for _ in range(30)]
+        self.assertEqual(sorted(seen), list(range(50)))
+
+    def test_saved_every_few_steps(self):
+        cursor = QuestionCursor(self.filename, 50, save_every=10)
+        [cursor.next() for _ in range(15)]
+        self.assertEqual(QuestionCursor(self.filename, 50).remaining, 40)
+        cursor.save()
+        self.assertEqual(QuestionCursor(self.filename, 50).remaining, 35)
+
+    def test_new_bank_starts_over(self):
+        cursor = QuestionCursor(self.filename, 50)
+        [cursor.next() for _ in range(20)]
+        self.assertEqual(QuestionCursor(self.filename, 60).remaining, 60)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from lib.tests.helpers import make_bot
+
+
+QUESTIONS = (b"Astrology: sign of 07 June`Gemini",
+             b"Music: The fab four`The Beatles",
+             b"Science: H2O`Water",
+             b"Geography: Capital of France`Paris")
+
+
+class TestSimulation(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # Sets up the config and questions, or skips without twisted.
+        make_bot(self.tmp, QUESTIONS)._questions.close()
+        # Its game may have saved questions it picked before the seed was
+        # set.
+        cursor = os.path.join(self.tmp, 'question_cursor.json')
+        if os.path.exists(cursor):
+            os.remove(cursor)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def simulate(self, rounds, seed):
+        import trivia
+        from lib.simulation import Simulation
+        simulation = Simulation(trivia.ircbotFactory(), players=50,
+                                guesses=10, accuracy=0.1, seed=seed)
+        try:
+            report = simulation.run(rounds)
+            scores = dict(simulation.bot._scores['user'])
+        finally:
+            simulation.close()
+        return report, scores
+
+    def test_plays_every_round(self):
+        report, scores = self.simulate(20, 1)
+        self.assertEqual(report['rounds'], 20)
+        self.assertTrue(report['guesses'] > 0)
+        self.assertTrue(0 < report['wins'] <= 20 * 3)
+        self.assertEqual(sum(scores.values()) > 0, True)
+        self.assertTrue(report['latency_p50_us'] <=
+                        report['latency_p99_us'] <= report['latency_max_us'])
+
+    def test_game_lines_wait_only_for_line_rate(self):
+        import config
+        report, scores = self.simulate(10, 3)
+        # Sent as the bot's own pacing allows, not at the next guess.
+        self.assertTrue(report['game_wait_mean'] < config.LINE_RATE)
+        self.assertTrue(report['game_wait_max'] < 3 * config.LINE_RATE)
+
+    def test_same_seed_same_game(self):
+        first, first_scores = self.simulate(10, 7)
+        shutil.rmtree(self.tmp)
+        self.setUp()
+        second, second_scores = self.simulate(10, 7)
+        for name in ('guesses', 'wins', 'simulated_seconds', 'lines_out',
+                     'bytes_out', 'saves'):
+            self.assertEqual(first[name], second[name], name)
+        self.assertEqual(first_scores, second_scores)
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+from unittest import SkipTest, TestCase
+
+from lib.persistence import write_json
+from lib.sqlstore import ALL_TIME, SqlStore
+from lib.tests.test_persistence import synchronous
+
+
+class TestSqlStore(TestCase):
+
+    def setUp(self):
+        try:
+            from twisted.internet import task
+        except ImportError:
+            raise SkipTest("twisted is not installed")
+        self.tmp = tempfile.mkdtemp()
+        self.clock = task.Clock()
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.tmp)
+
+    def store(self):
+        store = SqlStore(self.tmp, 5, clock=self.clock,
+                         defer_to_thread=synchronous)
+        self.stores.append(store)
+        scores, teams = store.load()
+        return store, scores, teams
+
+    def result(self, d):
+        results = []
+        d.addCallback(results.append)
+        return results[0]
+
+    def award(self, store, user, points, team=None):
+        store.record({'e': 'award', 'user': user, 'team': team,
+                      'points': points}, {}, {})
+
+    def test_top_and_rank(self):
+        store, scores, teams = self.store()
+        for user, points in (('bob', 5), ('alice', 3), ('carol', 5),
+                             ('alice', 4), ('dave', 1)):
+            self.award(store, user, points, team='red')
+        self.assertEqual(self.result(store.top(count=3)),
+                         [('alice', 7), ('bob', 5), ('carol', 5)])
+        self.assertEqual(self.result(store.top('team')), [('red', 18)])
+        self.assertEqual(self.result(store.rank('carol')), (2, 5, 4))
+        self.assertEqual(self.result(store.rank('nobody')), None)
+        self.assertFalse(store.pending)
+
+    def test_shared_file(self):
+        # Two bots on different networks, each with its own connection.
+        one, scores, teams = self.store()
+        two, scores, teams = self.store()
+        self.award(one, 'bob', 5)
+        self.award(two, 'bob', 2)
+        one.flush()
+        two.flush()
+        self.assertEqual(self.result(one.top()), [('bob', 7)])
+        one.record({'e': 'reset', 'by': 'admin'}, {}, {})
+        one.flush()
+        # two hasn't seen the reset, but its next points go in the new
+        # season.
+        self.award(two, 'alice', 3)
+        self.assertEqual(self.result(two.top()), [('alice', 3)])
+        self.assertEqual(two.load()[0]['user'], {'alice': 3})
+
+    def test_seasons(self):
+        store, scores, teams = self.store()
+        self.award(store, 'bob', 5)
+        store.record({'e': 'reset', 'by': 'admin'}, {}, {})
+        self.award(store, 'alice', 2)
+        store.record({'e': 'set', 'user': 'bob', 'points': 1, 'by': 'admin'},
+                     {}, {})
+        self.assertEqual(self.result(store.top()), [('alice', 2), ('bob', 1)])
+        self.assertEqual(self.result(store.top(season=ALL_TIME)),
+                         [('bob', 6), ('alice', 2)])
+        seasons = self.result(store.seasons())
+        self.assertEqual([season[0] for season in seasons], [2, 1])
+        self.assertEqual(seasons[1][3:], ('bob', 5))
+        self.assertEqual(seasons[0][2], None)
+        self.assertEqual([(kind, points, by) for at, kind, points, by in
+                          self.result(store.history('bob'))],
+                         [('set', 1, 'admin'), ('award', 5, None)])
+
+    def test_load(self):
+        store, scores, teams = self.store()
+        red = {'name': 'red', 'owner': 'bob', 'members': ['bob', 'alice']}
+        store.record({'e': 'join', 'user': 'alice', 'team': 'red',
+                      'state': red}, {}, {})
+        self.award(store, 'bob', 5, team='red')
+        self.clock.advance(5)
+        self.assertEqual(store.saves, 1)
+        store.close()
+
+        store, scores, teams = self.store()
+        self.assertEqual(scores, {'user': {'bob': 5}, 'team': {'red': 5}})
+        self.assertEqual(teams, {'users': {'bob': 'red', 'alice': 'red'},
+                                 'teams': {'red': red}})
+
+    def test_migrate_json(self):
+        write_json(os.path.join(self.tmp, 'scores-2015-01-02-03:04:05.json'),
+                   {'user': {'bob': 10}, 'team': {}})
+        write_json(os.path.join(self.tmp, 'scores.json'),
+                   {'user': {'alice': 3}, 'team': {'red': 3}})
+        write_json(os.path.join(self.tmp, 'teams.json'),
+                   {'users': {'alice': 'red'},
+                    'teams': {'red': {'name': 'red', 'owner': 'alice',
+                                      'members': ['alice']}}})
+        store, scores, teams = self.store()
+        self.assertEqual(store.season, 2)
+        self.assertEqual(scores, {'user': {'alice': 3}, 'team': {'red': 3}})
+        self.assertEqual(teams['users'], {'alice': 'red'})
+        self.assertEqual(self.result(store.top(season=ALL_TIME)),
+                         [('bob', 10), ('alice', 3)])
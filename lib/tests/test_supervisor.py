@@ -0,0 +1,217 @@
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+from lib.supervisor import Supervisor, find_network, networks
+from lib.tests.helpers import ROOT
+
+
+def make_config(**settings):
+    config = types.ModuleType('config')
+    config.SERVER = 'irc.example.net'
+    config.SERVER_PORT = 6667
+    config.USE_SSL = 'no'
+    config.DEFAULT_NICK = 'triviabot'
+    config.GAME_CHANNEL = '#trivia'
+    config.__dict__.update(settings)
+    return config
+
+
+def wait_for(condition, supervisor, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        supervisor.poll(0.1)
+        if condition():
+            return True
+    return False
+
+
+class TestNetworks(unittest.TestCase):
+
+    def test_one_network_from_server(self):
+        listed = networks(make_config())
+        self.assertEqual(listed, [{'name': 'default',
+                                   'server': 'irc.example.net',
+                                   'port': 6667, 'ssl': 'no',
+                                   'nickname': 'triviabot',
+                                   'channels': ['#trivia'],
+                                   'metrics_port': None}])
+
+    def test_gaps_filled_in(self):
+        config = make_config(GAME_CHANNELS=['#a', '#b'], NETWORKS=[
+            {'name': 'one', 'server': 'irc.one.net', 'ssl': 'yes'},
+            {'name': 'two', 'nickname': 'quizbot', 'channels': ['#quiz']}])
+        one, two = networks(config)
+        self.assertEqual((one['server'], one['port'], one['ssl'],
+                          one['channels']),
+                         ('irc.one.net', 6667, 'yes', ['#a', '#b']))
+        self.assertEqual((two['server'], two['nickname'], two['channels']),
+                         ('irc.example.net', 'quizbot', ['#quiz']))
+        self.assertEqual((one['metrics_port'], two['metrics_port']),
+                         (None, None))
+        self.assertEqual(find_network(config, 'two'), two)
+        self.assertRaises(KeyError, find_network, config, 'three')
+
+    def test_names_needed_and_unique(self):
+        self.assertRaises(ValueError, networks,
+                          make_config(NETWORKS=[{'server': 'irc.one.net'}]))
+        self.assertRaises(ValueError, networks, make_config(
+            NETWORKS=[{'name': 'one'}, {'name': 'one'}]))
+
+
+class TestRestarts(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger('test_supervisor')
+        self.logger.disabled = True
+
+    def tearDown(self):
+        self.supervisor.stop()
+        shutil.rmtree(self.dir)
+
+    def supervise(self, code, names=('one',)):
+        command = [sys.executable, '-c',
+                   'import sys, time; time.sleep(0.1); sys.exit({})'
+                   .format(code)]
+        self.supervisor = Supervisor(
+            [{'name': name} for name in names],
+            os.path.join(self.dir, 'health.sock'), 0.1,
+            command=lambda network: command, logger=self.logger)
+        self.supervisor.start()
+        return self.supervisor
+
+    def test_crashed_worker_restarted_with_backoff(self):
+        supervisor = self.supervise(1)
+        worker = supervisor.workers['one']
+        first = worker.process.pid
+        self.assertTrue(wait_for(lambda: worker.restart_at is not None,
+                                 supervisor))
+        # One quick crash waits a second, the next two.
+        self.assertAlmostEqual(worker.restart_at - time.time(), 1, delta=0.3)
+        self.assertEqual(supervisor.summary()['running'], 0)
+        self.assertTrue(wait_for(lambda: worker.restarts == 1, supervisor))
+        self.assertNotEqual(worker.process.pid, first)
+        self.assertTrue(wait_for(lambda: worker.restart_at is not None,
+                                 supervisor))
+        self.assertAlmostEqual(worker.restart_at - time.time(), 2, delta=0.3)
+        self.assertEqual(worker.failures, 2)
+
+    def test_clean_exit_not_restarted(self):
+        supervisor = self.supervise(0, ('one', 'two'))
+        self.assertTrue(wait_for(lambda: all(
+            worker.stopped for worker in supervisor.workers.values()),
+            supervisor))
+        supervisor.poll(0.1)
+        self.assertEqual(supervisor.summary()['restarts'], 0)
+        # Nothing left to supervise.
+        supervisor.run()
+
+    def test_stop(self):
+        supervisor = self.supervise(0, ('one', 'two'))
+        processes = [worker.process
+                     for worker in supervisor.workers.values()]
+        supervisor.stop()
+        self.assertTrue(all(process.poll() is not None
+                            for process in processes))
+        self.assertFalse(os.path.exists(os.path.join(self.dir,
+                                                     'health.sock')))
+
+
+class TestAgainstServer(unittest.TestCase):
+    '''
+    Two networks' workers on the stand-in server, sharing one database.
+    '''
+
+    def setUp(self):
+        try:
+            import twisted
+        except ImportError:
+            raise unittest.SkipTest("twisted is not installed")
+        self.dir = tempfile.mkdtemp()
+        self.supervisor = None
+        self.ircd = subprocess.Popen(
+            [sys.executable, '-m', 'lib.tests.fakeircd'], cwd=ROOT,
+            stdout=subprocess.PIPE)
+        port = int(self.ircd.stdout.readline())
+
+        save_dir = os.path.join(self.dir, 'save')
+        q_dir = os.path.join(self.dir, 'questions')
+        os.makedirs(q_dir)
+        with open(os.path.join(q_dir, 'questions_00'), 'w') as handle:
+            handle.write("Music: The fab four`The Beatles\n")
+        with open(os.path.join(ROOT, 'example_config.py')) as handle:
+            settings = handle.read()
+        settings += '''
+SAVE_DIR = {!r}
+Q_DIR = {!r}
+SAVE_MODE = 'sqlite'
+NETWORKS = [{{'name': 'one', 'server': '127.0.0.1', 'port': {port},
+             'ssl': 'no', 'nickname': 'botone', 'channels': ['#one']}},
+            {{'name': 'two', 'server': '127.0.0.1', 'port': {port},
+             'ssl': 'no', 'nickname': 'bottwo', 'channels': ['#two']}}]
+'''.format(save_dir, q_dir, port=port)
+        with open(os.path.join(self.dir, 'config.py'), 'w') as handle:
+            handle.write(settings)
+
+    def tearDown(self):
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        if self.ircd is not None:
+            self.ircd.terminate()
+            self.ircd.wait()
+            self.ircd.stdout.close()
+        shutil.rmtree(self.dir)
+
+    def command(self, network):
+        # trivia.py, run with the config written for this test.
+        health = os.path.join(self.dir, 'health.sock')
+        bootstrap = (
+            'import runpy, sys; sys.path[:0] = [{!r}, {!r}]; '
+            'sys.argv = [{!r}, "--network", {!r}, "--health", {!r}, '
+            '"--health-interval", "0.2"]; '
+            'runpy.run_path(sys.argv[0], run_name="__main__")'.format(
+                self.dir, ROOT, os.path.join(ROOT, 'trivia.py'),
+                network['name'], health))
+        return [sys.executable, '-c', bootstrap]
+
+    def test_workers_sign_on_and_restart(self):
+        config = types.ModuleType('config')
+        with open(os.path.join(self.dir, 'config.py')) as handle:
+            exec(handle.read(), config.__dict__)
+        listed = networks(config)
+        logger = logging.getLogger('test_supervisor')
+        logger.disabled = True
+        self.supervisor = supervisor = Supervisor(
+            listed, os.path.join(self.dir, 'health.sock'), 0.2,
+            command=self.command, logger=logger)
+        supervisor.start()
+
+        self.assertTrue(wait_for(
+            lambda: supervisor.summary()['signed_on'] == 2, supervisor))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'save',
+                                                    'trivia.sqlite')))
+        # Each network keeps its own place in the questions.
+        for name in ('one', 'two'):
+            self.assertTrue(os.path.isdir(os.path.join(self.dir, 'save',
+                                                       name)))
+
+        worker = supervisor.workers['two']
+        os.kill(worker.process.pid, signal.SIGKILL)
+        self.assertTrue(wait_for(lambda: worker.restarts == 1, supervisor))
+        self.assertTrue(wait_for(
+            lambda: supervisor.summary()['signed_on'] == 2, supervisor))
+        summary = supervisor.summary()
+        self.assertEqual((summary['running'], summary['restarts'],
+                          summary['stale']), (2, 1, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,381 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from lib.hotreload import GAME_MODULES, install, rebind
+from lib.log import LOG
+from lib.tests.helpers import ROOT, load_config, make_bot
+from lib.tests.test_log import Lines
+
+
+class TestPrivmsg(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bot = make_bot(self.tmp)
+        self.commands = []
+        self.bot.select_command = lambda *args: self.commands.append(args)
+
+    def tearDown(self):
+        self.bot._questions.close()
+        shutil.rmtree(self.tmp)
+
+    def test_bang_command(self):
+        self.bot.privmsg('bob!b@host', '#triviachannel', '!join\x02 my team')
+        self.assertEqual(self.commands,
+                         [('join', ['my', 'team'], 'bob', '#triviachannel')])
+
+    def test_nick_command(self):
+        self.bot.privmsg('bob!b@host', '#triviachannel',
+                         'triviabot: join my team')
+        self.assertEqual(self.commands,
+                         [('join', ['my', 'team'], 'bob', '#triviachannel')])
+
+    def test_chatter_ignored(self):
+        for msg in ('', '!', 'triviabot', 'hello there'):
+            self.bot.privmsg('bob!b@host', '#triviachannel', msg)
+        self.assertEqual(self.commands, [])
+
+    def test_guess_needs_a_question(self):
+        winners = []
+        self.bot._winner = lambda user, channel, which=0: winners.append(user)
+        game = self.bot._games['#triviachannel']
+        game.answer.set_answer("The Beatles")
+        self.bot.privmsg('bob!b@host', '#triviachannel', 'beatles')
+        self.assertEqual(winners, [])
+        game.asking = True
+        self.bot.privmsg('bob!b@host', '#triviachannel', 'the beatles\x03')
+        self.assertEqual(winners, ['bob'])
+
+    def test_rapid_guess_picks_question(self):
+        winners = []
+        self.bot._winner = lambda user, channel, which=0: \
+            winners.append((user, which))
+        game = self.bot._games['#triviachannel']
+        self.bot._rapid(['3'], 'admin', '#triviachannel')
+        self.assertEqual(len(game.rapid.open), 3)
+        answer = game.rapid.open[2].answer.answer
+        self.bot.privmsg('bob!b@host', '#triviachannel', answer)
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(game.rapid.open[winners[0][1]].answer.answer, answer)
+        game.stop()
+
+    def test_rapid_round_resumed_on_reconnect(self):
+        game = self.bot._games['#triviachannel']
+        self.bot._rapid(['3'], 'admin', '#triviachannel')
+        self.assertEqual(self.bot.factory.running, {'#triviachannel': 3})
+        # The connection drops and the next one signs on.
+        game.rapid.stop()
+        game.rapid = None
+        game._pacer.stop()
+        self.bot.signedOn()
+        self.assertEqual(len(game.rapid.open), 3)
+        game.stop()
+        self.assertEqual(self.bot.factory.running, {})
+
+    def test_rapid_count_capped(self):
+        game = self.bot._games['#triviachannel']
+        self.bot._rapid(['500'], 'admin', '#triviachannel')
+        self.assertFalse(game.running)
+        self.assertTrue(b"at most 10 questions" in self.bot.transport.value())
+
+    def test_flooding_ignored(self):
+        for _ in range(10):
+            for user in ('bob', 'admin'):
+                self.bot.privmsg(user + '!b@host', '#triviachannel', '!teams')
+        self.assertEqual([user for command, args, user, channel
+                          in self.commands],
+                         ['bob', 'admin', 'bob', 'admin'] + ['admin'] * 8)
+        self.assertEqual(self.bot._flood.dropped['listing'], 8)
+        sent = self.bot.transport.value()
+        self.assertTrue(sent.startswith(b"PRIVMSG bob :"))
+        self.assertTrue(b"Slow down! Your commands are being ignored for 30 "
+                        b"seconds." in sent)
+
+
+class TestSelectCommand(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bot = make_bot(self.tmp)
+        self.calls = []
+        self.bot._commands['help'] = \
+            lambda *args: self.calls.append(('help',) + args)
+        self.bot._admin_commands['stop'] = \
+            lambda *args: self.calls.append(('stop',) + args)
+
+    def tearDown(self):
+        self.bot._questions.close()
+        shutil.rmtree(self.tmp)
+
+    def test_dispatch(self):
+        self.bot.select_command('help', [], 'bob', '#triviachannel')
+        self.bot.select_command('stop', [], 'admin', '#triviachannel')
+        self.assertEqual(self.calls,
+                         [('help', [], 'bob', '#triviachannel'),
+                          ('stop', [], 'admin', '#triviachannel')])
+
+    def test_admin_only(self):
+        self.bot.select_command('stop', [], 'bob', '#triviachannel')
+        self.assertEqual(self.calls, [])
+        self.assertTrue(b"You don't tell me what to do" in
+                        self.bot.transport.value())
+
+    def test_unknown_queued(self):
+        from lib.outbound import INFO
+        self.bot.select_command('frobnicate', [], 'bob', '#triviachannel')
+        self.assertEqual(self.bot._outbound.sent[INFO], 1)
+        sent = self.bot.transport.value()
+        self.assertTrue(sent.startswith(b"PRIVMSG #triviachannel :\x01ACTION "))
+        self.assertTrue(sent.endswith(b"looks at bob oddly.\x01\r\n"))
+
+    def test_logged(self):
+        lines = Lines()
+        writer, LOG.writer = LOG.writer, lines
+        try:
+            self.bot.select_command('help', ['me'], 'bob', '#triviachannel')
+        finally:
+            LOG.writer = writer
+        self.assertEqual([(line['event'], line['command'], line['user'])
+                          for line in lines.lines],
+                         [('command', 'help', 'bob')])
+
+
+class TestSaving(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bot = make_bot(self.tmp)
+
+    def tearDown(self):
+        self.bot._questions.close()
+        if self.bot._store._timer is not None:
+            self.bot._store._timer.cancel()
+        shutil.rmtree(self.tmp)
+
+    def test_loads_missing_save(self):
+        self.assertEqual(self.bot._scores, {'user': {}, 'team': {}})
+        self.assertEqual(self.bot._teams, {'users': {}, 'teams': {}})
+
+    def test_admin_save_flushes(self):
+        self.bot.select_command('set', ['bob', '7'], 'admin', '#triviachannel')
+        self.assertTrue(self.bot._store.pending)
+        self.bot.select_command('save', [], 'admin', '#triviachannel')
+        self.assertFalse(self.bot._store.pending)
+        self.assertEqual(self.bot._store.load()[0]['user'], {'bob': 7})
+        self.assertTrue(b"Game saved." in self.bot.transport.value())
+
+
+class TestJournal(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        config = load_config(self.tmp)
+        config.SAVE_MODE = 'journal'
+        self.bot = make_bot(self.tmp)
+
+    def tearDown(self):
+        load_config(self.tmp).SAVE_MODE = 'snapshot'
+        self.bot._questions.close()
+        if self.bot._store._timer is not None:
+            self.bot._store._timer.cancel()
+        shutil.rmtree(self.tmp)
+
+    def test_teams_and_scores_replay(self):
+        channel = '#triviachannel'
+        self.bot.select_command('join', ['red'], 'bob', channel)
+        self.bot.select_command('join', ['red'], 'alice', channel)
+        self.bot.select_command('join', ['blue'], 'bob', channel)
+        self.bot.select_command('set', ['alice', '3'], 'admin', channel)
+        self.bot._save_game()
+
+        scores, teams = self.bot._store.load()
+        self.assertEqual(scores, self.bot._scores)
+        self.assertEqual(teams, self.bot._teams)
+        self.assertEqual(teams['users'], {'alice': 'red', 'bob': 'blue'})
+        self.assertEqual(teams['teams']['red']['owner'], 'alice')
+
+
+class TestSqlite(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        load_config(self.tmp).SAVE_MODE = 'sqlite'
+        self.bot = make_bot(self.tmp)
+        from lib.tests.test_persistence import synchronous
+        self.bot._store._defer_to_thread = synchronous
+
+    def tearDown(self):
+        load_config(self.tmp).SAVE_MODE = 'snapshot'
+        self.bot._questions.close()
+        self.bot._store.close()
+        shutil.rmtree(self.tmp)
+
+    def test_leaderboard_commands(self):
+        channel = '#triviachannel'
+        self.bot.select_command('set', ['bob', '7'], 'admin', channel)
+        self.bot.select_command('top', [], 'alice', channel)
+        self.bot.select_command('rank', ['bob'], 'alice', channel)
+        self.bot.select_command('reset', [], 'admin', channel)
+        self.bot.select_command('seasons', [], 'alice', channel)
+        sent = self.bot.transport.value()
+        self.assertTrue(b"1: bob: 7" in sent)
+        self.assertTrue(b"bob is ranked 1 of 1 with 7 points." in sent)
+        self.assertTrue(b"Season 1 (ended" in sent)
+        self.assertEqual(os.listdir(self.tmp).count('trivia.sqlite'), 1)
+
+
+class TestStandings(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bot = make_bot(self.tmp)
+        for number in range(25):
+            self.bot.select_command('set', ['p{:02d}'.format(number),
+                                            str(number)], 'admin', 'triviabot')
+        self.bot.transport.clear()
+
+    def tearDown(self):
+        self.bot._questions.close()
+        if self.bot._store._timer is not None:
+            self.bot._store._timer.cancel()
+        shutil.rmtree(self.tmp)
+
+    def test_pages(self):
+        self.bot.select_command('standings', ['players', '3'], 'bob',
+                                'triviabot')
+        sent = self.bot.transport.value()
+        self.assertTrue(b"(page 3 of 3)" in sent)
+        self.assertTrue(b"21: p04: 4" in sent)
+        self.assertTrue(b"25: p00: 0" in sent)
+        self.assertFalse(b"20: p05" in sent)
+
+    def test_rank_and_near(self):
+        self.bot.select_command('rank', ['p20'], 'bob', 'triviabot')
+        self.bot.select_command('near', [], 'p10', 'triviabot')
+        self.bot.select_command('score', [], 'p24', 'triviabot')
+        sent = self.bot.transport.value()
+        self.assertTrue(b"p20 is ranked 5 of 25 with 20 points." in sent)
+        self.assertTrue(b"13: p12: 12" in sent)
+        self.assertTrue(b"17: p08: 8" in sent)
+        self.assertFalse(b"18: p07" in sent)
+        self.assertTrue(b"Your current score is: 24 (ranked 1 of 25)" in sent)
+
+    def test_standings_packed(self):
+        from twisted.internet import task
+        from lib.outbound import OutboundScheduler
+        clock = task.Clock()
+        self.bot._outbound = OutboundScheduler(
+            self.bot.msg, self.bot._line_budget, '', 0.4, clock=clock)
+        self.bot.select_command('standings', ['players'], 'bob', 'triviabot')
+        clock.advance(0)
+        sent = self.bot.transport.value().splitlines()
+        self.assertEqual(len(sent), 1)
+        self.assertTrue(b"(page 1 of 3): | 1: p24: 24 | 2: p23: 23" in sent[0])
+
+
+class TestChannels(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        load_config(self.tmp).GAME_CHANNELS = ['#one', '#two']
+        self.bot = make_bot(self.tmp)
+
+    def tearDown(self):
+        config = load_config(self.tmp)
+        config.GAME_CHANNELS = [config.GAME_CHANNEL]
+        for game in self.bot._games.values():
+            if game.running:
+                game._pacer.stop()
+        self.bot._questions.close()
+        if self.bot._store._timer is not None:
+            self.bot._store._timer.cancel()
+        shutil.rmtree(self.tmp)
+
+    def test_commands_and_guesses_route_by_channel(self):
+        one, two = self.bot._games['#one'], self.bot._games['#two']
+        self.bot.select_command('start', [], 'admin', '#two')
+        self.assertFalse(one.running)
+        self.assertTrue(two.running)
+        self.assertEqual(self.bot.factory.running, {'#two': 0})
+
+        self.bot.privmsg('bob!b@host', '#one', two.answer.answer)
+        self.assertEqual(self.bot._scores['user'], {})
+        self.bot.privmsg('bob!b@host', '#two', two.answer.answer)
+        self.assertEqual(self.bot._scores['user'], {'bob': 5})
+
+        self.bot.select_command('qnum', ['7'], 'admin', '#one')
+        self.assertEqual((one.round_questions, two.round_questions), (7, 3))
+        self.bot._save_game()
+        self.assertTrue(os.path.exists(os.path.join(
+            self.tmp, 'question_cursor-two.json')))
+
+
+class TestReload(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.bot = make_bot(self.tmp)
+        self.config = load_config(self.tmp)
+        self.config.__file__ = os.path.join(self.tmp, 'config.py')
+        self.modules = dict((name, sys.modules[name])
+                            for name in GAME_MODULES)
+        self.game = self.bot._games['#triviachannel']
+
+    def tearDown(self):
+        import trivia
+        install(self.modules)
+        rebind(vars(trivia), self.modules)
+        sys.modules['config'] = trivia.config = self.config
+        del self.config.__file__
+        if self.game.running:
+            self.game._pacer.stop()
+        self.bot._questions.close()
+        if self.bot._store._timer is not None:
+            self.bot._store._timer.cancel()
+        shutil.rmtree(self.tmp)
+
+    def write_config(self, settings):
+        with open(os.path.join(ROOT, 'example_config.py')) as handle:
+            source = handle.read()
+        with open(self.config.__file__, 'w') as handle:
+            handle.write(source + settings)
+
+    def test_game_carries_on(self):
+        self.bot.select_command('start', [], 'admin', '#triviachannel')
+        question, answer = self.game.question, self.game.answer.answer
+        old_class = self.game.__class__
+        self.write_config("\nQ_DIR = {!r}\nADMINS = ['admin', 'carol']\n"
+                          "LINE_RATE = 0\n".format(self.config.Q_DIR))
+        added = os.path.join(self.config.Q_DIR, 'questions_01')
+        with open(added, 'wb') as handle:
+            handle.write(b"Science: H2O`Water\n")
+        later = os.path.getmtime(self.config.Q_BANK) + 10
+        os.utime(added, (later, later))
+
+        self.bot.transport.clear()
+        self.bot.select_command('reload', [], 'admin', '#triviachannel')
+        self.assertTrue(b"Reloaded in" in self.bot.transport.value())
+        self.assertEqual(len(self.bot._questions), 3)
+        self.assertTrue(self.game.__class__ is
+                        sys.modules['lib.game'].TriviaGame)
+        self.assertFalse(self.game.__class__ is old_class)
+        self.assertTrue('carol' in self.bot._admins)
+        self.assertTrue(self.game.running)
+        self.assertEqual((self.game.question, self.game.answer.answer,
+                          self.game.round_question_num),
+                         (question, answer, 1))
+
+        self.bot.privmsg('bob!b@host', '#triviachannel', answer)
+        self.assertEqual(self.bot._scores['user'], {'bob': 5})
+
+    def test_failure_changes_nothing(self):
+        self.write_config("\nADMINS = [\n")
+        self.bot.select_command('reload', [], 'admin', '#triviachannel')
+        self.assertTrue(b"Reload failed" in self.bot.transport.value())
+        self.assertTrue(sys.modules['config'] is self.config)
+        self.assertEqual(self.bot._admins, set(['admin', self.config.OWNER]))
+        self.assertTrue(all(sys.modules[name] is module
+                            for name, module in self.modules.items()))
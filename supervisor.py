@@ -0,0 +1,66 @@
+#!/usr/bin/python2
+#
+# Runs the bot on every network in the config's NETWORKS, one process per
+# network, restarting any that die. All of them keep their scores, teams
+# and seasons in the one SQLite store in SAVE_DIR.
+
+import logging
+import optparse
+import os
+import signal
+import sys
+
+from lib.questionbank import load_bank
+from lib.sqlstore import SqlStore
+from lib.supervisor import Supervisor, networks
+
+import config
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('supervisor')
+logger.setLevel(logging.INFO)
+
+
+def prepare():
+    '''
+    Does what every worker would otherwise race to do at start: compile
+    the question bank and create (or migrate into) the database.
+    '''
+    from twisted.internet import task
+
+    if not os.path.exists(config.SAVE_DIR):
+        os.makedirs(config.SAVE_DIR)
+    bank = getattr(config, 'Q_BANK',
+                   os.path.join(config.SAVE_DIR, 'questions.bank'))
+    logger.info("%d questions in the bank", len(load_bank(bank, config.Q_DIR)))
+    # Never started, so the reactor isn't needed here.
+    store = SqlStore(config.SAVE_DIR, 0, clock=task.Clock())
+    store.load()
+    store.close()
+
+
+op = optparse.OptionParser()
+op.add_option('-i', '--interval', dest='interval', type=float,
+              default=5, help='Seconds between health reports')
+op.add_option('-s', '--socket', dest='socket', type=str, default=None,
+              help='Where workers send health (SAVE_DIR/health.sock)')
+options, args = op.parse_args()
+
+listed = networks(config)
+if getattr(config, 'SAVE_MODE', 'snapshot') != 'sqlite':
+    logger.error("The networks can only share scores with "
+                 "SAVE_MODE = 'sqlite'")
+    sys.exit(1)
+
+prepare()
+supervisor = Supervisor(listed,
+                        options.socket or os.path.join(config.SAVE_DIR,
+                                                       'health.sock'),
+                        options.interval, logger=logger)
+signal.signal(signal.SIGTERM, supervisor.stop_soon)
+supervisor.start()
+try:
+    supervisor.run()
+except KeyboardInterrupt:
+    supervisor.stop()
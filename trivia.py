@@ -22,28 +22,46 @@
 # players, wait some, then continue.
 #
 
-import json
-import string
+import optparse
 import os
 import sys
 import datetime
-from os import execl, listdir, path, makedirs
-from random import choice
+import time
+import traceback
+import re
+from collections import OrderedDict
+from functools import partial
+from os import execl
 from twisted.words.protocols import irc
-from twisted.internet import reactor
+from twisted.internet import defer, reactor
 from twisted.internet.protocol import ClientFactory
 from twisted.internet.task import LoopingCall
 
-from lib.answer import Answer
+from lib.hotreload import (GAME_MODULES, import_fresh, install, read_config,
+                           rebind, swap_classes)
+from lib.inbound import parse_command, sanitize
+from lib.game import TriviaGame
+from lib.persistence import GameStore, JournalStore, write_json
+from lib.sqlstore import ALL_TIME, SqlStore
+from lib.clues import strategy_named
+from lib.floodguard import COMMAND, GUESS, LIMITS, LISTING, FloodGuard
+from lib.leaderboard import Leaderboard
+from lib.log import (DEBUG, ERROR, INFO, LOG, BufferedWriter, StreamWriter,
+                     level_named)
+from lib.metrics import REGISTRY, metrics_site, now
+# Its INFO priority isn't the log's INFO level.
+from lib.outbound import (CRITICAL, INFO as CHANNEL, PRIVATE, PRIORITIES,
+                          OutboundScheduler, budget)
+from lib.questionbank import load_bank
+from lib.shuffle import QuestionCursor
+from lib.supervisor import HealthReporter, find_network
 
 import config
 
 if not os.path.exists(config.SAVE_DIR):
     os.makedirs(config.SAVE_DIR)
 
-if config.USE_SSL.lower() == "yes":
-    from twisted.internet import ssl
-elif config.USE_SSL.lower() != 'no':
+if config.USE_SSL.lower() not in ('yes', 'no'):
     # USE_SSL wasn't yes and it's not no, so raise an error.
     raise ValueError("USE_SSL must either be 'yes' or 'no'.")
 
@@ -53,6 +71,211 @@ try:
 except:
     config.COLOR_CODE = ''
 
+# The compiled question bank lives with the save data unless told otherwise.
+try:
+    config.Q_BANK
+except AttributeError:
+    config.Q_BANK = os.path.join(config.SAVE_DIR, 'questions.bank')
+
+# Seconds of changes to scores and teams that are collected into one save.
+try:
+    config.SAVE_WINDOW
+except AttributeError:
+    config.SAVE_WINDOW = 5
+
+# 'snapshot' rewrites scores.json and teams.json on every save, 'journal'
+# appends each change to a journal and compacts it every COMPACT_EVERY
+# changes, 'sqlite' keeps every award and season in SAVE_DIR/trivia.sqlite.
+try:
+    config.SAVE_MODE
+except AttributeError:
+    config.SAVE_MODE = 'snapshot'
+
+try:
+    config.COMPACT_EVERY
+except AttributeError:
+    config.COMPACT_EVERY = 1000
+
+# Lines waiting for any one place, other than the game itself, beyond
+# which the oldest are dropped.
+try:
+    config.OUTBOUND_DEPTH
+except AttributeError:
+    config.OUTBOUND_DEPTH = 30
+
+# Channels to host games in, all from one connection; defaults to just
+# GAME_CHANNEL.
+try:
+    config.GAME_CHANNELS
+except AttributeError:
+    config.GAME_CHANNELS = [config.GAME_CHANNEL]
+
+# Where each channel's place in the questions is kept, if not SAVE_DIR.
+# Under the supervisor every network gets a directory of its own.
+try:
+    config.CURSOR_DIR
+except AttributeError:
+    config.CURSOR_DIR = None
+
+# Port to serve Prometheus metrics on at /metrics; None serves nothing.
+try:
+    config.METRICS_PORT
+except AttributeError:
+    config.METRICS_PORT = None
+
+try:
+    config.METRICS_INTERFACE
+except AttributeError:
+    config.METRICS_INTERFACE = '127.0.0.1'
+
+# How clues give the answer away: 'letters' one at a time, 'initials' (the
+# first letter of every word first), 'vowels' (all the vowels first) or
+# 'length' (only the number of words until the first clue shows their
+# lengths).
+try:
+    config.CLUE_STRATEGY
+except AttributeError:
+    config.CLUE_STRATEGY = 'letters'
+strategy_named(config.CLUE_STRATEGY)
+
+# Questions each game keeps prepared ahead, on a thread, so asking the next
+# one doesn't wait on reading it and working out its answer and clues.
+try:
+    config.PREFETCH_DEPTH
+except AttributeError:
+    config.PREFETCH_DEPTH = 3
+
+# How fast each nick may guess, give commands and ask for listings (commands
+# with several lines of reply), as (per second, most at once). Going over
+# means being ignored for FLOOD_PENALTY seconds. Admins aren't limited.
+# Buckets are kept for the FLOOD_TRACKED most recent nicks.
+try:
+    config.FLOOD_LIMITS
+except AttributeError:
+    config.FLOOD_LIMITS = LIMITS
+
+try:
+    config.FLOOD_PENALTY
+except AttributeError:
+    config.FLOOD_PENALTY = 30
+
+try:
+    config.FLOOD_TRACKED
+except AttributeError:
+    config.FLOOD_TRACKED = 10000
+
+# Bounds (shortest, longest) for the seconds between clues, which then
+# follow how fast questions are being answered: over the last PACE_WINDOW
+# questions, the PACE_PERCENTILE answer time is aimed at the last clue.
+# None keeps WAIT_INTERVAL.
+try:
+    config.PACE_BOUNDS
+except AttributeError:
+    config.PACE_BOUNDS = None
+
+try:
+    config.PACE_PERCENTILE
+except AttributeError:
+    config.PACE_PERCENTILE = 0.9
+
+try:
+    config.PACE_WINDOW
+except AttributeError:
+    config.PACE_WINDOW = 20
+
+# Questions open at once in a rapid-fire round, when !rapid doesn't say,
+# and the most it may ask for.
+try:
+    config.RAPID_QUESTIONS
+except AttributeError:
+    config.RAPID_QUESTIONS = 5
+
+try:
+    config.RAPID_MAX
+except AttributeError:
+    config.RAPID_MAX = 10
+
+# The log is JSON lines, to LOG_FILE or stdout. The file is rotated at
+# LOG_MAX_BYTES, keeping LOG_BACKUPS old ones. Only LOG_CHATTER_RATE
+# records a second are kept of what users can cause at will, like commands.
+try:
+    config.LOG_LEVEL
+except AttributeError:
+    config.LOG_LEVEL = 'info'
+
+try:
+    config.LOG_FILE
+except AttributeError:
+    config.LOG_FILE = None
+
+try:
+    config.LOG_MAX_BYTES
+except AttributeError:
+    config.LOG_MAX_BYTES = 10 * 1024 * 1024
+
+try:
+    config.LOG_BACKUPS
+except AttributeError:
+    config.LOG_BACKUPS = 5
+
+try:
+    config.LOG_CHATTER_RATE
+except AttributeError:
+    config.LOG_CHATTER_RATE = 10
+
+LOG.configure(level=level_named(config.LOG_LEVEL),
+              chatter_rate=config.LOG_CHATTER_RATE)
+
+
+def cursor_file(channel):
+    '''
+    Where the place in the shuffled questions is kept for a channel. The
+    first channel's is the file there was when there was only one game.
+    '''
+    if channel == config.GAME_CHANNELS[0]:
+        name = 'question_cursor.json'
+    else:
+        name = 'question_cursor-{}.json'.format(
+            re.sub(r'[^\w-]', '_', channel.lstrip('#&')))
+    return os.path.join(config.CURSOR_DIR or config.SAVE_DIR, name)
+
+
+# Settings !reload leaves alone: changing them means reconnecting or
+# reopening the save files, so they wait for !restart.
+RESTART_SETTINGS = ('SERVER', 'SERVER_PORT', 'USE_SSL', 'DEFAULT_NICK',
+                    'NETWORKS', 'GAME_CHANNEL', 'GAME_CHANNELS', 'CURSOR_DIR',
+                    'SAVE_DIR', 'SAVE_MODE', 'SAVE_WINDOW', 'COMPACT_EVERY',
+                    'Q_BANK', 'METRICS_PORT', 'METRICS_INTERFACE',
+                    'LOG_FILE', 'LOG_MAX_BYTES', 'LOG_BACKUPS')
+
+
+MESSAGES = REGISTRY.counter('trivia_messages_total',
+                            'Messages to the bot and its channels.')
+# Timing a message costs a good part of handling one, so only one in this
+# many is timed; that's still an even sample.
+PRIVMSG_SAMPLE = 16
+PRIVMSG_SECONDS = REGISTRY.histogram(
+    'trivia_privmsg_seconds', 'Time taken over a sample of the messages to '
+    'the bot and its channels.')
+GUESS_HITS = REGISTRY.counter('trivia_guesses_total',
+                              'Guesses checked against the answer.',
+                              {'result': 'hit'})
+GUESS_MISSES = REGISTRY.counter('trivia_guesses_total',
+                                'Guesses checked against the answer.',
+                                {'result': 'miss'})
+RECONNECTS = REGISTRY.counter('trivia_reconnects_total',
+                              'Times the connection dropped or failed and '
+                              'was tried again.')
+
+
+# Commands that reply with several lines, so are limited harder.
+LISTING_COMMANDS = frozenset(['help', 'standings', 'teams', 'categories',
+                              'near', 'top', 'seasons', 'history'])
+
+# Lines per page of !standings, and how many places either side !near shows.
+STANDINGS_PAGE = 10
+NEAR_DISTANCE = 2
+
 
 class triviabot(irc.IRCClient):
     '''
@@ -63,31 +286,82 @@ class triviabot(irc.IRCClient):
     server.
     '''
 
-    def __init__(self):
-        self._answer = Answer()
-        self._question = ''
+    def __init__(self, clock=None, defer_to_thread=None):
+        # Both default to the reactor's; a simulation passes its own.
+        self._clock = clock
         self._scores = {}
         self._teams = {}
 
-        self._round_questions = config.ROUND_QUESTIONS
-        self._round_scores = {}
-        self._round_started = False
-        self._round_question_num = 0
-
-        self._clue_number = 0
-        self._admins = list(config.ADMINS)
-        self._admins.append(config.OWNER)
-        self._game_channel = config.GAME_CHANNEL
+        self._admins = set(config.ADMINS)
+        self._admins.add(config.OWNER)
         self._team_limit = config.TEAM_LIMIT
-        self._current_points = 5
+        self._flood = FloodGuard(config.FLOOD_LIMITS, config.FLOOD_PENALTY,
+                                 config.FLOOD_TRACKED, self._admins, clock,
+                                 self._flooding)
         self._questions_dir = config.Q_DIR
-        self._lc = LoopingCall(self._play_game)
+        self._questions = load_bank(config.Q_BANK, self._questions_dir)
+        # One game per channel, all asking from the same bank. The first
+        # is the one private messages go to.
+        self._games = OrderedDict()
+        for channel in config.GAME_CHANNELS:
+            self._games[channel] = TriviaGame(
+                self, channel, self._questions,
+                QuestionCursor(cursor_file(channel), len(self._questions)),
+                config.ROUND_QUESTIONS, config.WAIT_INTERVAL,
+                config.WAIT_QUESTION, clock, config.CLUE_STRATEGY,
+                config.PREFETCH_DEPTH, defer_to_thread, config.PACE_BOUNDS,
+                config.PACE_PERCENTILE, config.PACE_WINDOW)
+        self._game_channel = config.GAME_CHANNELS[0]
         self._quit = False
         self._restarting = False
-
+        self._signed_on = False
+
+        if config.SAVE_MODE == 'journal':
+            self._store = JournalStore(config.SAVE_DIR, config.SAVE_WINDOW,
+                                       config.COMPACT_EVERY, clock,
+                                       defer_to_thread)
+        elif config.SAVE_MODE == 'sqlite':
+            self._store = SqlStore(config.SAVE_DIR, config.SAVE_WINDOW,
+                                   clock=clock,
+                                   defer_to_thread=defer_to_thread)
+        else:
+            self._store = GameStore(config.SAVE_DIR, config.SAVE_WINDOW,
+                                    clock, defer_to_thread)
         self._load_game()
-        self._votes = 0
-        self._voters = []
+
+        # Command dispatch tables, built once rather than per command.
+        self._commands = {'score': self._score,
+                          'help': self._help,
+                          #'source': self._show_source,
+                          'standings': self._standings,
+                          'join': self._join,
+                          'leave': self._leave,
+                          'kick': self._kick,
+                          'teams': self._list_teams,
+                          'categories': self._list_categories,
+                          'rank': self._rank,
+                          'near': self._near,
+                          #'giveclue': self._give_clue,
+                          #'next': self._next_vote,
+                          #'skip': self._next_question
+                          }
+        self._admin_commands = {'die': self._die,
+                                'restart': self._restart,
+                                'reset': self._reset,
+                                'set': self._set_user_score,
+                                'qnum': self._set_question_number,
+                                'start': self._start,
+                                'rapid': self._rapid,
+                                'stop': self._stop,
+                                'save': self._force_save,
+                                'stats': self._stats,
+                                'reload': self._reload,
+                                }
+        if config.SAVE_MODE == 'sqlite':
+            self._commands.update({'top': self._top,
+                                   'seasons': self._seasons,
+                                   'history': self._history,
+                                   })
 
     def _get_nickname(self):
         return self.factory.nickname
@@ -95,202 +369,183 @@ class triviabot(irc.IRCClient):
     nickname = property(_get_nickname)
 
     def _get_lineRate(self):
-        return self.factory.lineRate
+        # The outbound scheduler paces lines itself, at the factory's rate.
+        return None
 
     lineRate = property(_get_lineRate)
 
-    def _cmsg(self, dest, msg):
+    def connectionMade(self):
+        # Built here because the line rate comes from the factory.
+        self._outbound = OutboundScheduler(self.msg, self._line_budget,
+                                           config.COLOR_CODE,
+                                           self.factory.lineRate,
+                                           config.OUTBOUND_DEPTH, self._clock)
+        for priority, name in enumerate(PRIORITIES):
+            REGISTRY.gauge('trivia_outbound_waiting',
+                           'Lines and calls waiting to be sent.',
+                           {'priority': name}).set_function(
+                               partial(self._outbound.depth, priority))
+        self.factory.bot = self
+        irc.IRCClient.connectionMade(self)
+
+    def _line_budget(self, dest):
+        return budget(self.nickname, dest)
+
+    def mode(self, chan, *args, **kwargs):
+        # In line with the game's messages, so the channel is muted and
+        # unmuted around the right ones.
+        self._outbound.call(
+            lambda: irc.IRCClient.mode(self, chan, *args, **kwargs), chan)
+
+    def quit(self, *args, **kwargs):
+        # After everything else that's waiting.
+        self._outbound.call(lambda: irc.IRCClient.quit(self, *args, **kwargs),
+                            priority=PRIVATE)
+
+    def _cmsg(self, dest, msg, priority=None):
         """
-        Write a colorized message.
+        Write a colorized message. Replies in a channel go ahead of
+        private ones; lines waiting for the same place are packed into
+        as few messages as possible.
         """
+        if priority is None:
+            priority = CHANNEL if dest[:1] in '#&' else PRIVATE
+        self._outbound.queue(dest, msg, priority)
 
-        self.msg(dest, "{}{}".format(config.COLOR_CODE, msg))
-
-    def _gmsg(self, msg):
+    def _gmsg(self, msg, channel=None):
         """
-        Write a message to the channel playing the trivia game.
+        Write a message to a channel playing the trivia game, the first
+        one by default. These go out before anything else.
         """
 
-        self._cmsg(self._game_channel, msg)
-
-    def _play_game(self):
-        '''
-        Implements the main loop of the game.
-        '''
-        qn = self._round_question_num
-        if qn > config.ROUND_QUESTIONS:
-          self._gmsg("Round complete!")
-          self._stop()
-
-        points = {0: 5,
-                  1: 3,
-                  2: 2,
-                  3: 1
-                  }
-        if self._clue_number == 0:
-            #self._lc.stop()
-            #self._lc.start(config.WAIT_INTERVAL)
-
-            self._round_question_num += 1
-            qn = self._round_question_num
-            self._votes = 0
-            self._voters = []
-            self._get_new_question()
-            self._current_points = points[self._clue_number]
-            # Blank line.
-            self._gmsg("")
-            #self._gmsg("Next question:")
-            self._gmsg("Next Question [{}/{}]:".format(qn, self._round_questions))
-            self._gmsg(self._question)
-            self._gmsg("Clue: {}".format(self._answer.current_clue()))
-            self._clue_number += 1
-            # let people speak ; -)
-            self.mode(self._game_channel, False, 'm')
-        # we must be somewhere in between
-        elif self._clue_number < 4:
-            self._current_points = points[self._clue_number]
-            self._gmsg("Question [{}/{}]:".format(qn, self._round_questions))
-            self._gmsg(self._question)
-            self._gmsg("Clue: {}".format(self._answer.give_clue()))
-            self._clue_number += 1
-        # no one must have gotten it.
-        else:
-            self.mode(self._game_channel, True, 'm')
-            self._gmsg("No one got it. The answer was: {}"
-                       .format(self._answer.answer))
-            self._clue_number = 0
-
-            qn = self._round_question_num
-            if qn >= config.ROUND_QUESTIONS:
-              self._gmsg("Round complete!")
-              self._stop()
-            else:
-              self._gmsg("Next question in {} seconds.".format(config.WAIT_QUESTION))
-              self._get_new_question()
+        self._cmsg(channel or self._game_channel, msg, CRITICAL)
 
-            #self._lc.reset()
-            #self._lc.stop()
-            #self._lc.start(config.WAIT_QUESTION, False)
+    def _game(self, channel):
+        """
+        The game a command given in channel is about: that channel's, or
+        the first game's for private messages and other channels.
+        """
+        return self._games.get(channel, self._games[self._game_channel])
 
     def signedOn(self):
         '''
         Actions to perform on signon to the server.
         '''
-        self.join(self._game_channel)
-        self.msg("NickServ", "identify {}".format(config.IDENT_STRING))
-        print("Signed on as {}.".format(self.nickname))
-        if self.factory.running:
-            self._start(None, None, None)
-        else:
-            self._gmsg("Welcome to {}!".format(self._game_channel))
-            self._gmsg("Have an admin start the game when you are ready.")
-            self._gmsg("For how to use this bot, just say !help or")
-            self._gmsg("{} help.".format(self.nickname))
+        for channel in self._games:
+            self.join(channel)
+        # Uncoloured, so not through _cmsg.
+        self._outbound.call(partial(self.msg, "NickServ", "identify {}"
+                                    .format(config.IDENT_STRING)),
+                            "NickServ")
+        LOG.info('signed_on', nickname=self.nickname)
+        self._signed_on = True
+        for channel, game in self._games.items():
+            if channel in self.factory.running:
+                game.start(rapid=self.factory.running[channel])
+            else:
+                self._gmsg("Welcome to {}!".format(channel), channel)
+                self._gmsg("Have an admin start the game when you are ready.",
+                           channel)
+                self._gmsg("For how to use this bot, just say !help or",
+                           channel)
+                self._gmsg("{} help.".format(self.nickname), channel)
 
     def joined(self, channel):
         '''
         Callback runs when the bot joins a channel
         '''
-        print("Joined {}.".format((channel)))
+        LOG.info('joined', channel=channel)
 
     def privmsg(self, user, channel, msg):
         '''
         Parses out each message and initiates doing the right thing
         with it.
+
+        Most lines are chatter that can't be a command or the answer, so
+        they're thrown out on their first character or length before any
+        work is done on them.
         '''
-        user, temp = user.split('!')
-        print(user + " : " + channel + " : " + msg)
-        # need to strip out non-printable characters if present.
-        printable = string.printable
-        msg = ''.join(filter(lambda x: x in printable, msg))
+        if not msg:
+            return
+        MESSAGES.inc()
+        timed = not MESSAGES.value % PRIVMSG_SAMPLE
+        if timed:
+            started = now()
+        user = user.split('!', 1)[0]
+        if LOG.level <= DEBUG:
+            LOG.chatter(DEBUG, 'message', user=user, channel=channel,
+                        text=msg)
 
-        # parses each incoming line, and sees if it's a command for the bot.
         try:
-            if (msg[0] == "!"):
-                command = msg.replace('!', '').split()[0]
-                args = msg.replace('!', '').split()[1:]
-                self.select_command(command, args, user, channel)
-                return
-            elif (msg.split()[0].find(self.nickname) == 0):
-                command = msg.split()[1]
-                args = msg.replace(self.nickname, '').split()[2:]
-                self.select_command(command, args, user, channel)
-                return
+            # parses each incoming line, and sees if it's a command for the bot.
+            if msg[0] == '!' or msg.startswith(self.nickname):
+                parsed = parse_command(sanitize(msg), self.nickname)
+                if parsed is not None and self._flood.allow(
+                        user, LISTING if parsed[0] in LISTING_COMMANDS
+                        else COMMAND):
+                    self.select_command(parsed[0], parsed[1], user, channel)
             # if not, try to match the message to the answer.
             else:
-                if msg.lower().strip() == self._answer.answer.lower():
-                #if msg.lower().strip() == self._answer.answer.lower() or \
-                #  msg.lower().strip() == 'wtf':
-                    self._winner(user, channel)
-                    self._save_game()
+                game = self._game(channel)
+                if (game.asking and len(msg) <= game.longest_guess
+                        and self._flood.allow(user, GUESS)):
+                    which = game.match(sanitize(msg))
+                    if which is not None:
+                        GUESS_HITS.inc()
+                        self._winner(user, channel, which)
+                    else:
+                        GUESS_MISSES.inc()
         except Exception as e:
-            print(e)
-            return
+            LOG.chatter(ERROR, 'message_failed', user=user, channel=channel,
+                        text=msg, error=str(e))
+        if timed:
+            PRIVMSG_SECONDS.observe(now() - started)
 
-    def _winner(self, user, channel):
+    def _flooding(self, user, kind):
         '''
-        Congratulates the winner for guessing correctly and assigns
-        points appropriately, then signals that it was guessed.
+        Tells user they're being ignored for a while, once each time.
         '''
-        if channel != self._game_channel:
-            self.msg(channel,
-                     "I'm sorry, answers must be given in the game channel.")
-            return
-
-        # mute the channel when announcing score
-        self.mode(self._game_channel, True, 'm')
-
-        # get team
-        in_team = True
-        tn = 'noteam'
-        try:
-          tn = self._teams['users'][user]
-        except:
-          in_team = False
-
-        if in_team:
-          self._gmsg("{} ({}) GOT IT!".format(tn.upper(), user.upper()))
-        else:
-          self._gmsg("{} GOT IT!".format(user.upper()))
-
-        self._gmsg("""If there was any doubt, the correct answer was: {}""".format(self._answer.answer))
+        self._cmsg(user, "Slow down! Your {} are being ignored for {} "
+                   "seconds.".format('guesses' if kind == GUESS else 'commands',
+                                     config.FLOOD_PENALTY))
 
+    def _winner(self, user, channel, which=0):
+        '''
+        Hands a right answer to the game in channel, to question which in
+        a rapid-fire round.
+        '''
+        if channel not in self._games:
+            self._cmsg(channel,
+                       "I'm sorry, answers must be given in the game channel.")
+            return
+        self._games[channel].winner(user, which)
 
+    def _award(self, user, points):
+        '''
+        Adds points to user's score, and their team's if they're in one.
+        Returns the team, or None.
+        '''
+        team = self._teams['users'].get(user)
         try:
-            self._scores['user'][user] += self._current_points
-            if in_team:
-              self._scores['team'][tn] += self._current_points
+            self._scores['user'][user] += points
         except:
-            self._scores['user'][user] = self._current_points
-            if in_team:
-              self._scores['team'][tn] = self._current_points
-        if self._current_points == 1:
-            self._gmsg("{} point has been added to your score!"
-                       .format(str(self._current_points)))
-        else:
-            self._gmsg("{} points have been added to your score!"
-                       .format(str(self._current_points)))
-
-        self._lc.stop()
-        #self._lc.start(config.WAIT_QUESTION, False)
-        self._lc.start(config.WAIT_INTERVAL, False)
-
-        self._clue_number = 0
-
-        qn = self._round_question_num
-        if qn >= config.ROUND_QUESTIONS:
-          self._gmsg("Round complete!")
-          self._stop()
-        else:
-          self._gmsg("Next question in {} seconds.".format(config.WAIT_QUESTION))
+            self._scores['user'][user] = points
+        self._leaders['user'].set(user, self._scores['user'][user])
+        if team is not None:
+          try:
+              self._scores['team'][team] += points
+          except:
+              self._scores['team'][team] = points
+          self._leaders['team'].set(team, self._scores['team'][team])
+        self._record('award', user=user, team=team, points=points)
+        return team
 
     def ctcpQuery(self, user, channel, msg):
         '''
         Responds to ctcp requests.
         Currently just reports them.
         '''
-        print("CTCP recieved: " + user + ":" + channel +
-              ": " + msg[0][0] + " " + msg[0][1])
+        LOG.chatter(INFO, 'ctcp', user=user, channel=channel, query=msg)
 
     def _leave_util(self, channel, team, user):
       """
@@ -301,6 +556,8 @@ class triviabot(irc.IRCClient):
 
       ot = team
       self._teams['teams'][ot]['members'] = [x for x in self._teams['teams'][ot]['members'] if x != user]
+      if self._teams['users'].get(user) == ot:
+        del self._teams['users'][user]
       if len(self._teams['teams'][ot]['members']) == 0:
         del self._teams['teams'][ot]
         self._cmsg(dst, '{} left "{}".'.format(user, ot))
@@ -312,7 +569,8 @@ class triviabot(irc.IRCClient):
         else:
           self._cmsg(dst, '{} left "{}".'.format(user, ot))
 
-      self._save_game()
+      self._record('leave', user=user, team=ot,
+                   state=self._teams['teams'].get(ot))
 
     def _leave(self, args, user, channel):
       """
@@ -348,18 +606,11 @@ class triviabot(irc.IRCClient):
         if not channel == self.nickname:
           dst = channel
 
-        print('\n\n\n')
-        print('---')
-        print(self._teams)
-
         tn = ' '.join(args)
         tn = [ch for ch in tn if ch.isalnum() or ch == ' ']
         tn = ''.join(tn)
         tn = tn[:25]
 
-        print(tn)
-
-
         if 'users' not in self._teams:
           self._teams['users'] = {}
 
@@ -394,10 +645,10 @@ class triviabot(irc.IRCClient):
         self._teams['users'][user] = tn
 
         self._cmsg(dst, '{} has joined "{}".'.format(user, tn))
+        LOG.debug('team_joined', user=user, team=tn, teams=self._teams)
 
-        print(self._teams)
-
-        self._save_game()
+        self._record('join', user=user, team=tn,
+                     state=self._teams['teams'][tn])
 
     def _list_teams(self, args, user, channel):
       """
@@ -414,6 +665,22 @@ class triviabot(irc.IRCClient):
 
 
 
+    def _list_categories(self, args, user, channel):
+        '''
+        Tells the user the biggest question categories, or the ones
+        starting with the given text.
+        '''
+        categories = self._questions.categories()
+        prefix = ' '.join(args).lower()
+        matched = sorted((size, name) for name, size in categories.items()
+                         if name and name.startswith(prefix))
+        if not matched:
+            self._cmsg(user, 'No category matches "{}".'.format(prefix))
+            return
+        top = ', '.join('{} ({})'.format(name, size)
+                        for size, name in reversed(matched[-20:]))
+        self._cmsg(user, "Categories: {}".format(top))
+
     def _help(self, args, user, channel):
         '''
         Tells people how to use the bot.
@@ -425,18 +692,22 @@ class triviabot(irc.IRCClient):
         if not channel == self.nickname:
           dst = channel
 
-        try:
-            self._admins.index(user)
-        except:
+        if user not in self._admins:
             self._cmsg(dst, "I'm {}'s trivia bot.".format(config.OWNER))
-            self._cmsg(dst, "Commands: score, standings, help, join, leave")
+            self._cmsg(dst, "Commands: score, standings [players] [page], "
+                       "rank [name], near, help, join, leave, categories")
+            if config.SAVE_MODE == 'sqlite':
+                self._cmsg(dst, "Leaderboards: top [teams] [all], seasons, "
+                           "history [name]")
 
             return
         self._cmsg(dst, "I'm {}'s trivia bot.".format(config.OWNER))
         self._cmsg(dst, "Commands: score, standings, giveclue, help, next, "
                    "skip ")
-        self._cmsg(dst, "Admin commands: die, set <user> <score>, start, stop, "
-                   "save")
+        self._cmsg(dst, "Admin commands: die, set <user> <score>, "
+                   "start [category, category=weight, ...], "
+                   "rapid [questions] [categories], stop, save, stats, "
+                   "reload")
 
     def _show_source(self, args, user, channel):
         '''
@@ -454,183 +725,267 @@ class triviabot(irc.IRCClient):
         Need to differentiate between priviledged users and regular
         users.
         '''
-        # set up command dicts.
-        unpriviledged_commands = {'score': self._score,
-                                  'help': self._help,
-                                  #'source': self._show_source,
-                                  'standings': self._standings,
-                                  'join': self._join,
-                                  'leave': self._leave,
-                                  'kick': self._kick,
-                                  'teams': self._list_teams,
-                                  #'giveclue': self._give_clue,
-                                  #'next': self._next_vote,
-                                  #'skip': self._next_question
-                                  }
-        priviledged_commands = {'die': self._die,
-                                'restart': self._restart,
-                                'reset': self._reset,
-                                'set': self._set_user_score,
-                                'qnum': self._set_question_number,
-                                'start': self._start,
-                                'stop': self._stop,
-                                'save': self._save_game,
-                                }
-        print(command, args, user, channel)
-        try:
-            self._admins.index(user)
-            is_admin = True
-        except:
-            is_admin = False
+        LOG.chatter(INFO, 'command', command=command, args=args, user=user,
+                    channel=channel)
+        is_admin = user in self._admins
 
         # the following takes care of sorting out functions and
         # priviledges.
-        if not is_admin and command in priviledged_commands:
-            self.msg(channel, "{}: You don't tell me what to do."
-                     .format(user))
+        if not is_admin and command in self._admin_commands:
+            self._cmsg(channel, "{}: You don't tell me what to do."
+                       .format(user))
             return
-        elif is_admin and command in priviledged_commands:
-            priviledged_commands[command](args, user, channel)
-        elif command in unpriviledged_commands:
-            unpriviledged_commands[command](args, user, channel)
+        elif is_admin and command in self._admin_commands:
+            self._admin_commands[command](args, user, channel)
+        elif command in self._commands:
+            self._commands[command](args, user, channel)
         else:
-            self.describe(channel, "{}looks at {} oddly."
-                          .format(config.COLOR_CODE, user))
+            # A line of its own: an action can't be packed with others.
+            self._outbound.call(partial(self.describe, channel,
+                                        "{}looks at {} oddly."
+                                        .format(config.COLOR_CODE, user)),
+                                channel, CHANNEL)
 
     def _next_vote(self, args, user, channel):
-        '''Implements user voting for the next question.
-
-        Need to keep track of who voted, and how many votes.
-
-        '''
-        if not self._lc.running:
-            self._gmsg("We aren't playing right now.")
-            return
-        try:
-            self._voters.index(user)
-            self._gmsg("You already voted, {}, give someone else a chance to "
-                       "hate this question".format(user))
-            return
-        except:
-            if self._votes < 2:
-                self._votes += 1
-                self._voters.append(user)
-                print(self._voters)
-                self._gmsg("{}, you have voted. {} more votes needed to "
-                           "skip.".format(user, str(3 - self._votes)))
-            else:
-                self._votes = 0
-                self._voters = []
-                self._next_question(None, None, None)
+        '''Implements user voting for the next question.'''
+        self._game(channel).vote(user)
 
     def _start(self, args, user, channel):
         '''
-        Starts the trivia game.
+        Starts the trivia game in channel.
 
-        TODO: Load scores from last game, if any.
+        Any arguments are a theme for the round: a comma separated list of
+        categories, each optionally weighted, e.g. "astrology, music=2".
         '''
-        if self._lc.running:
-            return
-        else:
-            self._gmsg("Starting a new round!")
-            self._lc.start(config.WAIT_INTERVAL)
-            self.factory.running = True
+        self._start_round(args, user, channel)
 
-    def _stop(self, *args):
+    def _rapid(self, args, user, channel):
         '''
-        Stops the game and thanks people for playing,
-        then saves the scores.
+        Starts a rapid-fire round in channel, with several questions open
+        at once: as many as the first argument, if it's a number, or
+        RAPID_QUESTIONS, up to RAPID_MAX. The rest are a theme, as for
+        start.
         '''
-        if not self._lc.running:
+        count = config.RAPID_QUESTIONS
+        if args and args[0].isdigit():
+            count, args = int(args[0]), args[1:]
+        if count < 1:
+            self._cmsg(user, "A rapid-fire round needs at least one question.")
             return
-        else:
-            self._lc.stop()
-            self._round_question_num = 0
-            self._gmsg('Thanks for playing!')
-            #self._gmsg('Current rankings were:')
-            self._standings(None, self._game_channel, self._game_channel)
-            self._gmsg('''Scores have been saved, and see you next game!''')
-            self._save_game()
-            self.factory.running = False
-
-            # people should be able to talk
-            self.mode(self._game_channel, False, 'm')
-
-
-            # we should reset all scores so it's clean for the next one
-            # create a date
+        if count > config.RAPID_MAX:
+            self._cmsg(user, "A rapid-fire round can have at most {} "
+                       "questions open at once.".format(config.RAPID_MAX))
+            return
+        self._start_round(args, user, channel, count)
 
+    def _start_round(self, args, user, channel, rapid=0):
+        game = self._game(channel)
+        if config.SAVE_MODE == 'sqlite' and not game.running:
+            # Other networks may have scored or changed teams since.
+            self._save_game()
+            self._load_game()
+        if game.start(args, user, rapid):
+            self.factory.running[game.channel] = rapid
 
+    def _stop(self, args, user, channel):
+        '''
+        Stops the game in channel.
+        '''
+        self._game(channel).stop()
 
+    def _round_over(self, game):
+        '''
+        Called by a game when it stops: shows the standings and saves the
+        scores.
+        '''
+        self.factory.running.pop(game.channel, None)
+        self._standings(None, game.channel, game.channel)
+        self._save_game()
+        self._gmsg('''Scores have been saved, and see you next game!''',
+                   game.channel)
 
+    def _record(self, event, **fields):
+        '''
+        Notes a change to the scores or teams. It's saved to the data
+        directory in the background within SAVE_WINDOW seconds, along with
+        anything else that changes in the meantime.
+        '''
+        fields['e'] = event
+        self._store.record(fields, self._scores, self._teams)
 
     def _save_game(self, *args):
         '''
-        Saves the game to the data directory.
+        Saves any unsaved changes, and each game's place in the questions,
+        right now. Returns whether the changes were saved; if not, they're
+        tried again in the background.
         '''
-        with open(os.path.join(config.SAVE_DIR, 'scores.json'), 'w') as savefile:
-            json.dump(self._scores, savefile)
-            print("Scores have been saved.")
-
-        with open(os.path.join(config.SAVE_DIR, 'teams.json'), 'w') as savefile:
-            json.dump(self._teams, savefile)
-            print("Teams have been saved.")
+        for channel, game in self._games.items():
+            try:
+                game.save_place()
+            except (IOError, OSError) as e:
+                # At worst a few questions come round again.
+                LOG.error('cursor_save_failed', channel=channel, error=str(e))
+        return self._store.flush()
 
-    def _load_game(self):
+    def _force_save(self, args, user, channel):
         '''
-        Loads the running data from previous games.
+        Administratively saves the game right now, and reports how long
+        saves are taking.
         '''
-        # ensure initialization
-        self._scores = {}
-        if not path.exists(config.SAVE_DIR):
-            print("Save directory doesn't exist.")
-            return
+        if self._save_game():
+            saved = "Game saved."
+        else:
+            saved = "Saving failed, trying again in the background."
+        self._cmsg(user, "{} Last save took {:.1f} ms, slowest {:.1f} "
+                   "ms; {} saves, {} changes coalesced, {} failed."
+                   .format(saved, self._store.last_duration * 1000,
+                           self._store.max_duration * 1000,
+                           self._store.saves, self._store.coalesced,
+                           self._store.failures))
+
+    def _stats(self, args, user, channel):
+        '''
+        Administratively reports how much output packing is saving, what
+        the flood guard has dropped, and how fast each game is going.
+        '''
+        outbound = self._outbound
+        self._cmsg(user, "Output: {} lines sent as {} messages ({} bytes), "
+                   "saving {:.1f}s of send time and {} bytes of colour codes."
+                   .format(outbound.lines, outbound.messages,
+                           outbound.bytes_sent, outbound.time_saved,
+                           outbound.prefix_bytes_saved))
+        for priority, name in enumerate(PRIORITIES):
+            self._cmsg(user, "{}: {} waiting, {} sent, {} dropped, waited "
+                       "{:.1f}s on average and {:.1f}s at most."
+                       .format(name, outbound.depth(priority),
+                               outbound.sent[priority],
+                               outbound.dropped[priority],
+                               outbound.mean_wait(priority),
+                               outbound.max_wait[priority]))
+        flood = self._flood
+        self._cmsg(user, "Flood guard: {} nicks tracked, {} penalties, "
+                   "dropped {}.".format(len(flood), flood.penalties, ', '.join(
+                       "{}: {}".format(kind, count)
+                       for kind, count in sorted(flood.dropped.items()))))
+        for channel, game in self._games.items():
+            pacer = game._pacer
+            self._cmsg(user, "{}: {} questions, {:.0f} an hour, clues every "
+                       "{:.1f}s.".format(channel, pacer.questions,
+                                         pacer.questions_per_hour,
+                                         pacer.interval))
+
+    def _reload(self, args, user, channel):
+        '''
+        Administratively re-reads the config, rebuilds the question bank if
+        the questions changed and swaps in new game code, without leaving
+        the server or losing the games in progress. If any of it fails,
+        nothing changes.
+        '''
+        global config
+        started = time.time()
+        previous = None
         try:
-            with open(os.path.join(config.SAVE_DIR, 'scores.json'), 'r') as savefile:
-                self._scores = json.load(savefile)
-        except:
-            print("Save file doesn't exist.")
+            new_config = read_config(config.__file__)
+            previous, fresh = import_fresh(GAME_MODULES)
+            # Anything the file doesn't set keeps its default or override.
+            for name, value in vars(config).items():
+                if name in RESTART_SETTINGS or not hasattr(new_config, name):
+                    setattr(new_config, name, value)
+            level = level_named(new_config.LOG_LEVEL)
+            fresh['lib.clues'].strategy_named(new_config.CLUE_STRATEGY)
+            bank = fresh['lib.questionbank'].load_bank(new_config.Q_BANK,
+                                                       new_config.Q_DIR)
+            themes = {}
+            cursors = {}
+            for channel, game in self._games.items():
+                if game.theme is not None:
+                    themes[channel] = fresh['lib.sampling'].CategorySampler(
+                        bank, game.theme.theme)
+                if len(bank) != len(self._questions):
+                    # The ids moved; start a new shuffle.
+                    cursors[channel] = fresh['lib.shuffle'].QuestionCursor(
+                        cursor_file(channel), len(bank))
+        except Exception as e:
+            if previous is not None:
+                install(previous)
+            LOG.error('reload_failed', traceback=traceback.format_exc())
+            self._cmsg(user, "Reload failed, nothing changed: {}".format(e))
             return
 
-        if 'user' not in self._scores:
-          self._scores['user'] = {}
-        if 'team' not in self._scores:
-          self._scores['team'] = {}
-
-        print(self._scores)
-        print("Scores loaded.")
-
-        # ensure initialization
-        self._teams = {}
-        if not path.exists(config.SAVE_DIR):
-            print("Save directory doesn't exist.")
-            return
-        try:
-            with open(os.path.join(config.SAVE_DIR, 'teams.json'), 'r') as savefile:
-                temp_dict = json.load(savefile)
-        except:
-            print("Team file doesn't exist.")
-            return
+        # Nothing below can fail.
+        config = sys.modules['config'] = new_config
+        rebind(globals(), fresh)
+        self._admins = set(config.ADMINS)
+        self._admins.add(config.OWNER)
+        self._team_limit = config.TEAM_LIMIT
+        self._flood.configure(config.FLOOD_LIMITS, config.FLOOD_PENALTY,
+                              config.FLOOD_TRACKED, self._admins)
+        self._questions_dir = config.Q_DIR
+        self.factory.lineRate = config.LINE_RATE
+        self._outbound.configure(config.COLOR_CODE, config.LINE_RATE,
+                                 config.OUTBOUND_DEPTH)
+        LOG.configure(level=level, chatter_rate=config.LOG_CHATTER_RATE)
+        old_bank, self._questions = self._questions, bank
+        reading = []
+        for channel, game in self._games.items():
+            swap_classes(game, fresh)
+            game.theme = themes.get(channel)
+            reading.append(game.reloaded(
+                bank, cursors.get(channel), config.WAIT_INTERVAL,
+                config.WAIT_QUESTION, config.CLUE_STRATEGY,
+                config.PREFETCH_DEPTH, config.PACE_BOUNDS,
+                config.PACE_PERCENTILE, config.PACE_WINDOW))
+        # Not under questions still being prepared from it on a thread.
+        defer.DeferredList(reading).addCallback(lambda _: old_bank.close())
+
+        elapsed = (time.time() - started) * 1000
+        LOG.info('reloaded', milliseconds=round(elapsed, 1), by=user)
+        self._cmsg(user, "Reloaded in {:.1f} ms: {} questions, {} games "
+                   "carried on.".format(elapsed, len(bank),
+                                        sum(1 for game in self._games.values()
+                                            if game.running)))
+
+    def _health(self):
+        '''
+        What the supervisor is told about this connection.
+        '''
+        return {'signed_on': self._signed_on,
+                'games': sum(1 for game in self._games.values()
+                             if game.running),
+                'lines': self._outbound.lines,
+                'waiting': sum(self._outbound.depth(priority)
+                               for priority in range(len(PRIORITIES))),
+                'saves': self._store.saves,
+                'save_failures': self._store.failures,
+                }
 
-        self._teams = temp_dict
-        print(self._scores)
-        print("Teams loaded.")
+    def _load_game(self):
+        '''
+        Loads the running data from previous games.
+        '''
+        self._scores, self._teams = self._store.load()
+        self._leaders = {'user': Leaderboard(self._scores['user']),
+                         'team': Leaderboard(self._scores['team'])}
+        LOG.info('loaded', players=len(self._scores['user']),
+                 teams=len(self._teams['teams']))
+        LOG.debug('loaded_scores', scores=self._scores, teams=self._teams)
 
 
     def _set_question_number(self, args, user, channel):
         '''
         Administrative action taken to adjust round question count
         '''
-        if self._lc.running:
+        game = self._game(channel)
+        if game.running:
           self._cmsg(user, "Can't change question number in the middle of a round")
           return
 
         if not len(args):
-          self._cmsg(user, "Round questions is currently set to: {}".format(self._round_questions))
+          self._cmsg(user, "Round questions is currently set to: {}".format(game.round_questions))
           return
 
         try:
-            self._round_questions = int(args[0])
+            game.round_questions = int(args[0])
         except:
             self._cmsg(user, args[0] + " is not a valid question number.")
             return
@@ -641,10 +996,12 @@ class triviabot(irc.IRCClient):
         Administrative action taken to adjust scores, if needed.
         '''
         try:
-            self._scores[args[0]] = int(args[1])
+            self._scores['user'][args[0]] = int(args[1])
         except:
             self._cmsg(user, args[0] + " not in scores database.")
             return
+        self._leaders['user'].set(args[0], int(args[1]))
+        self._record('set', user=args[0], points=int(args[1]), by=user)
         self._cmsg(user, args[0] + " score set to " + args[1])
 
     def _die(self, *args):
@@ -652,6 +1009,7 @@ class triviabot(irc.IRCClient):
         Terminates execution of the bot.
         '''
         self._quit = True
+        self._save_game()
         self.quit(message='This is triviabot, signing off.')
 
     def _restart(self, *args):
@@ -659,7 +1017,8 @@ class triviabot(irc.IRCClient):
         Restarts the bot
         '''
         self._restarting = True
-        print('Restarting')
+        self._save_game()
+        LOG.info('restarting')
         self.quit(message='Triviabot restarting.')
 
     def connectionLost(self, reason):
@@ -667,11 +1026,16 @@ class triviabot(irc.IRCClient):
         Called when connection is lost
         '''
         global reactor
+        self._signed_on = False
+        if self.factory.bot is self:
+            self.factory.bot = None
         if self._restarting:
+            # What's still waiting to be logged would go with this process.
+            LOG.configure(writer=StreamWriter())
             try:
                 execl(sys.executable, *([sys.executable]+sys.argv))
             except Exception as e:
-                print("Failed to restart: {}".format(e))
+                LOG.error('restart_failed', error=str(e))
         if self._quit:
             reactor.stop()
 
@@ -679,109 +1043,261 @@ class triviabot(irc.IRCClient):
         '''
         Tells the user their score.
         '''
-        try:
-            self._cmsg(user, "Your current score is: {}"
-                       .format(str(self._scores[user])))
-        except:
+        rank = self._leaders['user'].rank(user)
+        if rank is None:
             self._cmsg(user, "You aren't in my database.")
+            return
+        self._cmsg(user, "Your current score is: {} (ranked {} of {})"
+                   .format(self._scores['user'][user], rank,
+                           len(self._leaders['user'])))
 
     def _next_question(self, args, user, channel):
         '''
         Administratively skips the current question.
         '''
-        if not self._lc.running:
-            self._gmsg("We are not playing right now.")
-            return
-        self._gmsg("Question has been skipped. The answer was: {}".format(self._answer.answer))
-        self._clue_number = 0
-        self._lc.stop()
-        self._lc.start(config.WAIT_INTERVAL)
+        self._game(channel).skip()
 
     def _reset(self, args, user, channel):
 
-        fn = "scores-{:%Y-%m-%d-%H:%M:%S}.json".format(datetime.datetime.now())
-        with open(os.path.join(config.SAVE_DIR, fn), 'w') as savefile:
-            json.dump(self._scores, savefile)
-            self._scores = {}
-            self._scores['user'] = {}
-            self._scores['team'] = {}
-            print("Scores have been reset.")
+        # The database keeps every season itself.
+        if config.SAVE_MODE != 'sqlite':
+            fn = "scores-{:%Y-%m-%d-%H:%M:%S}.json".format(
+                datetime.datetime.now())
+            write_json(os.path.join(config.SAVE_DIR, fn), self._scores)
+        self._scores = {}
+        self._scores['user'] = {}
+        self._scores['team'] = {}
+        self._leaders = {'user': Leaderboard(), 'team': Leaderboard()}
+        self._record('reset', by=user)
+        LOG.info('scores_reset', by=user)
 
 
     def _standings(self, args, user, channel):
         '''
-        Tells the user the complete standings in the game.
-
-        TODO: order them.
+        Tells the user the team standings, or the player standings with
+        "players", a page at a time.
         '''
 
         dst = user
         if not channel == self.nickname:
           dst = channel
 
-        self._cmsg(dst, "The current trivia standings are: ")
-        sorted_scores = sorted(self._scores['team'].iteritems(), key=lambda (k, v): (v, k), reverse=True)
-        for rank, (player, score) in enumerate(sorted_scores, start=1):
+        args = args or []
+        kind = 'user' if 'players' in args else 'team'
+        page = 1
+        for arg in args:
+            if arg.isdigit():
+                page = max(1, int(arg))
+        board = self._leaders[kind]
+        pages = max(1, (len(board) + STANDINGS_PAGE - 1) // STANDINGS_PAGE)
+
+        self._cmsg(dst, "The current trivia standings are (page {} of {}):"
+                   .format(page, pages))
+        for rank, player, score in board.page((page - 1) * STANDINGS_PAGE,
+                                              STANDINGS_PAGE):
             formatted_score = "{}: {}: {}".format(rank, player, score)
             self._cmsg(dst, formatted_score)
 
-    def _give_clue(self, args, user, channel):
-        if not self._lc.running:
-            self._gmsg("we are not playing right now.")
+    def _reply_failed(self, failure, dst):
+        LOG.error('lookup_failed', traceback=failure.getTraceback())
+        self._cmsg(dst, "Sorry, I couldn't look that up.")
+
+    def _top(self, args, user, channel):
+        '''
+        Tells the user the leaders this season, or of all time with "all".
+        Add "teams" for the team leaders.
+        '''
+        dst = user
+        if not channel == self.nickname:
+          dst = channel
+
+        kind = 'team' if 'teams' in args else 'user'
+        season = ALL_TIME if 'all' in args else None
+        title = "All time" if season == ALL_TIME else \
+            "Season {}".format(self._store.season)
+        d = self._store.top(kind, 10, season)
+        d.addCallback(self._show_top, dst, title)
+        d.addErrback(self._reply_failed, dst)
+
+    def _show_top(self, leaders, dst, title):
+        if not leaders:
+            self._cmsg(dst, "{}: nobody has scored yet.".format(title))
             return
-        qn = self._round_question_num
-        self._round_question_num += 1
-        self._cmsg(channel, "Question [{}/{}]: ".format(qn, self.round_questions))
-        self._cmsg(channel, self._question)
-        self._cmsg(channel, "Clue: " + self._answer.current_clue())
-
-    def _get_new_question(self):
-        '''
-        Selects a new question from the questions directory and
-        sets it.
-        '''
-        damaged_question = True
-        while damaged_question:
-            # randomly select file
-            filename = choice(listdir(self._questions_dir))
-            fd = open(os.path.join(config.Q_DIR, filename))
-            lines = fd.read().splitlines()
-            myline = choice(lines)
-            fd.close()
-            try:
-                self._question, temp_answer = myline.split('`')
-            except ValueError:
-                print("Broken question:")
-                print(myline)
-                continue
-            self._answer.set_answer(temp_answer.strip())
-            damaged_question = False
+        self._cmsg(dst, "{} leaders:".format(title))
+        for rank, (name, points) in enumerate(leaders, start=1):
+            self._cmsg(dst, "{}: {}: {}".format(rank, name, points))
 
+    def _rank(self, args, user, channel):
+        '''
+        Tells the user where they, or the player or team they name, stand.
+        '''
+        dst = user
+        if not channel == self.nickname:
+          dst = channel
+
+        name = ' '.join(args) if args else user
+        for kind in ('user', 'team'):
+            rank = self._leaders[kind].rank(name)
+            if rank is not None:
+                self._cmsg(dst, "{} is ranked {} of {} with {} points."
+                           .format(name, rank, len(self._leaders[kind]),
+                                   self._leaders[kind].points(name)))
+                return
+        self._cmsg(dst, "{} hasn't scored yet.".format(name))
+
+    def _near(self, args, user, channel):
+        '''
+        Shows the players just above and below the user.
+        '''
+        nearby = self._leaders['user'].around(user, NEAR_DISTANCE)
+        if not nearby:
+            self._cmsg(user, "You haven't scored yet.")
+            return
+        for rank, player, score in nearby:
+            self._cmsg(user, "{}: {}: {}".format(rank, player, score))
+
+    def _seasons(self, args, user, channel):
+        '''
+        Lists the seasons and who won them.
+        '''
+        dst = user
+        if not channel == self.nickname:
+          dst = channel
+
+        d = self._store.seasons()
+        d.addCallback(self._show_seasons, dst)
+        d.addErrback(self._reply_failed, dst)
+
+    def _show_seasons(self, seasons, dst):
+        for season, started, ended, winner, points in seasons[:10]:
+            if ended is None:
+                when = "since {:%Y-%m-%d}".format(
+                    datetime.datetime.fromtimestamp(started))
+            else:
+                when = "ended {:%Y-%m-%d}".format(
+                    datetime.datetime.fromtimestamp(ended))
+            if winner is None:
+                self._cmsg(dst, "Season {} ({}): no scores.".format(season,
+                                                                   when))
+            else:
+                self._cmsg(dst, "Season {} ({}): {} with {} points."
+                           .format(season, when, winner, points))
+
+    def _history(self, args, user, channel):
+        '''
+        Tells the user their, or someone else's, latest points, including
+        any admin changes.
+        '''
+        name = args[0] if args else user
+        d = self._store.history(name)
+        d.addCallback(self._show_history, user, name)
+        d.addErrback(self._reply_failed, user)
+
+    def _show_history(self, awards, dst, name):
+        if not awards:
+            self._cmsg(dst, "{} has no points on record.".format(name))
+            return
+        for at, kind, points, by in awards:
+            line = "{:%Y-%m-%d %H:%M}: {:+d} ({})".format(
+                datetime.datetime.fromtimestamp(at), points, kind)
+            if by:
+                line += " by " + by
+            self._cmsg(dst, line)
+
+    def _give_clue(self, args, user, channel):
+        self._game(channel).give_clue()
 
 class ircbotFactory(ClientFactory):
     protocol = triviabot
 
-    def __init__(self, nickname=config.DEFAULT_NICK):
+    def __init__(self, nickname=config.DEFAULT_NICK, clock=None,
+                 defer_to_thread=None):
         self.nickname = nickname
-        self.running = False
+        # Handed to every bot built, for simulations.
+        self.clock = clock
+        self.defer_to_thread = defer_to_thread
+        # Channels with a game going, restarted if the connection drops:
+        # how many questions a rapid-fire round has open, or 0.
+        self.running = {}
         self.lineRate = config.LINE_RATE
+        # The current connection's bot, if there is one.
+        self.bot = None
+
+    def buildProtocol(self, addr):
+        p = self.protocol(self.clock, self.defer_to_thread)
+        p.factory = self
+        return p
+
+    def health(self):
+        if self.bot is None:
+            return {'signed_on': False, 'games': len(self.running)}
+        return self.bot._health()
 
     def clientConnectionLost(self, connector, reason):
-        print("Lost connection ({})".format(reason))
+        LOG.warning('connection_lost', reason=reason.getErrorMessage())
+        RECONNECTS.inc()
         connector.connect()
 
     def clientConnectionFailed(self, connector, reason):
-        print("Could not connect: {}".format(reason))
+        LOG.warning('connection_failed', reason=reason.getErrorMessage())
+        RECONNECTS.inc()
         connector.connect()
 
 
-if __name__ == "__main__":
+def connect(factory, server, port, use_ssl):
     # SSL will be attempted in all cases unless "NO" is explicity specified
     # in the config
-    if config.USE_SSL.lower() == "no":
-        reactor.connectTCP(config.SERVER, config.SERVER_PORT, ircbotFactory())
+    if use_ssl.lower() == "no":
+        reactor.connectTCP(server, port, factory)
+    else:
+        from twisted.internet import ssl
+        reactor.connectSSL(server, port, factory, ssl.ClientContextFactory())
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-n', '--network', dest='network', type=str, default=None,
+                  help='Play on this network from NETWORKS (as the '
+                  'supervisor does)')
+    op.add_option('--health', dest='health', type=str, default=None,
+                  help="Socket to send the supervisor this bot's health")
+    op.add_option('--health-interval', dest='health_interval', type=float,
+                  default=5, help='Seconds between health reports')
+    options, args = op.parse_args()
+
+    log_file = config.LOG_FILE
+    if log_file is not None and options.network is not None:
+        # Every network's bot rotates its own file.
+        root, ext = os.path.splitext(log_file)
+        log_file = '{}-{}{}'.format(root, options.network, ext)
+    LOG.configure(BufferedWriter(log_file, max_bytes=config.LOG_MAX_BYTES,
+                                 backups=config.LOG_BACKUPS))
+    reactor.addSystemEventTrigger('after', 'shutdown', LOG.close)
+
+    if options.network is None:
+        connect(ircbotFactory(), config.SERVER, config.SERVER_PORT,
+                config.USE_SSL)
+        metrics_port = config.METRICS_PORT
     else:
-        reactor.connectSSL(config.SERVER, config.SERVER_PORT,
-                           ircbotFactory(), ssl.ClientContextFactory())
+        network = find_network(config, options.network)
+        config.GAME_CHANNELS = network['channels']
+        config.CURSOR_DIR = os.path.join(config.SAVE_DIR, network['name'])
+        if not os.path.exists(config.CURSOR_DIR):
+            os.makedirs(config.CURSOR_DIR)
+        factory = ircbotFactory(network['nickname'])
+        connect(factory, network['server'], network['port'], network['ssl'])
+        if options.health:
+            reporter = HealthReporter(options.health, network['name'],
+                                      factory.health)
+            LoopingCall(reporter.send).start(options.health_interval)
+        metrics_port = network['metrics_port']
+
+    if metrics_port is not None:
+        reactor.listenTCP(metrics_port, metrics_site(),
+                          interface=config.METRICS_INTERFACE)
 
     reactor.run()
+
+
+if __name__ == "__main__":
+    main()
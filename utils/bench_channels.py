@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+# Measures what each extra game channel costs when they all share one
+# connection and one question bank: private memory per game, and CPU per
+# game for every round of clues. The games' output is thrown away. Each
+# channel count runs in its own process so the memory numbers aren't
+# polluted by the others. Needs Linux for /proc.
+
+import json
+import optparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.questionbank import compile_bank, QuestionBank
+
+
+class SinkBot:
+
+    def __init__(self):
+        self.lines = 0
+
+    def _cmsg(self, dest, msg, priority=None):
+        self.lines += 1
+
+    def mode(self, channel, on, modes):
+        pass
+
+    def _award(self, user, points):
+        return None
+
+    def _round_over(self, game):
+        pass
+
+
+class IdleCall:
+
+    def cancel(self):
+        pass
+
+
+class IdleClock:
+    '''
+    Never moves, and forgets the calls set on it: task.Clock keeps them in
+    a sorted list, which at a thousand games would cost more than the
+    games.
+    '''
+
+    def seconds(self):
+        return 0
+
+    def callLater(self, delay, f, *args, **kwargs):
+        return IdleCall()
+
+
+def private_rss():
+    '''
+    Private resident memory of this process in KiB.
+    '''
+    with open('/proc/self/statm') as handle:
+        resident, shared = [int(x) for x in handle.read().split()[1:3]]
+    return (resident - shared) * resource.getpagesize() // 1024
+
+
+def run(count, bank_file, ticks):
+    # Imported up front, so it isn't counted in the first game's memory.
+    from twisted.internet import reactor, threads
+    from lib.game import TriviaGame
+    from lib.shuffle import QuestionCursor
+
+    bank = QuestionBank(bank_file)
+    cursors = tempfile.mkdtemp()
+    bot = SinkBot()
+    # Every game's timers are set on this clock, but it never runs them:
+    # the ticks below drive the games directly, so no clock's own
+    # bookkeeping is measured.
+    clock = IdleClock()
+
+    before = private_rss()
+    games = []
+    for number in range(count):
+        channel = '#trivia{}'.format(number)
+        games.append(TriviaGame(
+            bot, channel, bank,
+            QuestionCursor(os.path.join(cursors, channel + '.json'),
+                           len(bank)),
+            ticks, 30, 5, clock))
+        games[-1].start()
+    memory = private_rss() - before
+
+    bot.lines = 0
+    started = time.time()
+    for _ in range(ticks):
+        for game in games:
+            game.play()
+    elapsed = time.time() - started
+    return {'channels': count,
+            'kib_per_channel': memory / float(count),
+            'us_per_channel_tick': elapsed / ticks / count * 1e6,
+            'lines_per_tick': bot.lines / float(ticks),
+            }
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with question files')
+op.add_option('-b', '--bank', dest='bank', type=str,
+              default=None, help='Compiled bank (built in a temp dir if unset)')
+op.add_option('-c', '--channels', dest='channels', type=str,
+              default='1,10,100,1000', help='Channel counts to try')
+op.add_option('-t', '--ticks', dest='ticks', type=int,
+              default=50, help='Clue intervals to run each time')
+op.add_option('-n', '--count', dest='count', type=int,
+              default=None, help='Run a single channel count')
+options, args = op.parse_args()
+
+if options.count:
+    print(json.dumps(run(options.count, options.bank, options.ticks)))
+    sys.exit(0)
+
+bank = options.bank
+if bank is None:
+    bank = os.path.join(tempfile.mkdtemp(), 'questions.bank')
+    compile_bank(options.path, bank)
+
+print("{:>9} {:>14} {:>16} {:>14}".format(
+    'channels', 'KiB/channel', 'us/channel/tick', 'lines/tick'))
+for count in options.channels.split(','):
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '-n', count, '-b', bank,
+                                   '-t', str(options.ticks)])
+    result = json.loads(out.decode('utf-8'))
+    print("{channels:>9} {kib_per_channel:>14.1f} "
+          "{us_per_channel_tick:>16.1f} {lines_per_tick:>14.1f}"
+          .format(**result))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# Measures giving clues over every answer in the bank: setting the answer
+# and the three clues a question gets, then revealing the whole answer,
+# which is where picking letters by trial and error was slowest. The old
+# way is kept here to compare against.
+
+import optparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.answer import Answer
+from lib.clues import STRATEGIES
+from lib.matching import Matcher
+from lib.questionbank import compile_bank, QuestionBank
+
+
+class OldAnswer(Answer):
+    '''
+    Answer as it was: the mask built by concatenation, and clues found by
+    trying random places until one is a masked letter, then slicing it
+    into the mask.
+    '''
+
+    def __init__(self, answer='None', keys=(), strategy=None):
+        self._answer = answer
+        self.strategy = strategy
+        self._matcher = Matcher(keys)
+        self._masked_answer = str()
+        self._unmasked = 0
+        for character in self._answer:
+            if character.isalnum():
+                self._masked_answer += '*'
+            else:
+                self._masked_answer += character
+
+    def give_clue(self):
+        # Without the limits on short answers, so both reveal everything.
+        if self._answer == self._masked_answer:
+            return self._masked_answer
+        letter = ' '
+        while not letter.isalnum():
+            index = random.randrange(0, len(self))
+            letter = self._answer[index]
+            if self._masked_answer[index] == letter:
+                letter = ' '
+        self._masked_answer = (self._masked_answer[:index] + letter +
+                               self._masked_answer[index + 1:])
+        self._unmasked += 1
+        return self._masked_answer
+
+
+def play(answer):
+    def run(answers, clues):
+        for text, keys in answers:
+            answer.set_answer(text, keys)
+            for _ in range(clues(text)):
+                answer.give_clue()
+    return run
+
+
+def timed(run, answers, clues):
+    started = time.time()
+    run(answers, clues)
+    return (time.time() - started) / len(answers) * 1e6
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with question files')
+op.add_option('-b', '--bank', dest='bank', type=str,
+              default=None, help='Compiled bank (built in a temp dir if unset)')
+options, args = op.parse_args()
+
+bank_file = options.bank
+if bank_file is None:
+    bank_file = os.path.join(tempfile.mkdtemp(), 'questions.bank')
+    compile_bank(options.path, bank_file)
+bank = QuestionBank(bank_file)
+answers = [bank[index][1:] for index in range(len(bank))]
+bank.close()
+random.seed(1)
+
+
+def three(text):
+    return 3
+
+
+def every(text):
+    return sum(1 for character in text if character.isalnum())
+
+
+print("{} answers, {:.1f} characters on average".format(
+    len(answers),
+    sum(len(text) for text, keys in answers) / float(len(answers))))
+print("{:>10} {:>18} {:>18}".format('', 'question us/ans', 'all letters us/ans'))
+runs = [('old', play(OldAnswer()))] + [
+    (name, play(Answer(strategy=name))) for name in sorted(STRATEGIES)]
+for name, run in runs:
+    print("{:>10} {:>18.2f} {:>18.2f}".format(
+        name, timed(run, answers, three), timed(run, answers, every)))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Measures what a point, a rank lookup and a page of standings cost as the
+# number of players grows, sorting the score dict every time against the
+# ranked leaderboard. The leaderboard's costs should stay close to flat.
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.leaderboard import Leaderboard
+
+
+def sorted_standings(scores):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def per_call(function, calls):
+    started = time.time()
+    for _ in range(calls):
+        function()
+    return (time.time() - started) / calls * 1e6
+
+
+op = optparse.OptionParser()
+op.add_option('-c', '--calls', dest='calls', type=int,
+              default=200, help='Calls to average over')
+op.add_option('-s', '--sizes', dest='sizes', type=str,
+              default='1000,10000,100000', help='Player counts to try')
+options, args = op.parse_args()
+
+random.seed(1)
+print("{:>8} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+    'players', 'sort us', 'add us', 'rank us', 'page us', 'near us'))
+for size in [int(size) for size in options.sizes.split(',')]:
+    scores = dict(('player{}'.format(i), random.randrange(1000))
+                  for i in range(size))
+    board = Leaderboard(scores)
+    names = list(scores)
+
+    def award():
+        board.add(random.choice(names), 5)
+
+    sort = per_call(lambda: sorted_standings(scores)[:10],
+                    max(1, options.calls * 1000 // size))
+    add = per_call(award, options.calls)
+    rank = per_call(lambda: board.rank(random.choice(names)), options.calls)
+    page = per_call(lambda: board.page(random.randrange(size), 10),
+                    options.calls)
+    near = per_call(lambda: board.around(random.choice(names), 2),
+                    options.calls)
+    print("{:>8} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+        size, sort, add, rank, page, near))
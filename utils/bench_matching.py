@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# Measures the per message cost of answer matching. Channel traffic is made
+# up of chatter (other questions' text), wrong guesses, near misses and
+# right answers; the cost per message should stay flat however many
+# messages go by.
+
+import optparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.answer import Answer
+from lib.questionbank import compile_bank, QuestionBank
+
+
+def traffic(bank, answer, size):
+    '''
+    size channel lines, roughly a third each of chatter, wrong answers and
+    guesses close to the right one.
+    '''
+    lines = []
+    for _ in range(size):
+        kind = random.randrange(3)
+        if kind == 0:
+            lines.append(bank.random()[0])
+        elif kind == 1:
+            lines.append(bank.random()[1])
+        else:
+            lines.append(random.choice([answer, answer.upper(),
+                                        'the ' + answer, answer[:-1]]))
+    return lines
+
+
+def per_message(check, lines):
+    started = time.time()
+    for line in lines:
+        check(line)
+    return (time.time() - started) / len(lines) * 1e9
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with question files')
+op.add_option('-b', '--bank', dest='bank', type=str,
+              default=None, help='Compiled bank (built in a temp dir if unset)')
+op.add_option('-q', '--questions', dest='questions', type=int,
+              default=200, help='Questions to average over')
+options, args = op.parse_args()
+
+bank_file = options.bank
+if bank_file is None:
+    bank_file = os.path.join(tempfile.mkdtemp(), 'questions.bank')
+    compile_bank(options.path, bank_file)
+bank = QuestionBank(bank_file)
+random.seed(1)
+
+print("{:>10} {:>14} {:>14} {:>16}".format(
+    'messages', 'old ns/msg', 'new ns/msg', 'setup us/answer'))
+for size in (1000, 10000, 100000):
+    old = new = setup = 0.0
+    rounds = max(1, options.questions * 1000 // size)
+    for _ in range(rounds):
+        question, text, keys = bank.random()
+        lines = traffic(bank, text, size)
+
+        started = time.time()
+        answer = Answer(text)
+        setup += time.time() - started
+
+        old += per_message(lambda msg: msg.lower().strip() == text.lower(),
+                           lines)
+        new += per_message(answer.matches, lines)
+    print("{:>10} {:>14.0f} {:>14.0f} {:>16.1f}".format(
+        size, old / rounds, new / rounds, setup / rounds * 1e6))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Compares question selection through the compiled bank with the old
+# listdir/open/read/split path. Each mode runs in its own process so the
+# RSS numbers aren't polluted by the other one. Needs Linux for /proc.
+
+import json
+import optparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from random import choice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.questionbank import compile_bank, QuestionBank
+
+
+def current_rss():
+    '''
+    Returns the (private, shared) resident set size of this process in KiB.
+
+    Bank pages are file backed, so they show up as shared and can be
+    dropped by the kernel at any time; private memory is what the bot
+    actually costs.
+    '''
+    with open('/proc/self/statm') as handle:
+        resident, shared = [int(x) for x in handle.read().split()[1:3]]
+    page = resource.getpagesize() // 1024
+    return (resident - shared) * page, shared * page
+
+
+def legacy_select(directory):
+    '''
+    The selection path trivia.py used before the question bank.
+    '''
+    while True:
+        filename = choice(os.listdir(directory))
+        fd = open(os.path.join(directory, filename))
+        lines = fd.read().splitlines()
+        myline = choice(lines)
+        fd.close()
+        try:
+            question, answer = myline.split('`')
+        except ValueError:
+            continue
+        return question, answer.strip()
+
+
+def run(mode, directory, bank, iterations):
+    before = current_rss()
+    if mode == 'bank':
+        started = time.time()
+        questions = QuestionBank(bank)
+        setup = time.time() - started
+        select = questions.random
+    else:
+        setup = 0.0
+        select = lambda: legacy_select(directory)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.time()
+        select()
+        timings.append(time.time() - started)
+    timings.sort()
+
+    return {'mode': mode,
+            'setup_ms': setup * 1000,
+            'mean_us': sum(timings) / len(timings) * 1e6,
+            'p50_us': timings[len(timings) // 2] * 1e6,
+            'p99_us': timings[int(len(timings) * 0.99)] * 1e6,
+            'private_kib': current_rss()[0] - before[0],
+            'shared_kib': current_rss()[1] - before[1],
+            }
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with question files')
+op.add_option('-b', '--bank', dest='bank', type=str,
+              default=None, help='Compiled bank (built in a temp dir if unset)')
+op.add_option('-n', '--iterations', dest='iterations', type=int,
+              default=2000, help='Questions to select per mode')
+op.add_option('-m', '--mode', dest='mode', type=str,
+              default=None, help='Run a single mode: legacy or bank')
+options, args = op.parse_args()
+
+if options.mode:
+    result = run(options.mode, options.path, options.bank, options.iterations)
+    print(json.dumps(result))
+    sys.exit(0)
+
+bank = options.bank
+if bank is None:
+    bank = os.path.join(tempfile.mkdtemp(), 'questions.bank')
+    started = time.time()
+    count, rejects = compile_bank(options.path, bank)
+    print("Compiled {} questions ({} rejected) in {:.2f}s"
+          .format(count, len(rejects), time.time() - started))
+
+print("{:>8} {:>10} {:>10} {:>10} {:>10} {:>12} {:>12}"
+      .format('mode', 'setup ms', 'mean us', 'p50 us', 'p99 us',
+              'private KiB', 'shared KiB'))
+for mode in ('legacy', 'bank'):
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '-m', mode, '-p', options.path,
+                                   '-b', bank,
+                                   '-n', str(options.iterations)])
+    result = json.loads(out.decode('utf-8'))
+    print("{mode:>8} {setup_ms:>10.2f} {mean_us:>10.1f} {p50_us:>10.1f} "
+          "{p99_us:>10.1f} {private_kib:>12} {shared_kib:>12}"
+          .format(**result))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# Checks the question files and packs them into a single memory mappable
+# bank, so the bot never has to read, split or skip a broken line while a
+# game is running.
+#
+#   compile_questions.py lint     report broken lines
+#   compile_questions.py compile  report broken lines and write the bank
+#
+# Broken lines are written to a quarantine file (one per line, prefixed with
+# where they came from and why they were rejected) so they can be fixed up
+# by hand.
+
+from collections import defaultdict
+import logging
+import multiprocessing
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from lib.questionbank import compile_bank, scan
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('compile_questions')
+logger.setLevel(logging.INFO)
+
+
+def lint(directory, processes):
+    count = 0
+    rejects = []
+    for filename, records, categories, rejected in scan(directory, processes):
+        count += len(records)
+        rejects.extend((filename,) + reject for reject in rejected)
+    return count, rejects
+
+
+def quarantine(path, rejects):
+    with open(path, 'wb') as handle:
+        for filename, number, reason, line in rejects:
+            where = '{0}:{1}\t{2}\t'.format(filename, number, reason)
+            handle.write(where.encode('utf-8') + line + b'\n')
+
+
+op = optparse.OptionParser(usage='%prog [options] lint|compile')
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with files to check')
+op.add_option('-o', '--output', dest='output', type=str,
+              default='savedata/questions.bank', help='Bank file to write')
+op.add_option('-q', '--quarantine', dest='quarantine', type=str,
+              default=None, help='File to write rejected lines to')
+op.add_option('-j', '--jobs', dest='jobs', type=int,
+              default=multiprocessing.cpu_count(),
+              help='Number of worker processes')
+op.add_option('-l', '--log-level', dest='log_level', type=str,
+              default='info', help='Logging output level')
+options, args = op.parse_args()
+
+if len(args) != 1 or args[0] not in ('lint', 'compile'):
+    op.error('expected exactly one command: lint or compile')
+command = args[0]
+
+if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                 'CRITICAL']:
+    logger.setLevel(getattr(logging, options.log_level.upper()))
+
+started = time.time()
+if command == 'lint':
+    logger.info('Checking {0} ...'.format(options.path))
+    count, rejects = lint(options.path, options.jobs)
+else:
+    output_dir = os.path.dirname(options.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    logger.info('Compiling {0} into {1} ...'
+                .format(options.path, options.output))
+    count, rejects = compile_bank(options.path, options.output, options.jobs)
+
+reasons = defaultdict(int)
+for filename, number, reason, line in rejects:
+    reasons[reason] += 1
+    logger.debug('{0}:{1}: {2}'.format(filename, number, reason))
+
+logger.info('Done in {0:.2f}s with {1} processes. {2} good questions, '
+            '{3} rejected lines.'.format(time.time() - started, options.jobs,
+                                         count, len(rejects)))
+for reason, total in sorted(reasons.items(), key=lambda item: -item[1]):
+    logger.info('  {0}: {1}'.format(reason, total))
+
+if options.quarantine and rejects:
+    quarantine(options.quarantine, rejects)
+    logger.info('Rejected lines written to {0}'.format(options.quarantine))
+
+if command == 'lint' and rejects:
+    sys.exit(1)
@@ -2,13 +2,20 @@
 
 # Short deduplication script. Runs over every file in the target directory and
 # spits out duplicate lines and files which contained them.
+#
+# Only a 64 bit hash of each line is kept in memory, and duplicates are found
+# in a single pass: the first copy of a line (in sorted file order) is kept
+# and every later copy is a duplicate. With -d each affected file is then
+# rewritten exactly once, atomically.
 
-from collections import defaultdict
+import hashlib
 import logging
 import os
 import optparse
-import subprocess
+import shutil
+import struct
 import sys
+import tempfile
 
 
 logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
@@ -16,53 +23,122 @@ logger = logging.getLogger('dedup')
 logger.setLevel(logging.INFO)
 
 
-def collate(d, path):
-    with open(path, "rU") as handle:
-        for line in handle:
-            d[line].append(path)
+def line_hash(line):
+    '''
+    64 bit hash of a line. Stable across runs and Python versions, unlike
+    hash().
+    '''
+    return struct.unpack('<Q', hashlib.md5(line).digest()[:8])[0]
 
 
-def readdir(directory):
-    d = defaultdict(list)
+def walk(directory):
+    '''
+    Yields every file under directory in a stable order.
+    '''
     for root, dirs, files in os.walk(directory):
-        for name in files:
-            path = os.path.join(root, name)
-            collate(d, path)
-    return d
-
-
-op = optparse.OptionParser()
-op.add_option('-p', '--path', dest='path', type=str,
-              default='questions', help='Directory with files to scan')
-op.add_option('-l', '--log-level', dest='log_level', type=str,
-              default='warning', help='Logging output level')
-op.add_option('-d', '--destructive', dest='delete', action="store_true",
-              default=False, help='Setting this will delete all but one copy')
-options, args = op.parse_args()
-
-if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
-                                 'CRITICAL']:
-    logger.setLevel(getattr(logging, options.log_level.upper()))
-
-
-logger.info('Reading {0} ...'.format(options.path))
-d = readdir(options.path)
-
-logger.info("Done. Duplicates:")
-
-for line, paths in d.iteritems():
-    if len(paths) > 1:
-        logger.info(line)
-        logger.info(", ".join(paths))
-        purge = paths[:-1]  # keep the copy in the last file
-        cmd = [ 'sed', '-i', "{/" + line.strip() + "/d}", ] + purge
-        logger.warning(' '.join(cmd)) 
-        if options.delete:
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,)
-            (out, err) = proc.communicate()
-            if out:
-                logger.info(out)
-            if err:
-                logger.error(err)
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def find_duplicates(directory):
+    '''
+    Finds every line that already appeared earlier in the directory.
+
+    Returns (duplicates, stats) where duplicates maps each affected path to
+    a {line number: hash} dict of the lines to drop. Only hashes are kept;
+    read_lines() gets the text back for a report.
+    '''
+    seen = set()
+    duplicates = {}
+    stats = {'files': 0, 'lines': 0, 'duplicates': 0, 'bytes': 0}
+    for path in walk(directory):
+        stats['files'] += 1
+        with open(path, 'rb') as handle:
+            for number, line in enumerate(handle):
+                line = line.rstrip(b'\r\n')
+                if not line.strip():
+                    continue
+                stats['lines'] += 1
+                digest = line_hash(line)
+                if digest in seen:
+                    duplicates.setdefault(path, {})[number] = digest
+                    stats['duplicates'] += 1
+                    stats['bytes'] += len(line) + 1
+                else:
+                    seen.add(digest)
+    return duplicates, stats
+
+
+def read_lines(path, numbers):
+    '''
+    Yields (line number, line) for the lines of path numbered in numbers.
+    '''
+    with open(path, 'rb') as handle:
+        for number, line in enumerate(handle):
+            if number in numbers:
+                yield number, line.rstrip(b'\r\n')
+
+
+def rewrite(path, drop):
+    '''
+    Rewrites path without the lines numbered in drop.
+
+    The new contents go to a temporary file next to the original, which is
+    synced and renamed over it, so a crash leaves either the old or the new
+    file and never half of one.
+    '''
+    directory, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(prefix='.' + name, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            with open(path, 'rb') as handle:
+                for number, line in enumerate(handle):
+                    if number not in drop:
+                        out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+        shutil.copymode(path, tmp)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-p', '--path', dest='path', type=str,
+                  default='questions', help='Directory with files to scan')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='warning', help='Logging output level')
+    op.add_option('-d', '--destructive', dest='delete', action="store_true",
+                  default=False, help='Setting this will delete all but one copy')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    logger.info('Reading {0} ...'.format(options.path))
+    duplicates, stats = find_duplicates(options.path)
+
+    logger.info("Done. Duplicates:")
+    for path in sorted(duplicates):
+        for number, line in read_lines(path, duplicates[path]):
+            print('{0}:{1}: {2}'.format(
+                path, number + 1, line.decode('utf-8', 'replace')))
+
+    if options.delete:
+        for path in sorted(duplicates):
+            logger.warning('Rewriting {0} without {1} duplicate lines'
+                           .format(path, len(duplicates[path])))
+            rewrite(path, duplicates[path])
+
+    print('{0} files, {1} lines, {2} duplicates in {3} files ({4} bytes){5}'
+          .format(stats['files'], stats['lines'], stats['duplicates'],
+                  len(duplicates), stats['bytes'],
+                  '' if options.delete else ' [dry run, nothing changed]'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+# Near duplicate detection. Finds questions that are worded almost the same
+# way, which dedup.py can't see since it only compares whole lines:
+#
+#   Astrology: If You Were Born On 07 June What Star Sign Would You Be`Gemini
+#   Astrology : If you were born on 07 June what star sign (Zodiac) would you be`gemini
+#
+# Each question is cut into word shingles and summarised by a MinHash
+# signature (computed per file in a pool of processes). Signatures are cut
+# into bands and hashed into buckets (LSH), so only questions sharing a
+# bucket are ever compared, which keeps the whole thing roughly linear in
+# the number of questions. A bucket too big for every pair to be compared
+# is split again on the next band, and so on; pairs that are split up, or
+# that still share a bucket once the bands run out, aren't compared, and
+# how many there were is logged. Candidates whose estimated similarity passes the
+# threshold are grouped into clusters and printed with their scores.
+#
+# By default only questions with the same answer that mention the same
+# numbers are clustered, since "born on 07 June" and "born on 08 June" look
+# alike but aren't duplicates; -a reports those too. With -d every
+# clustered question that passes that test against the first question of
+# its cluster is deleted, rewriting each file once.
+
+from array import array
+from collections import defaultdict
+import logging
+import multiprocessing
+import optparse
+import os
+import random
+import re
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from dedup import rewrite, walk
+from lib.questionbank import parse_line
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('neardup')
+logger.setLevel(logging.INFO)
+
+_WORD = re.compile(br'[a-z0-9]+')
+_NUMBER = re.compile(br'[0-9]+')
+_MASK = (1 << 64) - 1
+
+# Buckets up to this size have every pair compared.
+BUCKET_PAIRS = 20
+
+
+def permutations(count, seed):
+    '''
+    (multiplier, increment) pairs for count multiply-shift hash functions.
+
+    Every worker derives the same ones from the seed.
+    '''
+    rng = random.Random(seed)
+    return [(rng.getrandbits(64) | 1, rng.getrandbits(64))
+            for _ in range(count)]
+
+
+def shingles(text, size):
+    '''
+    32 bit hashes of the overlapping runs of size words in text, ignoring
+    case and punctuation.
+    '''
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return set([zlib.crc32(b' '.join(words)) & 0xffffffff])
+    return set(zlib.crc32(b' '.join(words[i:i + size])) & 0xffffffff
+               for i in range(len(words) - size + 1))
+
+
+def signature(hashes, perms):
+    '''
+    MinHash signature of a set of shingle hashes.
+    '''
+    return [min([((a * h + b) & _MASK) >> 32 for h in hashes])
+            for a, b in perms]
+
+
+def sign_file(job):
+    '''
+    Worker: signs every valid question in a file.
+
+    Returns (path, line numbers, flattened signatures, keys) where each key
+    hashes the question's answer and the numbers it mentions.
+    '''
+    path, size, count, seed = job
+    perms = permutations(count, seed)
+    numbers = array('I')
+    signatures = array('I')
+    keys = array('I')
+    with open(path, 'rb') as handle:
+        for number, line in enumerate(handle):
+            try:
+                question, answer = parse_line(line.rstrip(b'\r\n'))
+            except ValueError:
+                continue
+            numbers.append(number)
+            signatures.extend(signature(shingles(question, size), perms))
+            key = b' '.join([answer.lower()] +
+                            sorted(set(_NUMBER.findall(question))))
+            keys.append(zlib.crc32(key) & 0xffffffff)
+    return path, numbers, signatures, keys
+
+
+def bucket_pairs(members, keys, limit=BUCKET_PAIRS):
+    '''
+    The pairs to compare among the questions in one bucket.
+
+    Up to limit members, that's every pair. A bigger bucket is split by
+    keys[0](member), the member's rows in another band, and each part
+    taken the same way with the rest of keys. A part still too big once
+    keys run out, of questions with the same rows in every band, only has
+    each member paired with its first.
+    '''
+    if len(members) <= limit:
+        return [(a, b) for i, a in enumerate(members) for b in members[i + 1:]]
+    if not keys:
+        return [(members[0], b) for b in members[1:]]
+    parts = defaultdict(list)
+    for member in members:
+        parts[keys[0](member)].append(member)
+    pairs = []
+    for part in parts.values():
+        pairs.extend(bucket_pairs(part, keys[1:], limit))
+    return pairs
+
+
+def cluster(edges):
+    '''
+    Groups questions around leaders.
+
+    edges maps each question to {other question: similarity}. Questions are
+    visited in order; the first unclaimed one becomes a leader and claims
+    every unclaimed question it's similar to. Unlike a transitive closure
+    this can't chain A~B~C~D into one huge cluster of unrelated questions.
+
+    Returns a list of clusters, each a list of (question, similarity to the
+    leader) pairs starting with the leader.
+    '''
+    claimed = set()
+    clusters = []
+    for leader in sorted(edges):
+        if leader in claimed:
+            continue
+        members = [(other, score)
+                   for other, score in sorted(edges[leader].items())
+                   if other not in claimed]
+        if not members:
+            continue
+        claimed.add(leader)
+        claimed.update(other for other, score in members)
+        clusters.append([(leader, 1.0)] + members)
+    return clusters
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-p', '--path', dest='path', type=str,
+                  default='questions', help='Directory with files to scan')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='warning', help='Logging output level')
+    op.add_option('-d', '--destructive', dest='delete', action="store_true",
+                  default=False,
+                  help='Delete near duplicates with the same answer')
+    op.add_option('-t', '--threshold', dest='threshold', type=float,
+                  default=0.6, help='Minimum estimated similarity (0-1)')
+    op.add_option('-k', '--shingle', dest='shingle', type=int,
+                  default=2, help='Words per shingle')
+    op.add_option('-b', '--bands', dest='bands', type=int,
+                  default=8, help='LSH bands')
+    op.add_option('-r', '--rows', dest='rows', type=int,
+                  default=4, help='Signature rows per band')
+    op.add_option('-a', '--loose', dest='loose',
+                  action="store_true", default=False,
+                  help='Also cluster questions whose answers or numbers differ')
+    op.add_option('-s', '--seed', dest='seed', type=int,
+                  default=1, help='Seed for the hash functions')
+    op.add_option('-j', '--jobs', dest='jobs', type=int,
+                  default=multiprocessing.cpu_count(),
+                  help='Number of worker processes')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    width = options.bands * options.rows
+    jobs = [(path, options.shingle, width, options.seed)
+            for path in walk(options.path)]
+
+    logger.info('Signing {0} files with {1} processes ...'
+                .format(len(jobs), options.jobs))
+    # Questions are numbered in file order; where[] maps the number back to
+    # its file and line.
+    where = []
+    signatures = array('I')
+    keys = array('I')
+    pool = multiprocessing.Pool(options.jobs)
+    try:
+        for path, numbers, sigs, ks in pool.imap(sign_file, jobs):
+            where.extend((path, number) for number in numbers)
+            signatures.extend(sigs)
+            keys.extend(ks)
+    finally:
+        pool.close()
+        pool.join()
+
+    def similarity(a, b):
+        sa = signatures[a * width:(a + 1) * width]
+        sb = signatures[b * width:(b + 1) * width]
+        return sum(1 for x, y in zip(sa, sb) if x == y) / float(width)
+
+    def compare(a, b):
+        if not options.loose and keys[a] != keys[b]:
+            return 0
+        score = similarity(a, b)
+        if score >= options.threshold:
+            edges[a][b] = edges[b][a] = score
+        return 1
+
+    logger.info('Bucketing {0} questions ...'.format(len(where)))
+    def rows(band):
+        start = band * options.rows
+
+        def key(item):
+            offset = item * width + start
+            return tuple(signatures[offset:offset + options.rows])
+        return key
+
+    edges = defaultdict(dict)
+    compared = 0
+    skipped = 0
+    # One band at a time keeps only a single band's buckets in memory.
+    for band in range(options.bands):
+        key = rows(band)
+        buckets = defaultdict(list)
+        for item in range(len(where)):
+            buckets[key(item)].append(item)
+        # Big buckets are split on the bands after this one.
+        others = [rows((band + step) % options.bands)
+                  for step in range(1, options.bands)]
+        for members in buckets.values():
+            pairs = bucket_pairs(members, others)
+            skipped += len(members) * (len(members) - 1) // 2 - len(pairs)
+            for a, b in pairs:
+                compared += compare(a, b)
+        del buckets
+
+    groups = cluster(edges)
+    logger.info('Compared {0} candidate pairs, found {1} clusters.'
+                .format(compared, len(groups)))
+    if skipped:
+        logger.warning('Skipped {0} candidate pairs in buckets of more than '
+                       '{1} questions.'.format(skipped, BUCKET_PAIRS))
+
+    # Only the clustered lines are read back for the report.
+    wanted = defaultdict(set)
+    for members in groups:
+        for item, score in members:
+            path, number = where[item]
+            wanted[path].add(number)
+    text = {}
+    for path, numbers in wanted.items():
+        with open(path, 'rb') as handle:
+            for number, line in enumerate(handle):
+                if number in numbers:
+                    text[(path, number)] = line.rstrip(b'\r\n').decode(
+                        'utf-8', 'replace')
+
+    drop = defaultdict(dict)
+    pruned = 0
+    for index, members in enumerate(groups, start=1):
+        first = members[0][0]
+        print('cluster {0} ({1} questions)'.format(index, len(members)))
+        for item, score in members:
+            path, number = where[item]
+            same = keys[item] == keys[first]
+            mark = ' '
+            if item != first and same:
+                drop[path][number] = True
+                pruned += 1
+                mark = '-'
+            print('  {0} {1:.2f} {2}:{3}: {4}'.format(
+                mark, score, path, number + 1, text[(path, number)]))
+
+    if options.delete:
+        for path in sorted(drop):
+            logger.warning('Rewriting {0} without {1} near duplicates'
+                           .format(path, len(drop[path])))
+            rewrite(path, drop[path])
+
+    print('{0} questions, {1} clusters, {2} marked with - for deletion{3}'
+          .format(len(where), len(groups), pruned,
+                  '' if options.delete else ' [dry run, nothing changed]'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# Plays thousands of rounds against the real bot on a simulated clock, with
+# thousands of players guessing, and reports throughput, how long the bot
+# took over each guess, and memory. Uses config.py if there is one (or
+# example_config.py), but saves into a temporary directory. With --max-p99
+# or --min-rate it exits non-zero when the bot is slower than that, for CI.
+
+import json
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+
+def load_config(options, save_dir):
+    try:
+        import config
+    except ImportError:
+        config = types.ModuleType('config')
+        with open(os.path.join(ROOT, 'example_config.py')) as handle:
+            exec(handle.read(), config.__dict__)
+        sys.modules['config'] = config
+    config.SAVE_DIR = save_dir
+    config.Q_DIR = options.path
+    config.Q_BANK = options.bank or os.path.join(save_dir, 'questions.bank')
+    config.SAVE_MODE = options.save_mode
+    config.GAME_CHANNELS = ['#trivia{}'.format(n)
+                            for n in range(options.channels)]
+    config.USE_SSL = 'no'
+    if options.pace:
+        config.PACE_BOUNDS = tuple(float(bound)
+                                   for bound in options.pace.split(','))
+    return config
+
+
+op = optparse.OptionParser()
+op.add_option('-p', '--path', dest='path', type=str,
+              default='questions', help='Directory with question files')
+op.add_option('-b', '--bank', dest='bank', type=str,
+              default=None, help='Compiled bank (built in a temp dir if unset)')
+op.add_option('-r', '--rounds', dest='rounds', type=int,
+              default=1000, help='Rounds to play')
+op.add_option('-n', '--players', dest='players', type=int,
+              default=1000, help='Players taking guesses')
+op.add_option('-g', '--guesses', dest='guesses', type=int,
+              default=20, help='Guesses per channel per clue')
+op.add_option('-a', '--accuracy', dest='accuracy', type=float,
+              default=0.05, help='Share of guesses that are right')
+op.add_option('-c', '--channels', dest='channels', type=int,
+              default=1, help='Channels playing at once')
+op.add_option('-m', '--save-mode', dest='save_mode', type=str,
+              default='snapshot', help='snapshot, journal or sqlite')
+op.add_option('-s', '--seed', dest='seed', type=int,
+              default=0, help='Seed for the players and the game')
+op.add_option('--pace', dest='pace', type=str, default=None,
+              help='Bounds for the clue interval, e.g. 10,45, to pace the '
+              'games by how fast they are answered')
+op.add_option('--trace-memory', dest='trace_memory', action='store_true',
+              default=False, help='Report peak memory (Python 3, slower)')
+op.add_option('--json', dest='json', action='store_true',
+              default=False, help='Print the report as JSON')
+op.add_option('--max-p99', dest='max_p99', type=float, default=None,
+              help='Fail if the 99th percentile guess takes longer (us)')
+op.add_option('--min-rate', dest='min_rate', type=float, default=None,
+              help='Fail if fewer guesses are handled per second')
+options, args = op.parse_args()
+
+save_dir = tempfile.mkdtemp()
+try:
+    load_config(options, save_dir)
+    started = time.time()
+    import trivia
+    from lib.simulation import Simulation
+
+    # The bot prints every command it's given; that isn't what's being
+    # measured.
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        simulation = Simulation(trivia.ircbotFactory(), options.players,
+                                options.guesses, options.accuracy,
+                                options.seed)
+        setup = time.time() - started
+        report = simulation.run(options.rounds, options.trace_memory)
+        simulation.close()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+finally:
+    shutil.rmtree(save_dir)
+
+report['setup_seconds'] = setup
+if options.json:
+    print(json.dumps(report, sort_keys=True))
+else:
+    for name in sorted(report):
+        value = report[name]
+        if isinstance(value, float):
+            value = '{:.1f}'.format(value)
+        print('{:<20} {:>14}'.format(name, value))
+
+failed = False
+if options.max_p99 is not None and \
+        report['latency_p99_us'] > options.max_p99:
+    print("99th percentile guess took {:.1f}us, over {}us"
+          .format(report['latency_p99_us'], options.max_p99))
+    failed = True
+if options.min_rate is not None and \
+        report['guesses_per_second'] < options.min_rate:
+    print("Only {:.0f} guesses a second, under {}"
+          .format(report['guesses_per_second'], options.min_rate))
+    failed = True
+sys.exit(1 if failed else 0)